@@ -0,0 +1,159 @@
+# -*- coding: ascii -*-
+
+# Decoding of the AIS sentences (!AIVDM, !AIVDO) which AIS transponders send
+# together with the NMEA sentences of their GPS receiver. The multi-sentence
+# messages are reassembled and decoded by AIVDM (the decoder of the GPSD project),
+# the NMEADecoder routes every sentence which starts with ! to an AISDecoder.
+
+import AIVDM, NMEAutils
+from GPSError import *
+
+# AIS sentences: VDM are the messages of other stations, VDO the own vessel
+ais_formatters = ("VDM", "VDO")
+
+# Positions are transmitted in 1/10000 minutes (type 27: 1/10 minutes), 181 and
+# 91 degrees mean "not available"
+position_scale = 600000.0
+position_scale27 = 600.0
+
+def getAISFormatter(sentence):
+  """ Returns the formatter of an AIS sentence ("VDM" or "VDO") or None. The talker
+  (e.g. AI, AB or BS) is not checked. """
+  if (sentence[0:1] <> "!") or (sentence[3:6] not in ais_formatters):
+    return None
+  return sentence[3:6]
+
+def stripMetadata(sentence):
+  """ Removes the metadata some receivers (e.g. of the USCG) append after the
+  checksum, e.g. "!AIVDM,...*5C,s22222,d-103,T45.4" """
+  if len(sentence) > sentence.find("*") + 3:
+    return AIVDM.uscg_metadata.sub("", sentence)
+  return sentence
+
+class AISMessage(object):
+  """ AISMessage - One decoded AIS message
+
+  The fields are available by name, e.g. message["mmsi"] or message.get("shipname"),
+  see the instruction tables in AIVDM for the names of each message type. The
+  values are not scaled (e.g. speed in 1/10 knots). formatter is "VDM" or "VDO" and
+  raw contains the sentences of the message, one per line. Parts A and B of type 24
+  are delivered as one message with the fields of both parts. """
+  __slots__ = ("formatter", "msgtype", "mmsi", "fields", "raw")
+
+  def __init__(self, formatter, fields, raw):
+    self.formatter = formatter
+    self.fields = fields      # list of (name, value) in the order of the message
+    self.raw = raw
+    self.msgtype = fields[0][1]
+    self.mmsi = fields[2][1]
+
+  def __repr__(self):
+    return "<AISMessage type %d from %09d>" % (self.msgtype, self.mmsi)
+
+  def __getitem__(self, name):
+    for (field, value) in self.fields:
+      if field == name:
+        return value
+    raise KeyError(name)
+
+  def __contains__(self, name):
+    for (field, value) in self.fields:
+      if field == name:
+        return True
+    return False
+
+  def get(self, name, default=None):
+    try:
+      return self[name]
+    except KeyError:
+      return default
+
+  def asDict(self):
+    """ returns the fields as dict """
+    return dict(self.fields)
+
+  def hasPosition(self):
+    """ returns True if the message contains an available position """
+    values = dict(self.fields)
+    if ("lat" not in values) or ("lon" not in values):
+      return False
+    scale = position_scale
+    if self.msgtype == 27:
+      scale = position_scale27
+    return (abs(values["lat"]) <= 90 * scale) and (abs(values["lon"]) <= 180 * scale)
+
+  def getPosition(self):
+    """ returns the position as GPSPosition or raises NMEANoValidFix """
+    if not self.hasPosition():
+      raise NMEANoValidFix
+    scale = position_scale
+    if self.msgtype == 27:
+      scale = position_scale27
+    return NMEAutils.GPSPosition(self["lat"] / scale, self["lon"] / scale)
+
+class AISDecoder(object):
+  """ AISDecoder - Reassembles and decodes AIS sentences
+
+  decodeSentence() takes one sentence at a time (with a verified checksum) and
+  returns an AISMessage as soon as a message is complete. The fragments of
+  multi-sentence messages are kept per channel and sequential message id and are
+  dropped after fragment_timeout seconds (see AIVDM.AISReassembler). With join24=True
+  the parts A and B of type 24 are delivered joined (see AIVDM.Type24Cache), a
+  single part is held back until the other one is known. """
+  def __init__(self, join24=True, timeout=AIVDM.fragment_timeout, maxsize=AIVDM.fragment_slots):
+    self._reassembler = AIVDM.AISReassembler(timeout, maxsize)
+    self._type24 = None
+    if join24:
+      self._type24 = AIVDM.Type24Cache()
+    self._count = 0
+
+  def getIncomplete(self):
+    """ returns the number of multi-sentence messages which have been dropped
+    incomplete (lost fragment, timeout or too many pending messages) """
+    return self._reassembler.dropped
+
+  def decodeSentence(self, sentence):
+    """ Decodes an AIS sentence (without EOL and metadata). Returns the AISMessage
+    if the sentence completes a message, otherwise None. Raises NMEAParseError if the
+    sentence or the message can't be decoded. """
+    self._count += 1
+    formatter = getAISFormatter(sentence)
+    try:
+      message = self._reassembler.add(sentence.split(","), sentence + "\n")
+    except (IndexError, ValueError):
+      raise NMEAParseError
+    if message == None:
+      return None
+
+    (payload, pad, raw) = message
+    bits = AIVDM.BitVector()
+    bits.from_sixbit(payload, pad)
+    try:
+      (cooked, values, bogon) = AIVDM.decode_message(self._count, bits)
+    except Exception:
+      # Validation errors, truncated messages or unknown message types
+      raise NMEAParseError
+    if bogon:
+      raise NMEAParseError
+
+    if (self._type24 <> None) and (values["msgtype"] == 24):
+      joined = self._type24.add(values["mmsi"], values["partno"], raw, cooked)
+      if joined == None:
+        return None
+      (raw, cooked) = joined
+    return AISMessage(formatter, [ (inst.name, value) for (inst, value) in cooked ], raw)
+
+################ TEST #####################################################
+if __name__ == '__main__':
+  import NMEAdecoder
+
+  decoder = NMEAdecoder.NMEADecoder()
+  stats = decoder.enableInstrumentation()
+
+  # Type 27 (long-range broadcast): position in 1/10 minutes
+  message = decoder.decodeSentence("!AIVDM,1,1,,B,K39>JhP0G=3s@65`,0*01")
+  assert message <> None, stats.parse_errors
+  assert (message.msgtype, message.mmsi) == (27, 211000002)
+  position = message.getPosition()
+  assert (round(position.latitude, 3), round(position.longitude, 3)) == (53.6, 9.9)
+  print message, position.latitude, position.longitude
@@ -0,0 +1,333 @@
+# -*- coding: ascii -*-
+
+# Live table of the AIS targets: the position reports and the static data of the
+# decoded AIS messages are merged per MMSI, targets which haven't been heard for a
+# while are removed and a grid of the positions answers "which targets are within
+# X nm of the own ship" without looking at every target.
+
+import math, time, threading
+
+import NMEAevents, NMEAutils
+from GPSError import *
+
+# Message types with a position report / with static data of the vessel
+position_types = frozenset((1, 2, 3, 18, 19, 27))
+static_types = frozenset((5, 19, 24))
+
+# Static fields which are kept per target
+static_fields = ("imo_id", "callsign", "shipname", "shiptype", "to_bow", "to_stern",
+                 "to_port", "to_starbord", "epfd", "draught", "destination", "vendorid")
+
+# A target is removed if nothing has been received from it for target_timeout
+# seconds. The whole table is checked every expire_interval seconds at most.
+target_timeout = 600.0
+expire_interval = 10.0
+
+# Size of the grid cells in degrees (360 has to be a multiple of it)
+grid_cellsize = 0.1
+
+# Mean radius of the earth in nautical miles
+earth_radius = 3440.065
+
+def calculateDistance(lat1, lon1, lat2, lon2):
+  """ returns the great circle distance (haversine) in nautical miles """
+  dlat = math.radians(lat2 - lat1)
+  dlon = math.radians(lon2 - lon1)
+  a = math.sin(dlat / 2) ** 2 + \
+      math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+  return 2 * earth_radius * math.asin(min(1.0, math.sqrt(a)))
+# calculateDistance
+
+class AISTarget(object):
+  """ AISTarget - The last known state of an AIS target
+
+  latitude/longitude (degrees), speed (knots), course (degrees), heading (degrees)
+  and status are taken from the last position report, None if not available. The
+  static data (name, call sign, dimensions, ...) is kept in static, see getStatic().
+  updated is the time of the last message, positionTime the time of the last
+  position report.
+
+  A target is never changed: every message creates a new object which replaces the
+  old one in the AISTargetTable, thus another thread always sees a consistent state. """
+  __slots__ = ("mmsi", "msgtype", "latitude", "longitude", "speed", "course",
+               "heading", "status", "static", "updated", "positionTime", "cell")
+
+  def __init__(self, mmsi):
+    self.mmsi = mmsi
+    self.msgtype = None
+    self.latitude = None
+    self.longitude = None
+    self.speed = None
+    self.course = None
+    self.heading = None
+    self.status = None
+    self.static = dict()
+    self.updated = None
+    self.positionTime = None
+    self.cell = None
+
+  def __repr__(self):
+    return "<AISTarget %09d %r>" % (self.mmsi, self.static.get("shipname"))
+
+  def copy(self):
+    target = AISTarget(self.mmsi)
+    for name in self.__slots__:
+      setattr(target, name, getattr(self, name))
+    return target
+
+  def merge(self, message, now):
+    """ returns a new target with the fields of the AISMessage """
+    target = self.copy()
+    target.updated = now
+    values = message.asDict()
+    msgtype = message.msgtype
+
+    if msgtype in position_types:
+      target.msgtype = msgtype
+      target.positionTime = now
+      if message.hasPosition():
+        position = message.getPosition()
+        target.latitude = position.latitude
+        target.longitude = position.longitude
+      else:
+        target.latitude = target.longitude = None
+      if msgtype == 27:
+        # knots and degrees
+        target.speed = _available(values.get("speed"), 63, 1.0)
+        target.course = _available(values.get("course"), 511, 1.0)
+      else:
+        target.speed = _available(values.get("speed"), 1023, 10.0)
+        target.course = _available(values.get("course"), 3600, 10.0)
+      target.heading = _available(values.get("heading"), 511, None)
+      target.status = values.get("status")
+
+    if msgtype in static_types:
+      static = dict(target.static)
+      for name in static_fields:
+        if name in values:
+          static[name] = values[name]
+      target.static = static
+    return target
+
+  def hasPosition(self):
+    return (self.latitude <> None) and (self.longitude <> None)
+
+  def getPosition(self):
+    """ returns the position as GPSPosition or raises NMEANoValidFix """
+    if not self.hasPosition():
+      raise NMEANoValidFix
+    return NMEAutils.GPSPosition(self.latitude, self.longitude)
+
+  def getStatic(self, name, default=None):
+    """ returns a static field (e.g. "shipname", "callsign" or "shiptype") """
+    return self.static.get(name, default)
+
+  def getAge(self, now=None):
+    """ returns the seconds since the last message of the target """
+    if now == None:
+      now = time.time()
+    return now - self.updated
+
+def _available(value, oob, scale):
+  if (value == None) or (value >= oob):
+    return None
+  if scale == None:
+    return value
+  return value / scale
+
+class AISTargetTable(object):
+  """ AISTargetTable - Live table of the AIS targets keyed by MMSI
+
+  update() merges the position reports (types 1-3, 18, 19, 27) and the static data
+  (types 5, 19, 24) of an AISMessage into the target of its MMSI. attach() subscribes
+  the table to the AIS messages of a GPSReader (or NMEADecoder):
+
+    targets = AISTargetTable()
+    targets.attach(reader)
+    for (distance, target) in targets.getTargetsAround(reader, 5.0):
+      ...
+
+  Targets which haven't been heard for timeout seconds are removed. The positions
+  are kept in a grid of cellsize degrees, getTargetsWithin() only looks at the
+  cells which overlap the queried circle. The table can be updated and queried from
+  different threads. """
+  def __init__(self, timeout=target_timeout, cellsize=grid_cellsize):
+    self._timeout = timeout
+    self._cellsize = cellsize
+    self._columns = int(round(360.0 / cellsize))
+    self._targets = dict()    # mmsi -> AISTarget
+    self._grid = dict()       # (row, column) -> set of mmsi
+    self._lock = threading.Lock()
+    self._lastExpire = 0.0
+
+  def __len__(self):
+    return len(self._targets)
+
+  def attach(self, decoder):
+    """ Subscribes the table to the AIS messages of a GPSReader or NMEADecoder """
+    decoder.subscribe(NMEAevents.EVENT_AIS, self.update)
+
+  def detach(self, decoder):
+    decoder.unsubscribe(NMEAevents.EVENT_AIS, self.update)
+
+  def _getCell(self, latitude, longitude):
+    column = int(math.floor(longitude / self._cellsize))
+    half = self._columns / 2
+    return (int(math.floor(latitude / self._cellsize)), (column + half) % self._columns - half)
+
+  def update(self, message, now=None):
+    """ Merges an AISMessage into the target of its MMSI. Returns the updated target
+    or None if the message type contains neither a position nor static data. """
+    msgtype = message.msgtype
+    if (msgtype not in position_types) and (msgtype not in static_types):
+      return None
+    if now == None:
+      now = time.time()
+
+    self._lock.acquire()
+    try:
+      old = self._targets.get(message.mmsi)
+      if old == None:
+        old = AISTarget(message.mmsi)
+      target = old.merge(message, now)
+
+      cell = None
+      if target.hasPosition():
+        cell = self._getCell(target.latitude, target.longitude)
+      if cell <> old.cell:
+        self._removeFromGrid(old)
+        if cell <> None:
+          self._grid.setdefault(cell, set()).add(target.mmsi)
+      target.cell = cell
+      self._targets[target.mmsi] = target
+
+      if now - self._lastExpire >= expire_interval:
+        self._expire(now)
+      return target
+    finally:
+      self._lock.release()
+
+  def _removeFromGrid(self, target):
+    if target.cell == None:
+      return
+    members = self._grid.get(target.cell)
+    if members <> None:
+      members.discard(target.mmsi)
+      if not members:
+        del self._grid[target.cell]
+
+  def _expire(self, now):
+    self._lastExpire = now
+    for target in [ t for t in self._targets.itervalues() if now - t.updated > self._timeout ]:
+      self._removeFromGrid(target)
+      del self._targets[target.mmsi]
+
+  def expire(self, now=None):
+    """ Removes the targets which haven't been heard for timeout seconds. Called by
+    update() every expire_interval seconds, the queries skip these targets anyway. """
+    if now == None:
+      now = time.time()
+    self._lock.acquire()
+    try:
+      self._expire(now)
+    finally:
+      self._lock.release()
+
+  def getTarget(self, mmsi):
+    """ returns the AISTarget of a MMSI or None """
+    return self._targets.get(mmsi)
+
+  def getTargets(self):
+    """ returns a list of all targets """
+    self._lock.acquire()
+    try:
+      return self._targets.values()
+    finally:
+      self._lock.release()
+
+  def getTargetsWithin(self, position, distance, now=None):
+    """ returns the targets within distance nautical miles of position (GPSPosition)
+    as list of (distance in nm, AISTarget) tuples, the nearest target first """
+    if (position.latitude == None) or (position.longitude == None):
+      raise NMEANoValidFix
+    if now == None:
+      now = time.time()
+    latitude = position.latitude
+    longitude = position.longitude
+    cellsize = self._cellsize
+
+    # Bounding box of the circle in cells
+    dlat = distance / 60.0
+    rows = (int(math.floor(max(latitude - dlat, -90.0) / cellsize)),
+            int(math.floor(min(latitude + dlat, 90.0) / cellsize)))
+    widest = min(abs(latitude) + dlat, 90.0)
+    if widest < 89.0:
+      dlon = dlat / math.cos(math.radians(widest))
+    else:
+      dlon = 180.0
+    columns = (int(math.floor((longitude - dlon) / cellsize)),
+               int(math.floor((longitude + dlon) / cellsize)))
+    ncolumns = min(columns[1] - columns[0] + 1, self._columns)
+
+    result = list()
+    self._lock.acquire()
+    try:
+      grid = self._grid
+      if (rows[1] - rows[0] + 1) * ncolumns > len(grid):
+        # The circle covers more cells than are occupied
+        cells = grid.keys()
+        if ncolumns < self._columns:
+          wanted = set([ self._getCell(0.0, c * cellsize + cellsize / 2)[1]
+                         for c in xrange(columns[0], columns[1] + 1) ])
+          cells = [ cell for cell in cells if cell[1] in wanted ]
+        cells = [ cell for cell in cells if rows[0] <= cell[0] <= rows[1] ]
+      else:
+        cells = list()
+        for row in xrange(rows[0], rows[1] + 1):
+          for column in xrange(columns[0], columns[0] + ncolumns):
+            cells.append(self._getCell(row * cellsize + cellsize / 2, column * cellsize + cellsize / 2))
+
+      targets = self._targets
+      for cell in cells:
+        for mmsi in grid.get(cell, ()):
+          target = targets[mmsi]
+          if now - target.updated > self._timeout:
+            continue
+          d = calculateDistance(latitude, longitude, target.latitude, target.longitude)
+          if d <= distance:
+            result.append( (d, target) )
+    finally:
+      self._lock.release()
+    result.sort(key=lambda item: item[0])
+    return result
+
+  def getTargetsAround(self, decoder, distance, now=None):
+    """ Same as getTargetsWithin() around the own ship, the position of the last RMC
+    of a GPSReader or NMEADecoder. Raises NMEANoValidFix without a valid RMC. """
+    rmc = decoder.RMC
+    if not rmc.hasFix():
+      raise NMEANoValidFix
+    return self.getTargetsWithin(rmc.getPosition(), distance, now)
+
+################ TEST #####################################################
+if __name__ == '__main__':
+  import NMEAdecoder
+
+  decoder = NMEAdecoder.NMEADecoder()
+  targets = AISTargetTable()
+  targets.attach(decoder)
+
+  # Type 27 long-range position reports create and move a target
+  decoder.decodeSentence("!AIVDM,1,1,,B,K39>JhP0G=3s@65`,0*01")
+  target = targets.getTarget(211000002)
+  assert (target <> None) and (target.msgtype == 27)
+  assert (round(target.latitude, 3), round(target.longitude, 3)) == (53.6, 9.9)
+  assert (target.speed, target.course) == (12.0, 90.0)
+
+  decoder.decodeSentence("!AIVDM,1,1,,B,K39>JhP0GDSsO65`,0*17")
+  target = targets.getTarget(211000002)
+  assert (round(target.latitude, 3), round(target.longitude, 3)) == (53.65, 9.95)
+  own = NMEAutils.GPSPosition(53.6, 9.9)
+  assert [ t.mmsi for (d, t) in targets.getTargetsWithin(own, 5.0) ] == [211000002]
+  assert targets.getTargetsWithin(own, 1.0) == []
+  print target, target.latitude, target.longitude
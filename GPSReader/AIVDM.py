@@ -0,0 +1,1363 @@
+#!/usr/bin/env python
+#
+# A Python AIVDM/AIVDO decoder
+#
+# This file is Copyright (c) 2010 by the GPSD project
+# BSD terms apply: see the file COPYING in the distribution root for details.
+#
+# This decoder works by defining a declarative pseudolanguage in which
+# to describe the process of extracting packed bitfields from an AIS
+# message, a set of tables which contain instructions in the pseudolanguage,
+# and a small amount of code for interpreting it.
+#
+# Known bugs:
+# * Parts A and B of Type 24 are only joined on request (join24, -a).
+# * Only handles the broadcast case of type 22.  The problem is that the
+#   addressed field is located *after* the variant parts. Grrrr... 
+# * Message type 26 is presently unsupported. It hasn't been observed
+#   in the wild yet as of Jan 2010; not a lot of point in trying util
+#   we have test data.  We'd need new machinery to constrain how many
+#   bits the data spec eats in order to recover the radio bits after it.
+# * No support for IMO236 and IMO289 special messages in types 6 and 8 yet.
+#
+# Decoding for 1-15, 18-21, and 24 have been tested against live data.
+# Decoding for 16-17, 22-23, and 25-27 have not.
+
+# Here are the pseudoinstructions in the pseudolanguage.
+
+class bitfield:
+    "Object defining the interpretation of an AIS bitfield."
+    # The only un-obvious detail is the use of the oob (out-of-band)
+    # member.  This isn't used in data extraction, but rather to cut
+    # down on the number of custom formatting hooks.  With this we
+    # handle the case where the field should be reported as an integer
+    # or "n/a".
+    def __init__(self, name, width, dtype, oob, legend,
+                 validator=None, formatter=None, conditional=None):
+        self.name = name		# Fieldname, for internal use and JSON
+        self.width = width		# Bit width
+        self.type = dtype		# Data type: signed/unsigned/string/raw
+        self.oob = oob			# Out-of-band value to be shown as n/a
+        self.legend = legend		# Human-friendly description of field
+        self.validator = validator	# Validation checker
+        self.formatter = formatter	# Custom reporting hook.
+        self.conditional = conditional	# Evaluation guard for this field
+
+class spare:
+    "Describes spare bits,, not to be interpreted."
+    def __init__(self, width, conditional=None):
+        self.width = width
+        self.conditional = conditional	# Evaluation guard for this field
+
+class dispatch:
+    "Describes how to dispatch to a message type variant on a subfield value."
+    def __init__(self, fieldname, subtypes, compute=lambda x: x, conditional=None):
+        self.fieldname = fieldname	# Value of view to dispatch on
+        self.subtypes = subtypes	# Possible subtypes to dispatch to
+        self.compute = compute		# Pass value through this pre-dispatch
+        self.conditional = conditional	# Evaluation guard for this field
+
+# Message-type-specific information begins here. There are four
+# different kinds of things in it: (1) string tables for expanding
+# enumerated-type codes, (2) hook functions, (3) instruction tables,
+# and (4) field group declarations.  This is the part that could, in
+# theory, be generated from a portable higher-level specification in
+# XML; only the hook functions are actually language-specific, and
+# your XML definition could in theory embed several different ones for
+# code generation in Python, Java, Perl, etc.
+
+cnb_status_legends = (
+	"Under way using engine",
+	"At anchor",
+	"Not under command",
+	"Restricted manoeuverability",
+	"Constrained by her draught",
+	"Moored",
+	"Aground",
+	"Engaged in fishing",
+	"Under way sailing",
+	"Reserved for HSC",
+	"Reserved for WIG",
+	"Reserved",
+	"Reserved",
+	"Reserved",
+	"Reserved",
+	"Not defined",
+    )
+
+def cnb_rot_format(n):
+    if n == -128:
+        return "n/a"
+    elif n == -127:
+        return "fastleft"
+    elif n == 127:
+        return "fastright"
+    else:
+        return str((n / 4.733) ** 2);
+
+def cnb_latlon_format(n):
+    return str(n / 600000.0)
+
+def cnb_speed_format(n):
+    if n == 1023:
+        return "n/a"
+    elif n == 1022:
+        return "fast"
+    else:
+        return str(n / 10.0);
+
+def cnb_course_format(n):
+    return str(n / 10.0);
+
+def cnb_second_format(n):
+    if n == 60:
+        return "n/a"
+    elif n == 61:
+        return "manual input"
+    elif n == 62:
+        return "dead reckoning"
+    elif n == 63:
+        return "inoperative"
+    else:
+        return str(n);
+
+# Common Navigation Block is the format for AIS types 1, 2, and 3
+cnb = (
+    bitfield("status",   4, 'unsigned', 0,         "Navigation Status",
+             formatter=cnb_status_legends),
+    bitfield("turn",     8, 'signed',   -128,      "Rate of Turn",
+             formatter=cnb_rot_format),       
+    bitfield("speed",   10, 'unsigned', 1023,      "Speed Over Ground",
+             formatter=cnb_speed_format),
+    bitfield("accuracy", 1, 'unsigned', None,      "Position Accuracy"),
+    bitfield("lon",     28, 'signed',   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",     27, 'signed',   0x3412140,  "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("course",  12, 'unsigned',	0xe10,      "Course Over Ground",
+             formatter=cnb_course_format),
+    bitfield("heading",  9, 'unsigned', 511,        "True Heading"),
+    bitfield("second",   6, 'unsigned', None,       "Time Stamp",
+             formatter=cnb_second_format),
+    bitfield("maneuver", 2, 'unsigned', None,       "Maneuver Indicator"),
+    spare(3),  
+    bitfield("raim",     1, 'unsigned', None,       "RAIM flag"),
+    bitfield("radio",   19, 'unsigned', None,       "Radio status"),
+)
+
+epfd_type_legends = (
+	"Undefined",
+	"GPS",
+	"GLONASS",
+	"Combined GPS/GLONASS",
+	"Loran-C",
+	"Chayka",
+	"Integrated navigation system",
+	"Surveyed",
+	"Galileo",
+    )
+
+type4 = (
+    bitfield("year",    14,  "unsigned", 0,         "Year"),
+    bitfield("month",    4,  "unsigned", 0,         "Month"),
+    bitfield("day",      5,  "unsigned", 0,         "Day"),
+    bitfield("hour",     5,  "unsigned", 24,        "Hour"),
+    bitfield("minute",   6,  "unsigned", 60,        "Minute"),
+    bitfield("second",   6,  "unsigned", 60,        "Second"),
+    bitfield("accuracy", 1,  "unsigned", None,      "Fix quality"),
+    bitfield("lon",     28,  "signed",   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",     27,  "signed",   0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("epfd",     4,  "unsigned", None,      "Type of EPFD",
+             validator=lambda n: n >= 0 and n <= 8 or n == 15,
+             formatter=epfd_type_legends),
+    spare(10),
+    bitfield("raim",     1,  "unsigned", None,      "RAIM flag "),
+    bitfield("radio",   19,  "unsigned", None,      "SOTDMA state"),
+    )
+
+ship_type_legends = (
+	"Not available",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Wing in ground (WIG) - all ships of this type",
+	"Wing in ground (WIG) - Hazardous category A",
+	"Wing in ground (WIG) - Hazardous category B",
+	"Wing in ground (WIG) - Hazardous category C",
+	"Wing in ground (WIG) - Hazardous category D",
+	"Wing in ground (WIG) - Reserved for future use",
+	"Wing in ground (WIG) - Reserved for future use",
+	"Wing in ground (WIG) - Reserved for future use",
+	"Wing in ground (WIG) - Reserved for future use",
+	"Wing in ground (WIG) - Reserved for future use",
+	"Fishing",
+	"Towing",
+	"Towing: length exceeds 200m or breadth exceeds 25m",
+	"Dredging or underwater ops",
+	"Diving ops",
+	"Military ops",
+	"Sailing",
+	"Pleasure Craft",
+	"Reserved",
+	"Reserved",
+	"High speed craft (HSC) - all ships of this type",
+	"High speed craft (HSC) - Hazardous category A",
+	"High speed craft (HSC) - Hazardous category B",
+	"High speed craft (HSC) - Hazardous category C",
+	"High speed craft (HSC) - Hazardous category D",
+	"High speed craft (HSC) - Reserved for future use",
+	"High speed craft (HSC) - Reserved for future use",
+	"High speed craft (HSC) - Reserved for future use",
+	"High speed craft (HSC) - Reserved for future use",
+	"High speed craft (HSC) - No additional information",
+	"Pilot Vessel",
+	"Search and Rescue vessel",
+	"Tug",
+	"Port Tender",
+	"Anti-pollution equipment",
+	"Law Enforcement",
+	"Spare - Local Vessel",
+	"Spare - Local Vessel",
+	"Medical Transport",
+	"Ship according to RR Resolution No. 18",
+	"Passenger - all ships of this type",
+	"Passenger - Hazardous category A",
+	"Passenger - Hazardous category B",
+	"Passenger - Hazardous category C",
+	"Passenger - Hazardous category D",
+	"Passenger - Reserved for future use",
+	"Passenger - Reserved for future use",
+	"Passenger - Reserved for future use",
+	"Passenger - Reserved for future use",
+	"Passenger - No additional information",
+	"Cargo - all ships of this type",
+	"Cargo - Hazardous category A",
+	"Cargo - Hazardous category B",
+	"Cargo - Hazardous category C",
+	"Cargo - Hazardous category D",
+	"Cargo - Reserved for future use",
+	"Cargo - Reserved for future use",
+	"Cargo - Reserved for future use",
+	"Cargo - Reserved for future use",
+	"Cargo - No additional information",
+	"Tanker - all ships of this type",
+	"Tanker - Hazardous category A",
+	"Tanker - Hazardous category B",
+	"Tanker - Hazardous category C",
+	"Tanker - Hazardous category D",
+	"Tanker - Reserved for future use",
+	"Tanker - Reserved for future use",
+	"Tanker - Reserved for future use",
+	"Tanker - Reserved for future use",
+	"Tanker - No additional information",
+	"Other Type - all ships of this type",
+	"Other Type - Hazardous category A",
+	"Other Type - Hazardous category B",
+	"Other Type - Hazardous category C",
+	"Other Type - Hazardous category D",
+	"Other Type - Reserved for future use",
+	"Other Type - Reserved for future use",
+	"Other Type - Reserved for future use",
+	"Other Type - Reserved for future use",
+	"Other Type - no additional information",
+)
+
+type5 = (
+    bitfield("ais_version",   2, 'unsigned', None, "AIS Version"),
+    bitfield("imo_id",       30, 'unsigned',    0, "IMO Identification Number"),
+    bitfield("callsign",     42, 'string',   None, "Call Sign"),              
+    bitfield("shipname",    120, 'string',   None, "Vessel Name"),
+    bitfield("shiptype",      8, 'unsigned', None, "Ship Type",
+             #validator=lambda n: n >= 0 and n <= 99,
+             formatter=ship_type_legends),
+    bitfield("to_bow",        9, 'unsigned',    0, "Dimension to Bow"),
+    bitfield("to_stern",      9, 'unsigned',    0, "Dimension to Stern"),
+    bitfield("to_port",       6, 'unsigned',    0, "Dimension to Port"),
+    bitfield("to_starbord",   6, 'unsigned',    0, "Dimension to Starboard"),
+    bitfield("epfd",          4, 'unsigned',    0, "Position Fix Type",
+             validator=lambda n: n >= 0 and n <= 8 or n == 15,
+             formatter=epfd_type_legends),
+    bitfield("month",         4, 'unsigned',    0, "ETA month"),
+    bitfield("day",           5, 'unsigned',    0, "ETA day"),
+    bitfield("hour",          5, 'unsigned',   24, "ETA hour"),
+    bitfield("minute",        6, 'unsigned',   60, "ETA minute"),
+    bitfield("draught",       8, 'unsigned',    0, "Draught",
+             formatter=lambda n: n/10.0),
+    bitfield("destination", 120, 'string',   None, "Destination"),
+    bitfield("dte",           1, 'unsigned', None, "DTE"),
+    spare(1),
+    )
+
+type6 = (
+    bitfield("seqno",            2, 'unsigned', None, "Sequence Number"),
+    bitfield("dest_mmsi",       30, 'unsigned', None, "Destination MMSI"),
+    bitfield("retransmit",       1, 'unsigned', None, "Retransmit flag"),
+    spare(1),
+    bitfield("dac",             10, 'unsigned', 0,    "DAC"),
+    bitfield("fid",              6, 'unsigned', 0,    "Functional ID"),
+    bitfield("data",           920, 'raw',      None, "Data"),
+    )
+
+type7 = (
+    spare(2),
+    bitfield("mmsi1",           30, 'unsigned', 0,    "MMSI number 1"),
+    spare(2),
+    bitfield("mmsi2",           30, 'unsigned', 0,    "MMSI number 2"),
+    spare(2),
+    bitfield("mmsi3",           30, 'unsigned', 0,    "MMSI number 3"),
+    spare(2),
+    bitfield("mmsi1",           30, 'unsigned', 0,    "MMSI number 4"),
+    spare(2),
+    )
+
+type8 = (
+    spare(2),
+    bitfield("dac",            10,  'unsigned', 0,     "DAC"),
+    bitfield("fid",            6,   'unsigned', 0,     "Functional ID"),
+    bitfield("data",           952, 'raw',      None,  "Data"),
+    )
+
+def type9_alt_format(n):
+    if n == 4094:
+        return ">=4094"
+    else:
+        return str(n)
+
+def type9_speed_format(n):
+    if n == 1023:
+        return "n/a"
+    elif n == 1022:
+        return "fast"
+    else:
+        return str(n);
+
+type9 = (
+    bitfield("alt",         12, 'unsigned', 4095,      "Altitude",
+             formatter=type9_alt_format),
+    bitfield("speed",       10, 'unsigned', 1023,      "SOG",
+             formatter=type9_speed_format),
+    bitfield("accuracy",    1,  'unsigned', None,      "Position Accuracy"),
+    bitfield("lon",         28, 'signed',   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",         27, 'signed',   0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("course",      12, 'unsigned', 0xe10,     "Course Over Ground",
+             formatter=cnb_course_format),
+    bitfield("second",      6,  'unsigned', 60,        "Time Stamp",
+             formatter=cnb_second_format),
+    bitfield("regional",    8,  'unsigned', None,      "Regional reserved"),
+    bitfield("dte",         1,  'unsigned', None,      "DTE"),
+    spare(3),
+    bitfield("assigned",    1,  'unsigned', None,      "Assigned"),
+    bitfield("raim",        1,  'unsigned', None,      "RAIM flag"),
+    bitfield("radio",       19, 'unsigned', None,      "Radio status"),
+    )
+
+type10 = (
+    spare(2),
+    bitfield("dest_mmsi",       30, 'unsigned', None, "Destination MMSI"), 
+    spare(2),
+   )
+
+type12 = (
+    bitfield("seqno",            2, 'unsigned', None, "Sequence Number"),
+    bitfield("dest_mmsi",       30, 'unsigned', None, "Destination MMSI"),
+    bitfield("retransmit",       1, 'unsigned', None, "Retransmit flag"),
+    spare(1),
+    bitfield("text",           936, 'string',   None, "Text"),
+    )
+
+type14 = (
+    spare(2),
+    bitfield("text",           968, 'string',   None, "Text"),
+    )
+
+type15 = (
+    spare(2),
+    bitfield("mmsi1",     30, 'unsigned', 0, "First interrogated MMSI"),
+    bitfield("type1_1",   6,  'unsigned', 0, "First message type"),
+    bitfield("offset1_1", 12, 'unsigned', 0, "First slot offset"),
+    spare(2),
+    bitfield("type1_2",   6,  'unsigned', 0, "Second message type"),
+    bitfield("offset1_2", 12, 'unsigned', 0, "Second slot offset"),
+    spare(2),
+    bitfield("mmsi2",     30, 'unsigned', 0, "Second interrogated MMSI"),
+    bitfield("type2_1",   6,  'unsigned', 0, "Message type"),
+    bitfield("offset2_1", 12, 'unsifned', 0, "Slot offset"),
+    spare(2),
+    )
+
+type16 = (
+    spare(2),
+    bitfield("mmsi1",     30, 'unsigned', 0, "Interrogated MMSI 1"),
+    bitfield("offset1",   12, 'unsigned', 0, "First slot offset"),
+    bitfield("increment1",10, 'unsigned', 0, "First slot increment"),
+    bitfield("mmsi2",     30, 'unsigned', 0, "Interrogated MMSI 2"),
+    bitfield("offset2",   12, 'unsigned', 0, "Second slot offset"),
+    bitfield("increment2",10, 'unsigned', 0, "Second slot increment"),
+    spare(2),
+    )
+
+def short_latlon_format(n):
+    return str(n / 600.0)
+
+type17 = (
+    spare(2),
+    bitfield("lon",         18, 'signed',   0x1a838, "Longitude",
+             formatter=short_latlon_format),
+    bitfield("lat",         17, 'signed',   0xd548,  "Latitude",
+             formatter=short_latlon_format),
+    spare(5),
+    bitfield("data",      736,  'raw',      None,    "DGNSS data"),
+    )
+
+type18 = (
+    bitfield("reserved",    8,  'unsigned', None,      "Regional reserved"),
+    bitfield("speed",       10, 'unsigned', 1023,      "Speed Over Ground",
+             formatter=cnb_speed_format),
+    bitfield("accuracy",    1,  'unsigned', None,      "Position Accuracy"),
+    bitfield("lon",         28, 'signed',   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",         27, 'signed',   0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("course",      12, 'unsigned', 0xE10,     "Course Over Ground",
+             formatter=cnb_course_format),
+    bitfield("heading",     9,  'unsigned', 511,       "True Heading"),
+    bitfield("second",      6,  'unsigned', None,      "Time Stamp",
+             formatter=cnb_second_format),
+    bitfield("regional",    2,  'unsigned', None,      "Regional reserved"),
+    bitfield("cs",          1,  'unsigned', None,      "CS Unit"),
+    bitfield("display",     1,  'unsigned', None,      "Display flag"),
+    bitfield("dsc",         1,  'unsigned', None,      "DSC flag"),
+    bitfield("band",        1,  'unsigned', None,      "Band flag"),
+    bitfield("msg22",       1,  'unsigned', None,      "Message 22 flag"),
+    bitfield("assigned",    1,  'unsigned', None,      "Assigned"),
+    bitfield("raim",        1,  'unsigned', None,      "RAIM flag"),
+    bitfield("radio",       20, 'unsigned', None,      "Radio status"),
+    )
+
+type19 = (
+    bitfield("reserved",    8,  'unsigned', None,      "Regional reserved"),
+    bitfield("speed",       10, 'unsigned', 1023,      "Speed Over Ground",
+             formatter=cnb_speed_format),
+    bitfield("accuracy",    1,  'unsigned', None,      "Position Accuracy"),
+    bitfield("lon",         28, 'signed',   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",         27, 'signed',   0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("course",      12, 'unsigned', 0xE10,     "Course Over Ground",
+             formatter=cnb_course_format),
+    bitfield("heading",     9,  'unsigned', 511,       "True Heading"),
+    bitfield("second",      6,  'unsigned', None,      "Time Stamp",
+             formatter=cnb_second_format),
+    bitfield("regional",    4,  'unsigned', None,      "Regional reserved"),
+    bitfield("shipname",  120,  'string',   None,      "Vessel Name"),
+    bitfield("shiptype",    8,  'unsigned', None,      "Ship Type",
+             #validator=lambda n: n >= 0 and n <= 99,
+             formatter=ship_type_legends),
+    bitfield("to_bow",      9,  'unsigned', 0,         "Dimension to Bow"),
+    bitfield("to_stern",    9,  'unsigned', 0,         "Dimension to Stern"),
+    bitfield("to_port",     6,  'unsigned', 0,         "Dimension to Port"),
+    bitfield("to_starbord", 6,  'unsigned', 0,         "Dimension to Starboard"),
+    bitfield("epfd",        4,  'unsigned', 0,         "Position Fix Type",
+             validator=lambda n: n >= 0 and n <= 8 or n == 15,
+             formatter=epfd_type_legends),
+    bitfield("assigned",    1,  'unsigned', None,      "Assigned"),
+    bitfield("raim",        1,  'unsigned', None,      "RAIM flag"),
+    bitfield("radio",       20, 'unsigned', None,      "Radio status"),
+    )
+
+type20 = (
+    spare(2),
+    bitfield("offset1",    12, 'unsigned', 0, "Offset number"),
+    bitfield("number1",     4, 'unsigned', 0, "Reserved slots"),
+    bitfield("timeout1",    3, 'unsigned', 0, "Time-out"),
+    bitfield("increment1", 11, 'unsigned', 0, "Increment"),
+    bitfield("offset2",    12, 'unsigned', 0, "Offset number 2"),
+    bitfield("number2",     4, 'unsigned', 0, "Reserved slots"),
+    bitfield("timeout2",    3, 'unsigned', 0, "Time-out"),
+    bitfield("increment2", 11, 'unsigned', 0, "Increment"),
+    bitfield("offset3",    12, 'unsigned', 0, "Offset number 3"),
+    bitfield("number3",     4, 'unsigned', 0, "Reserved slots"),
+    bitfield("timeout3",    3, 'unsigned', 0, "Time-out"),
+    bitfield("increment3", 11, 'unsigned', 0, "Increment"),
+    bitfield("offset4",    12, 'unsigned', 0, "Offset number 4"),
+    bitfield("number4",     4, 'unsigned', 0, "Reserved slots"),
+    bitfield("timeout4",    3, 'unsigned', 0, "Time-out"),
+    bitfield("increment4", 11, 'unsigned', 0, "Increment"),
+    )
+
+aide_type_legends = (
+	"Unspecified",
+	"Reference point",
+	"RACON",
+	"Fixed offshore structure",
+	"Spare, Reserved for future use.",
+	"Light, without sectors",
+	"Light, with sectors",
+	"Leading Light Front",
+	"Leading Light Rear",
+	"Beacon, Cardinal N",
+	"Beacon, Cardinal E",
+	"Beacon, Cardinal S",
+	"Beacon, Cardinal W",
+	"Beacon, Port hand",
+	"Beacon, Starboard hand",
+	"Beacon, Preferred Channel port hand",
+	"Beacon, Preferred Channel starboard hand",
+	"Beacon, Isolated danger",
+	"Beacon, Safe water",
+	"Beacon, Special mark",
+	"Cardinal Mark N",
+	"Cardinal Mark E",
+	"Cardinal Mark S",
+	"Cardinal Mark W",
+	"Port hand Mark",
+	"Starboard hand Mark",
+	"Preferred Channel Port hand",
+	"Preferred Channel Starboard hand",
+	"Isolated danger",
+	"Safe Water",
+	"Special Mark",
+	"Light Vessel / LANBY / Rigs",
+        )
+
+type21 = (
+    bitfield("aid_type",        5, 'unsigned',  0,         "Aid type",
+             formatter=aide_type_legends),
+    bitfield("name",          120, 'string',    None,      "Name"),
+    bitfield("accuracy",        1, 'unsigned',  0,         "Position Accuracy"),
+    bitfield("lon",            28, 'signed',    0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",            27, 'signed',    0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("to_bow",          9, 'unsigned',  0,         "Dimension to Bow"),
+    bitfield("to_stern",        9, 'unsigned',  0,         "Dimension to Stern"),
+    bitfield("to_port",         6, 'unsigned',  0,         "Dimension to Port"),
+    bitfield("to_starboard",    6, 'unsigned',  0,         "Dimension to Starboard"),
+    bitfield("epfd",            4, 'unsigned',  0,         "Position Fix Type",
+             validator=lambda n: n >= 0 and n <= 8 or n == 15,
+             formatter=epfd_type_legends),
+    bitfield("second",          6, 'unsigned',  0,         "UTC Second"),
+    bitfield("off_position",    1, 'unsigned',  0,         "Off-Position Indicator"),
+    bitfield("regional",        8, 'unsigned',  0,         "Regional reserved"),
+    bitfield("raim",            1, 'unsigned',  0,         "RAIM flag"),
+    bitfield("virtual_aid",     1, 'unsigned',  0,         "Virtual-aid flag"),
+    bitfield("assigned",        1, 'unsigned',  0,         "Assigned-mode flag"),
+    spare(1),
+    bitfield("name",           88, 'string',    0,         "Name Extension"),
+    )
+
+type22 = (
+    spare(2),
+    bitfield("channel_a", 12, 'unsigned',  0,       "Channel A"),
+    bitfield("channel_b", 12, 'unsigned',  0,       "Channel B"),
+    bitfield("txrx",       4, 'unsigned',  0,       "Tx/Rx mode"),
+    bitfield("power",      1, 'unsigned',  0,       "Power"),
+    bitfield("ne_lon",    18, 'signed',    0x1a838, "NE Longitude",
+             formatter=short_latlon_format),
+    bitfield("ne_lat",    17, 'signed',    0xd548,  "NE Latitude",
+             formatter=short_latlon_format),
+    bitfield("sw_lon",    18, 'signed',    0x1a838, "SW Longitude",
+             formatter=short_latlon_format),
+    bitfield("sw_lat",    17, 'signed',    0xd548,  "SW Latitude",
+             formatter=short_latlon_format),
+    bitfield("addressed",  1, 'unsigned',  0,       "Addressed"),
+    bitfield("band_a",     1, 'unsigned',  0,       "Channel A Band"),
+    bitfield("band_a",     1, 'unsigned',  0,       "Channel A Band"),
+    bitfield("zonesize",   3, 'unsigned',  0,       "Zone size"),
+    spare(23),
+    )
+
+station_type_legends = (
+	"All types of mobiles",
+	"Reserved for future use",
+	"All types of Class B mobile stations",
+	"SAR airborne mobile station",
+	"Aid to Navigation station",
+	"Class B shipborne mobile station",
+	"Regional use and inland waterways",
+	"Regional use and inland waterways",
+	"Regional use and inland waterways",
+	"Regional use and inland waterways",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+	"Reserved for future use",
+        )
+
+type23 = (
+    spare(2),
+    bitfield("ne_lon",    18, 'signed',    0x1a838, "NE Longitude",
+             formatter=short_latlon_format),
+    bitfield("ne_lat",    17, 'signed',    0xd548,  "NE Latitude",
+             formatter=short_latlon_format),
+    bitfield("sw_lon",    18, 'signed',    0x1a838, "SW Longitude",
+             formatter=short_latlon_format),
+    bitfield("sw_lat",    17, 'signed',    0xd548,  "SW Latitude",
+             formatter=short_latlon_format),
+    bitfield("stationtype",4, 'unsigned',  0,       "Station Type",
+             validator=lambda n: n >= 0 and n <= 31,
+             formatter=station_type_legends),
+    bitfield("shiptype",   8, 'unsigned',  0,       "Ship Type",
+             #validator=lambda n: n >= 0 and n <= 99,
+             formatter=ship_type_legends),
+    spare(22),
+    bitfield("txrx",       2, 'unsigned',  0,       "Tx/Rx mode"),
+    bitfield("interval",   4, 'unsigned',  0,       "Reporting interval"),
+    bitfield("txrx",       4, 'unsigned',  0,       "Quiet time"),
+    )
+
+type24a = (
+    bitfield("shipname",    120, 'string',   None, "Vessel Name"),
+    spare(8),
+    )
+
+
+type24b1 = (
+    bitfield("callsign",     42, 'string',   None, "Call Sign"),              
+    bitfield("to_bow",        9, 'unsigned',    0, "Dimension to Bow"),
+    bitfield("to_stern",      9, 'unsigned',    0, "Dimension to Stern"),
+    bitfield("to_port",       6, 'unsigned',    0, "Dimension to Port"),
+    bitfield("to_starbord",   6, 'unsigned',    0, "Dimension to Starboard"),
+    spare(8),
+    )
+
+type24b2 = (
+    bitfield('mothership_mmsi', 30, 'unsigned',    0, "Mothership MMSI"),
+    spare(8),
+    )
+
+type24b = (
+    bitfield("shiptype",      8, 'unsigned', None, "Ship Type",
+             validator=lambda n: n >= 0 and n <= 99,
+             formatter=ship_type_legends),
+    bitfield("vendorid",     42, 'string',   None, "Vendor ID"),
+    dispatch("mmsi", {0:type24b1, 1:type24b2}, lambda m: 1 if `m`[:2]=='98' else 0),
+    )
+
+type24 = (
+    bitfield('partno', 2, 'unsigned', None, "Part Number"),
+    dispatch('partno', {0:type24a, 1:type24b}),
+    )
+
+type25 = (
+    bitfield("addressed",     1, 'unsigned',    None, "Addressing flag"),
+    bitfield("structured",    1, 'unsigned',    None, "Dimension to Bow"),
+    bitfield("dest_mmsi",    30, 'unsigned',       0, "Destinstion MMSI",
+             conditional=lambda i, v: v["addressed"]),
+    bitfield("app_id",       16, 'unsigned',       0, "Application ID",
+             conditional=lambda i, v: v["structured"]),
+    bitfield("data",       None, 'raw',         None, "Data"),
+    )
+
+# No type 26 handling yet,
+
+type27 = (
+    bitfield("accuracy", 1,  'unsigned', None,      "Position Accuracy"),
+    bitfield("raim",     1,  'unsigned', None,      "RAIM flag"),
+    bitfield("status",   4,  'unsigned', 0,         "Navigation Status",
+             formatter=cnb_status_legends),
+    bitfield("lon",      18, 'signed',   0x1a838,   "Longitude",
+             formatter=short_latlon_format),
+    bitfield("lat",      17, 'signed',   0xd548,    "Latitude",
+             formatter=short_latlon_format),
+    bitfield("speed",     6, 'unsigned', 63,        "Speed Over Ground",
+             formatter=cnb_speed_format),
+    bitfield("course",    9, 'unsigned', 511,       "Course Over Ground"),
+    bitfield("GNSS",      1, 'unsigned', None,      "GNSS flag"),
+    spare(1),  
+    )
+
+aivdm_decode = (
+    bitfield('msgtype',       6, 'unsigned',    0, "Message Type",
+        validator=lambda n: n > 0 and n <= 27),
+    bitfield('repeat',	      2, 'unsigned', None, "Repeat Indicator"),
+    bitfield('mmsi',         30, 'unsigned',    0, "MMSI"),
+    # This is the master dispatch on AIS message type
+    dispatch('msgtype',      {0:None,    1:cnb,    2:cnb,     3:cnb,    4:type4,
+                              5:type5,   6:type6,  7:type7,   8:type8,  9:type9,
+                              10:type10, 11:type4, 12:type12, 13:type7, 14:type14,
+                              15:type15, 16:type16,17:type17, 18:type18,19:type19,
+                              20:type20, 21:type21,22:type22, 23:type23,24:type24,
+                              25:type25, 26:None,  27:type27}),
+    )
+
+# Length ranges.  We use this for integrity checking.
+# When a range is a tuple, it's (minimum, maximum).
+lengths = {
+    1:  168,
+    2:  168,
+    3:  168,
+    4:  168,
+    5:  424,
+    6:  (88, 1008),
+    7:  (72, 168),
+    8:  (56, 1008),
+    9:  168,
+    10: 72,
+    11: 168,
+    12: (72, 1008),
+    13: (72, 168),
+    14: (40, 1008),
+    15: (88, 168),
+    16: (96, 144),
+    17: (80, 816),
+    18: 168,
+    19: 312,
+    20: (72, 160),
+    21: (272, 360),
+    22: 168,
+    23: 160,
+    24: (160, 168),
+    25: 168,
+    26: (60, 1004),
+    27: 96,
+    }
+
+field_groups = (
+    # This one occurs in message type 4
+    (3, ["year", "month", "day", "hour", "minute", "second"],
+     "time", "Timestamp",
+     lambda y, m, d, h, n, s: "%02d-%02d-%02dT%02d:%02d:%02dZ" % (y, m, d, h, n, s)),
+    # This one is in message 5
+    (13, ["month", "day", "hour", "minute", "second"],
+     "eta", "Estimated Time of Arrival",
+     lambda m, d, h, n, s: "%02d-%02dT%02d:%02d:%02dZ" % (m, d, h, n, s)),
+)
+
+# Message-type-specific information ends here.
+#
+# Next, the execution machinery for the pseudolanguage. There isn't much of
+# this: the whole point of the design is to embody most of the information
+# about the AIS format in the pseudoinstruction tables.
+
+from array import array
+import binascii
+
+BITS_PER_BYTE = 8
+
+# Six-bit de-armoring table: payload character -> its 6 bits as two octal
+# digits.  A whole payload is translated with one map() and converted by a
+# single int(..., 8) call instead of setting every bit in Python.  Invalid
+# characters keep the low 6 bits, exactly like the bitwise loop does.
+def _sixbit_value(ch):
+    value = ord(ch) - 48
+    if value > 40:
+        value -= 8
+    return value & 0x3f
+SIXBIT_OCTAL = dict([(chr(i), "%02o" % _sixbit_value(chr(i))) for i in range(256)])
+
+class BitVector:
+    "Fast bit-vector class based on Python built-in array type."
+    def __init__(self, data=None, length=None):
+        self.bits = array('B')
+        self.bitlen = 0
+        # The whole byte array as one integer, built on demand by ubits()
+        self.value = None
+        if data is not None:
+            self.bits.extend(data)
+            if length is None:
+                self.bitlen = len(data) * 8
+            else:
+                self.bitlen = length
+    def extend_to(self, length):
+        "Extend vector to given bitlength."
+        if length > self.bitlen:
+            self.bits.extend([0]*((length - self.bitlen +7 )/8))
+            self.bitlen = length
+            self.value = None
+    def from_sixbit(self, data, pad=0):
+        "Initialize bit vector from AIVDM-style six-bit armoring."
+        if self.bitlen or len(self.bits):
+            # Appending to a vector which already holds bits
+            self.from_sixbit_bitwise(data, pad)
+            return
+        # One byte is reserved per character (as by the bitwise version),
+        # the 6*n payload bits are left-aligned in the 8*n bits.
+        nbytes = len(data)
+        if nbytes:
+            value = int("".join(map(SIXBIT_OCTAL.__getitem__, data)), 8) << (2 * nbytes)
+            self.bits = array('B', binascii.unhexlify("%0*x" % (2 * nbytes, value)))
+            self.value = value
+        self.bitlen = 6 * nbytes - pad
+    def from_sixbit_bitwise(self, data, pad=0):
+        "Append AIVDM-style six-bit armored data bit by bit."
+        self.value = None
+        self.bits.extend([0] * len(data))
+        for ch in data:
+            ch = ord(ch) - 48
+            if ch > 40:
+                ch -= 8
+            for i in (5, 4, 3, 2, 1, 0):
+                if (ch >> i) & 0x01:
+                    self.bits[self.bitlen/8] |= (1 << (7 - self.bitlen % 8))
+                self.bitlen += 1
+        self.bitlen -= pad
+    def ubits(self, start, width):
+        "Extract a (zero-origin) bitfield from the buffer as an unsigned int."
+        nbits = len(self.bits) * BITS_PER_BYTE
+        if start + width > nbits:
+            raise IndexError("array index out of range")
+        if self.value is None:
+            self.value = int(binascii.hexlify(self.bits.tostring()) or "0", 16)
+        return int((self.value >> (nbits - start - width)) & ((1 << width) - 1))
+    def sbits(self, start, width):
+        "Extract a (zero-origin) bitfield from the buffer as a signed int."
+        fld = self.ubits(start, width);
+        if fld & (1 << (width-1)):
+            fld = -(2 ** width - fld)
+        return fld
+    def __len__(self):
+        return self.bitlen
+    def __repr__(self):
+        "Used for dumping binary data."
+        return str(self.bitlen) + ":" + "".join(map(lambda d: "%02x" % d, self.bits[:(self.bitlen + 7)/8]))
+
+import sys, time, exceptions, re
+
+class AISUnpackingException(exceptions.Exception):
+    def __init__(self, lc, fieldname, value):
+        self.lc = lc
+        self.fieldname = fieldname
+        self.value = value
+    def __repr__(self):
+        return "%d: validation on fieldname %s failed (value %s)" % (self.lc, self.fieldname, self.value)
+
+def aivdm_interpret(lc, data, offset, values, instructions):
+    "Unpack fields from data by walking the instructions (reference version)."
+    cooked = []
+    for inst in instructions:
+        if offset >= len(data):
+            break
+        elif inst.conditional is not None and not inst.conditional(inst,values):
+            continue
+        elif isinstance(inst, spare):
+            offset += inst.width
+        elif isinstance(inst, dispatch):
+            i = inst.compute(values[inst.fieldname])
+            # This is the recursion that lets us handle variant types
+            cooked += aivdm_interpret(lc, data, offset, values, inst.subtypes[i])
+        elif isinstance(inst, bitfield):
+            if inst.type == 'unsigned':
+                value = data.ubits(offset, inst.width)
+            elif inst.type == 'signed':
+                value = data.sbits(offset, inst.width)
+            elif inst.type == 'string':
+                value = ''
+                # The try/catch error here is in case we run off the end
+                # of a variable-length string field, as in messages 12 and 14
+                try:
+                    for i in range(inst.width/6):
+                        newchar = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^- !\"#$%&'()*+,-./0123456789:;<=>?"[data.ubits(offset + 6*i, 6)]
+                        if newchar == '@':
+                            break
+                        else:
+                            value += newchar
+                except IndexError:
+                    pass
+                value = value.replace("@", " ").rstrip()
+            elif inst.type == 'raw':
+                # Note: Doesn't rely on the length.
+                value = BitVector(data.bits[offset/8:], len(data)-offset)
+            values[inst.name] = value
+            if inst.validator and not inst.validator(value):
+                raise AISUnpackingException(lc, inst.name, value)
+            offset += inst.width
+            # An important thing about the unpacked representation this
+            # generates is that it carries forward the meta-information from
+            # the field type definition.  This stuff is then available for
+            # use by report-generating code.
+            cooked.append([inst, value])
+    return cooked
+
+# The instruction tables are compiled into one Python function per table on
+# first use.  The generated code does exactly what aivdm_interpret() does for
+# the table, but the type tests, the conditional and validator lookups and the
+# offset bookkeeping are resolved once at compile time.  The tables stay the
+# only description of the message layouts.
+
+SIXBIT_CHARS = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^- !\"#$%&'()*+,-./0123456789:;<=>?"
+
+def sixbit_text(data, offset, width):
+    "Extract a six-bit text field; a field running off the end is truncated."
+    nchars = width/6
+    available = (len(data.bits) * BITS_PER_BYTE - offset) / 6
+    if available < nchars:
+        nchars = max(available, 0)
+    value = ''
+    if nchars:
+        field = data.ubits(offset, 6 * nchars)
+        for shift in range(6 * (nchars - 1), -1, -6):
+            newchar = SIXBIT_CHARS[(field >> shift) & 0x3f]
+            if newchar == '@':
+                break
+            value += newchar
+    return value.replace("@", " ").rstrip()
+
+aivdm_plans = {}
+
+def compile_plan(instructions):
+    "Return the compiled unpacker of an instruction table, compiling it if needed."
+    plan = aivdm_plans.get(id(instructions))
+    if plan is not None:
+        return plan[1]
+    namespace = {
+        "BitVector": BitVector,
+        "AISUnpackingException": AISUnpackingException,
+        "sixbit_text": sixbit_text,
+        "compile_plan": compile_plan,
+        }
+    code = ["def plan(lc, data, offset, values):",
+            "    cooked = []",
+            "    nbits = len(data)"]
+    # Iterating over a missing subtable fails like the interpreter does
+    if instructions is None:
+        code.append("    for inst in None: pass")
+    for (n, inst) in enumerate(instructions or ()):
+        namespace["I%d" % n] = inst
+        code.append("    if offset >= nbits: return cooked")
+        indent = "    "
+        if inst.conditional is not None:
+            namespace["C%d" % n] = inst.conditional
+            code.append(indent + "if C%d(I%d, values):" % (n, n))
+            indent += "    "
+        if isinstance(inst, spare):
+            code.append(indent + "offset += I%d.width" % n)
+        elif isinstance(inst, dispatch):
+            # Compiled subtables are cached per computed key
+            namespace["P%d" % n] = {}
+            code += [indent + line for line in (
+                "key = I%d.compute(values[I%d.fieldname])" % (n, n),
+                "subplan = P%d.get(key)" % n,
+                "if subplan is None:",
+                "    subplan = P%d[key] = compile_plan(I%d.subtypes[key])" % (n, n),
+                "cooked += subplan(lc, data, offset, values)")]
+        elif isinstance(inst, bitfield):
+            if inst.type == 'unsigned':
+                code.append(indent + "value = data.ubits(offset, I%d.width)" % n)
+            elif inst.type == 'signed':
+                code.append(indent + "value = data.sbits(offset, I%d.width)" % n)
+            elif inst.type == 'string':
+                code.append(indent + "value = sixbit_text(data, offset, I%d.width)" % n)
+            elif inst.type == 'raw':
+                code.append(indent + "value = BitVector(data.bits[offset/8:], nbits-offset)")
+            code.append(indent + "values[%r] = value" % inst.name)
+            if inst.validator:
+                namespace["V%d" % n] = inst.validator
+                code.append(indent + "if not V%d(value):" % n)
+                code.append(indent + "    raise AISUnpackingException(lc, %r, value)" % inst.name)
+            code.append(indent + "offset += I%d.width" % n)
+            code.append(indent + "cooked.append([I%d, value])" % n)
+    code.append("    return cooked")
+    exec "\n".join(code) + "\n" in namespace
+    # The table is kept referenced, thus its id() can't be reused
+    aivdm_plans[id(instructions)] = (instructions, namespace["plan"])
+    return namespace["plan"]
+
+def aivdm_unpack(lc, data, offset, values, instructions):
+    "Unpack fields from data according to instructions."
+    return compile_plan(instructions)(lc, data, offset, values)
+
+# Multi-sentence messages are reassembled per (channel, sequential message
+# id), thus messages which are interleaved on one channel don't destroy each
+# other.  A message whose next fragment doesn't arrive within
+# fragment_timeout seconds is dropped, and at most fragment_slots messages
+# are assembled at once (the least recently used one is dropped).
+
+fragment_timeout = 10.0
+fragment_slots = 64
+
+# USCG metadata after the checksum, e.g. "*5C,s22222,d-103,T45.4,x1,1234567890"
+uscg_metadata = re.compile(r"(?<=\*[0-9A-F][0-9A-F]),.*")
+
+class LRUCache:
+    "Dictionary which keeps its keys in the order of their last use."
+    # A doubly linked list of [previous, next, key, value] links through a
+    # sentinel; dropping the least recently used key is O(1).  collections.
+    # OrderedDict would do, but it isn't available in Python 2.6.
+    def __init__(self):
+        self.links = {}
+        self.root = root = []
+        root[:] = [root, root, None, None]
+    def __len__(self):
+        return len(self.links)
+    def __contains__(self, key):
+        return key in self.links
+    def get(self, key, default=None):
+        "Return the value of key and mark it as most recently used."
+        link = self.links.get(key)
+        if link is None:
+            return default
+        self.unlink(link)
+        self.append(link)
+        return link[3]
+    def __setitem__(self, key, value):
+        link = self.links.get(key)
+        if link is not None:
+            self.unlink(link)
+        link = self.links[key] = [None, None, key, value]
+        self.append(link)
+    def __delitem__(self, key):
+        self.unlink(self.links.pop(key))
+    def append(self, link):
+        last = self.root[0]
+        link[0] = last
+        link[1] = self.root
+        last[1] = self.root[0] = link
+    def unlink(self, link):
+        (previous, following) = link[:2]
+        previous[1] = following
+        following[0] = previous
+    def oldest(self):
+        "Return (key, value) of the least recently used key or None."
+        link = self.root[1]
+        if link is self.root:
+            return None
+        return (link[2], link[3])
+    def popoldest(self):
+        "Remove the least recently used key; returns (key, value)."
+        (key, value) = self.oldest()
+        del self[key]
+        return (key, value)
+
+class AISFragments:
+    "The fragments of a message being reassembled."
+    __slots__ = ("count", "next", "payloads", "raws", "started", "touched")
+    def __init__(self, count, payload, raw, now):
+        self.count = count
+        self.next = 2
+        self.payloads = [payload]
+        self.raws = [raw]
+        self.started = now
+        self.touched = now
+
+class AISReassembler:
+    "Reassemble multi-sentence AIVDM/AIVDO messages."
+    def __init__(self, timeout=fragment_timeout, maxsize=fragment_slots):
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.pending = LRUCache()	# (channel, sequence id) -> AISFragments
+        self.dropped = 0	# Incomplete messages given up
+    def add(self, fields, raw, now=None):
+        "Add a checked sentence; returns (payload, pad, raw) when a message is complete."
+        # Raises ValueError or IndexError on malformed fields
+        count = int(fields[1])
+        number = int(fields[2])
+        try:
+            pad = int(fields[6].split('*')[0])
+        except ValueError:
+            pad = 0
+        if count == 1:
+            return (fields[5], pad, raw)
+        if now is None:
+            now = time.time()
+        key = (fields[4], fields[3])
+        if number == 1:
+            if key in self.pending:
+                self.dropped += 1
+            elif len(self.pending) >= self.maxsize:
+                self.expire(now)
+                if len(self.pending) >= self.maxsize:
+                    self.pending.popoldest()
+                    self.dropped += 1
+            self.pending[key] = AISFragments(count, fields[5], raw, now)
+            return None
+        message = self.pending.get(key)
+        if message is None:
+            return None
+        if message.next != number or message.count != count \
+               or now - message.touched > self.timeout:
+            # A lost fragment or a stale message
+            del self.pending[key]
+            self.dropped += 1
+            return None
+        message.payloads.append(fields[5])
+        message.raws.append(raw)
+        if number == count:
+            del self.pending[key]
+            return ("".join(message.payloads), pad, "".join(message.raws))
+        message.next += 1
+        message.touched = now
+        return None
+    def expire(self, now=None):
+        "Drop the messages whose next fragment is overdue."
+        if now is None:
+            now = time.time()
+        # The least recently touched messages come first
+        oldest = self.pending.oldest()
+        while oldest is not None and now - oldest[1].touched > self.timeout:
+            self.pending.popoldest()
+            self.dropped += 1
+            oldest = self.pending.oldest()
+
+def packet_scanner(source, reassembler=None, skiperr=False):
+    "Get the AIVDM packets of complete (possibly reassembled) messages."
+    if reassembler is None:
+        reassembler = AISReassembler()
+    lc = 0
+    while True:
+        lc += 1;
+        raw = source.readline()
+        if not raw:
+            return
+        line = raw.strip()
+        # Ignore comments
+        if not line.startswith("!"):
+            continue
+        # Strip off USCG metadata
+        if len(line) > line.find("*") + 3:
+            line = uscg_metadata.sub("", line)
+        # Compute CRC-16 checksum
+        packet = line[1:-3]	# Strip leading !, trailing * and CRC
+        csum = 0
+        for c in packet:
+            csum ^= ord(c)
+        csum = "%02X" % csum
+        fields = line.split(",")
+        crc = None
+        try:
+            crc = fields[6].split('*')[1].strip()
+            if csum != crc:
+                if skiperr:
+                    sys.stderr.write("%d: bad checksum %s, expecting %s: %s\n" % (lc, csum, `crc`, line))
+                    continue
+                else:
+                    raise AISUnpackingException(lc, "checksum", crc)
+            message = reassembler.add(fields, raw)
+        except (IndexError, ValueError):
+            if skiperr:
+                sys.stderr.write("%d: malformed line %s\n" % (lc, line))
+                continue
+            else:
+                raise AISUnpackingException(lc, "checksum", crc)
+        if message is None:
+            continue
+        (payload, pad, raw) = message
+        # Render assembled payload to packed bytes
+        bits = BitVector()
+        bits.from_sixbit(payload, pad)
+        yield (lc, raw, bits)
+
+# Type 24 static data is sent in two messages, part A with the name and
+# part B with ship type, call sign and dimensions.  The parts are cached per
+# MMSI and emitted as one message (with the fields of both parts) whenever a
+# part arrives and the other one is known.
+
+type24_slots = 4096
+
+class Type24Cache:
+    "Join parts A and B of Type 24 per MMSI."
+    def __init__(self, maxsize=type24_slots):
+        self.maxsize = maxsize
+        self.vessels = LRUCache()	# mmsi -> [part A, part B, last update]
+    def add(self, mmsi, partno, raw, cooked, now=None):
+        "Add a decoded part; returns (raw, cooked) of the joined message or None."
+        if now is None:
+            now = time.time()
+        vessel = self.vessels.get(mmsi)
+        if vessel is None:
+            if len(self.vessels) >= self.maxsize:
+                self.vessels.popoldest()
+            vessel = self.vessels[mmsi] = [None, None, now]
+        vessel[partno] = (raw, cooked)
+        vessel[2] = now
+        if vessel[0] is None or vessel[1] is None:
+            return None
+        ((raw_a, part_a), (raw_b, part_b)) = vessel[:2]
+        # msgtype, repeat and mmsi, then the fields of both parts without partno
+        return (raw_a + raw_b, part_a[:3] + part_a[4:] + part_b[4:])
+
+def postprocess(cooked):
+    "Postprocess cooked fields from a message."
+    # Handle type 21 name extension
+    if cooked[0][1] == 21:
+        cooked[4][1] += cooked[19][1]
+        cooked.pop(-1)
+    return cooked
+
+def decode_message(lc, bits, scaled=False):
+    "Unpack one de-armored message; returns (cooked, values, bogon)."
+    values = {}
+    values['length'] = bits.bitlen
+    # Without the following magic, we'd have a subtle problem near
+    # certain variable-length messages: DSV reports would
+    # sometimes have fewer fields than expected, because the
+    # unpacker would never generate cooked tuples for the omitted
+    # part of the message.  Presently a known issue for types 15
+    # and 16 only.  (Would never affect variable-length messages in
+    # which the last field type is 'string' or 'raw').
+    bits.extend_to(168)
+    # Magic recursive unpacking operation
+    cooked = aivdm_unpack(lc, bits, 0, values, aivdm_decode)
+    # We now have a list of tuples containing unpacked fields
+    # Collect some field groups into ISO8601 format
+    for (offset, template, label, legend, formatter) in field_groups:
+        segment = cooked[offset:offset+len(template)]
+        if map(lambda x: x[0], segment) == template:
+            group = formatter(*map(lambda x: x[1], segment))
+            group = (label, group, 'string', legend, None)
+            cooked = cooked[:offset]+[group]+cooked[offset+len(template):]
+    # Apply the postprocessor stage
+    cooked = postprocess(cooked)
+    # Now apply custom formatting hooks.
+    if scaled:
+        for (i, (inst, value)) in enumerate(cooked):
+            if value == inst.oob:
+                cooked[i][1] = "n/a"
+            elif inst.formatter:
+                if type(inst.formatter) == type(()):
+                    # Assumes 0 is the legend for the "undefined" value 
+                    if value >= len(inst.formatter):
+                        value = 0
+                    cooked[i][1] = inst.formatter[value]
+                elif type(formatter) == type(lambda x: x):
+                    cooked[i][1] = inst.formatter(value)
+    expected = lengths.get(values['msgtype'], None)
+    # Check length; has to be done after so we have the type field 
+    bogon = False
+    if expected is not None:
+        if type(expected) == type(0):
+            expected_range = (expected, expected)
+        else:
+            expected_range = expected
+        actual = values['length']
+        if not (actual >= expected_range[0] and actual <= expected_range[1]):
+            bogon = True
+    return (cooked, values, bogon)
+
+def parse_ais_messages(source, scaled=False, skiperr=False, verbose=0, join24=False):
+    "Generator code - read forever from source stream, parsing AIS messages."
+    if join24:
+        type24 = Type24Cache()
+    for (lc, raw, bits) in packet_scanner(source, skiperr=skiperr):
+        try:
+            (cooked, values, bogon) = decode_message(lc, bits, scaled)
+            if bogon:
+                actual = values['length']
+                if skiperr:
+                    sys.stderr.write("%d: type %d expected %s bits but saw %s\n" % (lc, values['msgtype'], lengths[values['msgtype']], actual))
+                else:
+                    raise AISUnpackingException(lc, "length", actual)
+            # Parts of Type 24 are handed back joined
+            if join24 and values['msgtype'] == 24 and not bogon:
+                joined = type24.add(values['mmsi'], values['partno'], raw, cooked)
+                if joined is None:
+                    continue
+                (raw, cooked) = joined
+            # We're done, hand back a decoding
+            yield (raw, cooked, bogon)
+        except KeyboardInterrupt:
+            raise KeyboardInterrupt
+        except GeneratorExit:
+            raise GeneratorExit
+        except AISUnpackingException, e:
+            if skiperr:
+                sys.stderr.write("%s on %s\n" % (`e`, raw.strip()))
+                continue
+            else:
+                raise e
+        except:
+            (exc_type, exc_value, exc_traceback) = sys.exc_info()
+            sys.stderr.write("Unknown exception on line %d\n" % lc)
+            if skiperr:
+                continue
+            else:
+                raise exc_type, exc_value, exc_traceback
+
+# The rest is just sequencing and report generation.
+
+if __name__ == "__main__":
+    import sys, getopt
+
+    try:
+        (options, arguments) = getopt.getopt(sys.argv[1:], "acdhjmqst:vx")
+    except getopt.GetoptError, msg:
+        print "ais.py: " + str(msg)
+        raise SystemExit, 1
+
+    join24 = False
+    dsv = False
+    dump = False
+    histogram = False
+    json = False
+    malformed = False
+    quiet = False
+    scaled = False
+    types = []
+    frequencies = {}
+    verbose = 0
+    skiperr = True
+    for (switch, val) in options:
+        if switch == '-a':        # Join parts A and B of Type 24
+            join24 = True
+        elif switch == '-c':      # Report in DSV format rather than JSON
+            dsv = True
+        elif switch == '-d':      # Dump in a more human-readable format
+            dump = True
+        elif switch == '-h':      # Make a histogram of type frequencies
+            histogram = True
+        elif switch == '-j':      # Dump JSON
+            json = True
+        elif switch == '-m':      # Dump malformed AIVDM/AIVDO packets raw
+            malformed = True
+        elif switch == '-q':      # Suppress output
+            quiet = True
+        elif switch == '-s':      # Report AIS in scaled form
+            scaled = True
+        elif switch == '-t':      # Filter for a comma-separated list of types
+            types = map(int, val.split(","))
+        elif switch == '-v':      # Dump raw packet before JSON or DSV.
+            verbose += 1
+        elif switch == '-x':      # Skip decoding errors
+            skiperr = False
+
+    if not dsv and not histogram and not json and not malformed and not quiet:
+            dump = True
+    try:
+        for (raw, parsed, bogon) in parse_ais_messages(sys.stdin, scaled, skiperr, verbose, join24):
+            msgtype = parsed[0][1]
+            if types and msgtype not in types:
+                continue
+            if verbose >= 1 or (bogon and malformed):
+                sys.stdout.write(raw)
+            if not bogon:
+                if json:
+                    print "{" + ",".join(map(lambda x: '"' + x[0].name + '":' + str(x[1]), parsed)) + "}"
+                elif dsv:
+                    print "|".join(map(lambda x: str(x[1]), parsed))
+                elif histogram:
+                    frequencies[msgtype] = frequencies.get(msgtype, 0) + 1
+                elif dump:
+                    for (inst, value) in parsed:
+                        print "%-25s: %s" % (inst.legend, value)
+                    print "%%"
+            sys.stdout.flush()
+        if histogram:
+            keys = frequencies.keys()
+            keys.sort()
+            for msgtype in keys:
+                print "%d\t%d" % (msgtype, frequencies[msgtype])
+    except KeyboardInterrupt:
+        pass
+# End
@@ -0,0 +1,188 @@
+# -*- coding: ascii -*-
+
+# Reads many NMEA sources (serial ports, sockets, pipes) in a single thread. Instead
+# of one GPSReader thread with a blocking readline() per receiver, one select()
+# loop waits for all sources and only reads the ones which have data.
+
+import os, select, errno, time
+from collections import deque
+
+import NMEAdecoder, NMEAframer, NMEAtelegrams
+from GPSError import *
+
+# Maximum number of bytes which are read from a source at once
+read_chunksize = 4096
+
+# Telegrams which are returned by nextFix() if they contain a valid position
+fix_classes = (NMEAtelegrams.NMEA_GGA, NMEAtelegrams.NMEA_RMC, NMEAtelegrams.NMEA_GLL)
+
+class GPSSource(NMEAdecoder.NMEADecoder):
+  """ GPSSource - One receiver of the GPSMultiplexer
+
+  Holds the stream of the receiver, the framer for the incomplete lines and (as
+  NMEADecoder) the telegrams of the receiver, e.g. source.GGA. """
+  def __init__(self, stream, name=None, lazy=False):
+    NMEAdecoder.NMEADecoder.__init__(self, lazy)
+
+    self._stream = stream
+    self._framer = NMEAframer.NMEAFramer()
+    if name == None:
+      name = str(stream)
+    self.name = name
+
+  def fileno(self):
+    if isinstance(self._stream, (int, long)):
+      return self._stream
+    return self._stream.fileno()
+
+  def read(self, size=read_chunksize):
+    """ Reads the available data without blocking (the source has to be readable) """
+    if hasattr(self._stream, "recv"):
+      return self._stream.recv(size)
+    return os.read(self.fileno(), size)
+
+  def frameData(self, data):
+    """ Adds a chunk of data to the framer and returns the complete sentences """
+    return self._framer.feed(data)
+
+  def decodeData(self, data):
+    """ Frames and decodes a chunk of data, returns the list of parsed telegrams """
+    telegrams = list()
+    for sentence in self.frameData(data):
+      telegram = self.decodeSentence(sentence)
+      if telegram <> None:
+        telegrams.append(telegram)
+    return telegrams
+
+  def close(self):
+    if hasattr(self._stream, "close"):
+      self._stream.close()
+    elif isinstance(self._stream, (int, long)):
+      os.close(self._stream)
+
+class GPSMultiplexer(object):
+  """ GPSMultiplexer - Reads any number of NMEA sources in one thread
+
+  A source is anything with a fileno() (an opened serial.Serial on POSIX, a socket,
+  a pipe or a file object) or a plain file descriptor. The parsed telegrams are
+  returned as (source, telegram) tuples:
+
+    for (source, telegram) in multiplexer:
+      ...
+
+  or one by one with nextTelegram()/nextFix(). On Windows select() only works with
+  sockets. """
+  def __init__(self, lazy=False):
+    self._lazy = lazy
+    self._sources = dict()   # fileno -> GPSSource
+    self._pending = deque()  # (source, telegram) which haven't been returned yet
+
+  def addSource(self, stream, name=None):
+    """ Adds a source and returns its GPSSource. The telegrams of the source are
+    available as attributes of the GPSSource, e.g. source.GGA """
+    source = GPSSource(stream, name, self._lazy)
+    self._sources[source.fileno()] = source
+    return source
+
+  def removeSource(self, source, close=True):
+    """ Removes (and closes) a source """
+    for fd in [ fd for fd, s in self._sources.items() if s is source ]:
+      del self._sources[fd]
+    if close:
+      source.close()
+
+  def getSources(self):
+    """ returns a list of all sources """
+    return self._sources.values()
+
+  def pollData(self, timeout=None):
+    """ Waits up to timeout seconds (None = forever) until at least one source is
+    readable and reads all readable sources. Returns a list of (source, data) tuples
+    with the raw data. Sources which reached EOF are removed. """
+    if len(self._sources) == 0:
+      return []
+
+    try:
+      readable = select.select(self._sources.keys(), [], [], timeout)[0]
+    except select.error, e:
+      if e.args[0] == errno.EINTR:
+        return []
+      raise
+
+    result = list()
+    for fd in readable:
+      source = self._sources.get(fd)
+      if source == None:
+        continue
+      try:
+        data = source.read()
+      except (IOError, OSError):
+        data = ""
+      if not data:
+        # EOF or the device is gone
+        self.removeSource(source)
+        continue
+      result.append( (source, data) )
+    return result
+
+  def poll(self, timeout=None):
+    """ Same as pollData() but returns the parsed telegrams as list of (source,
+    telegram) tuples. """
+    result = list()
+    for (source, data) in self.pollData(timeout):
+      for telegram in source.decodeData(data):
+        result.append( (source, telegram) )
+    return result
+
+  def nextTelegram(self, timeout=None):
+    """ returns the next (source, telegram) tuple or None if nothing has been parsed
+    within timeout seconds (None = wait forever) or if there are no sources left. """
+    deadline = None
+    if timeout <> None:
+      deadline = time.time() + timeout
+
+    while len(self._pending) == 0:
+      if len(self._sources) == 0:
+        return None
+      remaining = None
+      if deadline <> None:
+        remaining = max(0, deadline - time.time())
+      self._pending.extend(self.poll(remaining))
+      if (len(self._pending) == 0) and (deadline <> None) and (time.time() >= deadline):
+        return None
+    return self._pending.popleft()
+
+  def nextFix(self, timeout=None):
+    """ returns the next (source, telegram) tuple with a valid position (GGA, RMC or
+    GLL) or None after timeout seconds. Other telegrams are skipped. """
+    deadline = None
+    if timeout <> None:
+      deadline = time.time() + timeout
+
+    while True:
+      remaining = None
+      if deadline <> None:
+        remaining = max(0, deadline - time.time())
+      item = self.nextTelegram(remaining)
+      if item == None:
+        return None
+      (source, telegram) = item
+      if isinstance(telegram, fix_classes):
+        try:
+          if telegram.hasFix():
+            return item
+        except NMEATypeError:
+          pass
+
+  def __iter__(self):
+    """ yields (source, telegram) tuples until all sources have reached EOF """
+    while True:
+      item = self.nextTelegram()
+      if item == None:
+        return
+      yield item
+
+  def close(self):
+    """ Closes all sources """
+    for source in self._sources.values():
+      self.removeSource(source)
@@ -1,46 +1,61 @@
 # -*- coding: ascii -*-
 
 #### Importbereich
-import serial
-
-import time, sys
+import time, sys, traceback
 import threading
 
-import NMEAtelegrams, NMEAutils
+import NMEAtelegrams, NMEAutils, NMEAdecoder, NMEAframer, NMEAstats, GPSTransport
 from GPSError import *
 
 valid_baudrates = (4800, 9600, 19200, 38400, 57600, 115200)
 
+# Read timeout of the serial interface in seconds. The reader thread notices a stop
+# request after this time at the latest.
+read_timeout = 0.1
+
+# Stall detection: the connection is reopened if no valid sentence has been received
+# within stall_periods times the expected period (seconds) of the receiver.
+expected_period = 1.0
+stall_periods = 5
+
 #### GPS Main class
-class GPSReader(threading.Thread, object):
+class GPSReader(threading.Thread, NMEAdecoder.NMEADecoder):
   """ GPSReader - Handles the communication with a GPS reader of a phy or virt interface
 
   This class connects to a virt or phy serial interface and reads different NMEA sentence.
-  Currently the following NMEA sentences will be converted to different classes: GGA, RMC, VTG
-  but more are planed.
+  Currently the following NMEA sentences will be converted to different classes: GGA, RMC, VTG,
+  GLL, DTM, GSV and GSA. Further sentences can be added with registerSentence().
+  AIS sentences (!AIVDM, !AIVDO) on the same interface are decoded into AISMessage
+  objects (subscribe to "VDM", "VDO" or "ais").
+
+  At the moment there are no plans to communicate two-way with a GPS receiver.
+
+  Instead of the comport any transport (see GPSTransport) can be given, e.g.
+  GPSReader(transport=GPSTransport.TCPClientTransport("plotter", 10110)).
+
+  Recorded NMEA logs can be parsed without a serial interface with GPSReader.replay(). """
+  # Replays a NMEA log file without serial interface or thread, see NMEAdecoder.replay
+  replay = staticmethod(NMEAdecoder.replay)
 
-  At the moment there are no plans to communicate two-way with a GPS receiver. """
-  def __init__(self, comport=None, baudr=4800):
-    self._SerialObj = None
-    self._rawdata = None
+  def __init__(self, comport=None, baudr=4800, lazy=False, transport=None):
+    self._transport = transport
     self._stop = threading.Event()
+    self._framer = NMEAframer.NMEAFramer()
+    self._stallTimeout = expected_period * stall_periods
+    self._stalls = 0
 
     self.setBaudrate(baudr)
 
-    self.GGA = NMEAtelegrams.NMEA_GGA()
-    self.VTG = NMEAtelegrams.NMEA_VTG()
-    self.RMC = NMEAtelegrams.NMEA_RMC()
-    self.GLL = NMEAtelegrams.NMEA_GLL()
-    self.DTM = NMEAtelegrams.NMEA_DTM()
-    self.GSV = NMEAtelegrams.NMEA_GSV()
+    # Creates one telegram object per registered sentence formatter. Each one is
+    # also available as attribute, e.g. self.GGA or self.GSA. With lazy=True the
+    # fields are only converted when they are read.
+    NMEAdecoder.NMEADecoder.__init__(self, lazy)
 
-    # TODO: Add the GSV Sentence to this as well. Gonna need to rethink the way I handle
-    # the read of the serial buffer.
-
-    # No serial port? Error!
-    if (comport == None):
-      raise GPSCommError()
-    self.connectToComport(comport)
+    # No serial port and no transport? Error! A transport connects in the thread.
+    if transport == None:
+      if (comport == None):
+        raise GPSCommError()
+      self.connectToComport(comport)
 
     # let the __init__ of threading do some work :)
     threading.Thread.__init__(self)
@@ -61,22 +76,78 @@ class GPSReader(threading.Thread, object):
       self._baudrate = 4800
 
   def connectToComport(self, comport):
-    """ Opens the comport with a baudrate of 4800 if it hasn't been changed and a timeout of 10seconds
-    or throw a execption if no connection can be established. """
+    """ Opens the comport with a baudrate of 4800 if it hasn't been changed and a short read timeout
+    (read_timeout) or throw a execption if no connection can be established. The comport is either
+    a device name or a pyserial URL (e.g. "socket://host:port" or "loop://"). """
+    transport = GPSTransport.SerialTransport(comport, self._baudrate)
     try:
-      self._SerialObj = serial.Serial(port=comport, baudrate=self._baudrate, timeout=10)
-    except serial.SerialException:
+      transport.connect()
+    except GPSCommError:
       raise GPSCommError("Connection with Comport failed!")
+    self._transport = transport
+
+  def getTransport(self):
+    """ returns the transport the NMEA data is read from """
+    return self._transport
 
   def disconnect(self):
-    """ Closes the connection to the serial interface """
-    if self._SerialObj <> None:
-      self._SerialObj.close()
+    """ Closes the connection to the serial interface (or the transport) """
+    if self._transport <> None:
+      self._transport.close()
 
   def isConnected(self):
-    """ Wrapper for the actual isOpen() of pyserial """
-    if self._SerialObj <> None:
-      return self._SerialObj.isOpen()
+    """ returns True if the transport is connected """
+    if self._transport <> None:
+      return self._transport.isConnected()
+
+  def setStallDetection(self, period=expected_period, periods=stall_periods):
+    """ The connection is considered stalled and reopened (with the backoff of the
+    transport) if no sentence with a correct checksum has been received within
+    periods times period seconds. period=None disables the stall detection. It only
+    applies while a sender is connected, not to a TCP server which waits for a
+    client or to a UDP port. """
+    if period == None:
+      self._stallTimeout = None
+    else:
+      self._stallTimeout = period * periods
+
+  def getStats(self):
+    """ returns a dict with the counters of the reader: reconnects (connection losses
+    including stalls), stalls, dropped (sentences with a wrong checksum, which couldn't
+    be parsed or were too long) and callbacks_dropped (by the callback worker) """
+    worker = self._callbackWorker
+    stats = {
+      "reconnects": 0,
+      "stalls": self._stalls,
+      "dropped": self.getDropped() + self._framer.getDropped(),
+      "callbacks_dropped": 0,
+    }
+    if self._transport <> None:
+      stats["reconnects"] = self._transport.getReconnects()
+    if worker <> None:
+      stats["callbacks_dropped"] = worker.getDropped()
+    return stats
+
+  def enableInstrumentation(self):
+    """ Same as NMEADecoder.enableInstrumentation(). Additionally counts the bytes read
+    and exports the counters of getStats() (as counters, e.g. reconnects_total) and
+    the depth of the callback queue. """
+    created = (self._stats == None)
+    stats = NMEAdecoder.NMEADecoder.enableInstrumentation(self)
+    if created:
+      for name, help in (("reconnects", "Connection losses including stalls"),
+                         ("stalls", "Connections without a valid sentence"),
+                         ("dropped", "Dropped sentences"),
+                         ("callbacks_dropped", "Callbacks dropped by the callback worker")):
+        stats.addCounter(name, lambda name=name: self.getStats()[name], help)
+      stats.addGauge("queue_depth", self._getQueueDepth, "Callbacks waiting in the callback worker")
+    return stats
+
+  def _getQueueDepth(self):
+    worker = self._callbackWorker
+    if worker == None:
+      return 0
+    return worker.getQueueSize()
 
   def stop_thread(self):
     """ Stop the thread flag which is herewith set """
@@ -86,49 +157,59 @@ class GPSReader(threading.Thread, object):
     self._stop.set()
     threading.Thread.join(self,timeout)
 
-  def getRawdata(self):
-    """ Lets you watch the rawdata in case something is bothering you :D"""
-    return self._rawdata
-
   def run(self):
     """ threading.Thread.run() overloaded. Here the actual stuff is going on.
 
     Converts the different NMEA sentences into seperated classes which allow one
     better access to the different sentences. The classes have different methodes
-    to access the fields."""
-    # TODO: Do I really need to positions where the variables are initialized?
-    # Also, add the GSV to this or the above initialization.
-    self.GGA = NMEAtelegrams.NMEA_GGA()
-    self.VTG = NMEAtelegrams.NMEA_VTG()
-    self.RMC = NMEAtelegrams.NMEA_RMC()
-    self.GLL = NMEAtelegrams.NMEA_GLL()
-    self.DTM = NMEAtelegrams.NMEA_DTM()
-    self.GSV = NMEAtelegrams.NMEA_GSV()
-
+    to access the fields.
+
+    Everything which is waiting in the input buffer is read at once and framed into
+    sentences by the NMEAFramer instead of a readline() per sentence. A lost or stalled
+    connection is reopened by the transport. Any other error (e.g. in a callback) is
+    printed, the connection is kept and the thread doesn't end."""
+    framer = self._framer
+    decodeSentence = self.decodeSentence
+    transport = self._transport
+    lastValid = time.time()
     while True:
       if (self._stop.isSet()):
         self.disconnect()
         break
 
-      # Get a complete line from the internal serial buffer. In respect to the NMEA EOL
-      t_sentence = self._SerialObj.readline().strip("\r\n")
-      if len(t_sentence) > 0:
-        self._rawdata = t_sentence  # Store the Raw Sentence for debugging purpose.
-
-        # This will analyze the sentence (check the checksum) and try to use the sentence rules to parse
-        # the sentence into the different objects.
-        if ( ("VTG" in t_sentence) and (NMEAutils.VerifyNMEAChkSum(t_sentence) == True) ):
-         self.VTG.parseSentence(t_sentence)
-        elif ( ("RMC" in t_sentence) and (NMEAutils.VerifyNMEAChkSum(t_sentence) == True) ):
-          self.RMC.parseSentence(t_sentence)
-        elif ( ("GLL" in t_sentence) and (NMEAutils.VerifyNMEAChkSum(t_sentence) == True) ):
-          self.GLL.parseSentence(t_sentence)
-        elif ( ("GGA" in t_sentence) and (NMEAutils.VerifyNMEAChkSum(t_sentence) == True) ):
-          self.GGA.parseSentence(t_sentence)
-        elif ( ("DTM" in t_sentence) and (NMEAutils.VerifyNMEAChkSum(t_sentence) == True) ):
-          self.DTM.parseSentence(t_sentence)
-        elif ( ("GSV" in t_sentence) and (NMEAutils.VerifyNMEAChkSum(t_sentence) == True) ):
-          self.GSV.parseSentence(t_sentence)
+      try:
+        valid = False
+        data = transport.read(read_timeout)
+        if len(data) > 0:
+          stats = self._stats
+          if stats <> None:
+            stats.received = NMEAstats.timer()
+            stats.countBytes(len(data))
+          for t_sentence in framer.feed(data):
+            if decodeSentence(t_sentence) <> None:
+              valid = True
+            elif (not valid) and NMEAutils.VerifyNMEAChkSum(t_sentence):
+              # Unregistered sentences (e.g. $PUBX) and AIS fragments keep the link alive
+              valid = True
+
+        now = time.time()
+        if valid or (not transport.hasPeer()):
+          lastValid = now
+        elif (self._stallTimeout <> None) and (now - lastValid > self._stallTimeout):
+          self._stalls += 1
+          transport.drop()
+          framer.reset()
+          lastValid = now
+      except (EnvironmentError, GPSCommError):
+        sys.stderr.write("Exception in GPSReader %r:\n" % (transport,))
+        traceback.print_exc()
+        transport.drop()
+        framer.reset()
+      except Exception:
+        # e.g. a bug in a callback, the connection is kept
+        sys.stderr.write("Exception in GPSReader %r:\n" % (transport,))
+        traceback.print_exc()
+        framer.reset()
 
 ###### TEST #######
 # section in where I test most stuff of the current module until I figured out the nose or other
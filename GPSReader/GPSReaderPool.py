@@ -0,0 +1,251 @@
+# -*- coding: ascii -*-
+
+# Manager for many receivers. One I/O thread reads all sources with the
+# GPSMultiplexer and only frames the sentences. The checksum verification and the
+# parsing is done in batches by a pool of worker threads or processes.
+
+import sys, traceback
+import threading
+import multiprocessing, multiprocessing.pool
+
+import NMEAtelegrams, NMEAutils, AISdecoder, GPSMultiplexer
+from GPSError import *
+
+# Timeout of the select() in the I/O thread, limits the time to notice a stop
+poll_timeout = 0.5
+
+# Counters which are kept for each receiver (see GPSReaderPool.getStats)
+stat_names = ("bytes", "sentences", "telegrams", "errors", "batches")
+
+def decodeBatch(sentences):
+  """ Verifies and parses a batch of sentences. Runs in the workers of the pool,
+  thus it only uses the telegram classes and no state of the pool.
+
+  Returns a tuple (telegrams, errors). telegrams is a list of (formatter, telegram)
+  tuples in the order of the sentences. Sentences of stateful telegrams (e.g. GSV),
+  AIS sentences (fragments of messages) and sentences without a class in the
+  sentence_registry (the receiver may have registered one, see registerSentence)
+  are returned as (formatter, sentence) and parsed by the receiver itself. errors
+  is the number of sentences with a wrong checksum or which couldn't be parsed.
+  An unexpected exception is counted as error as well, a batch always returns. """
+  telegrams = list()
+  errors = 0
+  for sentence in sentences:
+    try:
+      formatter = NMEAtelegrams.getSentenceFormatter(sentence)
+      sentenceClass = NMEAtelegrams.sentence_registry.get(formatter)
+      if sentenceClass == None:
+        if formatter == None:
+          formatter = AISdecoder.getAISFormatter(sentence)
+        if formatter <> None:
+          telegrams.append( (formatter, sentence) )
+        continue
+      if not NMEAutils.VerifyNMEAChkSum(sentence):
+        errors += 1
+        continue
+      if sentenceClass.stateful:
+        telegrams.append( (formatter, sentence) )
+        continue
+
+      telegram = sentenceClass()
+      telegram.parseSentence(sentence)
+    except Exception:
+      # e.g. NMEAParseError, NMEATypeError or a sentence which isn't a str
+      errors += 1
+      continue
+    telegrams.append( (formatter, telegram) )
+  return (telegrams, errors)
+# decodeBatch
+
+class GPSReaderPool(threading.Thread):
+  """ GPSReaderPool - Reads many receivers with a shared pool of parsing workers
+
+  The sources are read by a single I/O thread, which only frames the sentences.
+  The framed sentences of a receiver are handed to the worker pool in batches, at
+  most one batch per receiver at a time, thus the telegrams of a receiver are
+  always published in order. The receivers are GPSSource objects and provide the
+  telegrams (e.g. source.GGA) and the callbacks of the GPSReader. The callbacks run
+  in the result thread of the pool.
+
+  workers is the size of the pool (default: number of cores). With processes=True
+  the sentences are parsed in worker processes instead of threads, which is only
+  worth it if the parsing, not the reading, is the bottleneck.
+
+  The workers parse with the classes of NMEAtelegrams.sentence_registry. Sentences
+  which a source added with registerSentence() are parsed by the source in the
+  result thread, but a class which replaces a registered one (e.g. an own GGA
+  class) is only used by the source, not by the workers. """
+  def __init__(self, workers=None, processes=False):
+    threading.Thread.__init__(self)
+
+    if workers == None:
+      workers = multiprocessing.cpu_count()
+    if processes:
+      self._pool = multiprocessing.Pool(workers)
+    else:
+      self._pool = multiprocessing.pool.ThreadPool(workers)
+
+    self._multiplexer = GPSMultiplexer.GPSMultiplexer()
+    self._lock = threading.Lock()
+    self._pending = dict()    # source -> list of framed sentences
+    self._inflight = set()    # sources with a batch in the pool
+    self._stats = dict()      # source -> dict of counters
+    self._retired = dict.fromkeys(stat_names, 0)  # sum of the counters of removed sources
+    self._stop = threading.Event()
+
+    # Start the thread automatically
+    self.daemon = True
+    self.start()
+
+  def addSource(self, stream, name=None):
+    """ Adds a source (see GPSMultiplexer.addSource) and returns its GPSSource """
+    source = self._multiplexer.addSource(stream, name)
+    self._lock.acquire()
+    try:
+      self._pending[source] = list()
+      self._stats[source] = dict.fromkeys(stat_names, 0)
+    finally:
+      self._lock.release()
+    return source
+
+  def addComport(self, comport, baudrate=4800, name=None):
+    """ Opens a serial interface (POSIX only) and adds it as source """
+    # pyserial is only needed if serial interfaces are added
+    import serial
+    try:
+      port = serial.Serial(port=comport, baudrate=baudrate, timeout=0)
+    except serial.SerialException:
+      raise GPSCommError("Connection with Comport failed!")
+    if name == None:
+      name = comport
+    return self.addSource(port, name)
+
+  def removeSource(self, source):
+    """ Removes and closes a source """
+    self._multiplexer.removeSource(source)
+    self._lock.acquire()
+    try:
+      self._forget(source)
+    finally:
+      self._lock.release()
+
+  def _forget(self, source):
+    """ Drops the pending sentences of a removed source, its counters are added to
+    the total of the removed sources. The lock has to be held. """
+    self._pending.pop(source, None)
+    stats = self._stats.pop(source, None)
+    if stats <> None:
+      for name in stat_names:
+        self._retired[name] += stats[name]
+
+  def _forgetClosed(self):
+    """ Forgets the sources which the multiplexer removed at their EOF as soon as
+    their last batch has been published. The lock has to be held. """
+    active = set(self._multiplexer.getSources())
+    for source in [ s for s in self._pending if s not in active ]:
+      if (source not in self._inflight) and (not self._pending[source]):
+        self._forget(source)
+
+  def getSources(self):
+    """ returns a list of all sources """
+    return self._multiplexer.getSources()
+
+  def getStats(self, source=None):
+    """ returns a dict with the counters (bytes, sentences, telegrams, errors,
+    batches) of a source or the sum of all sources if source is None. The sum
+    includes the final counters of the removed sources (also at their EOF), a single
+    removed source returns an empty dict. """
+    self._lock.acquire()
+    try:
+      if source <> None:
+        return dict(self._stats.get(source, ()))
+      total = dict(self._retired)
+      for stats in self._stats.values():
+        for name in stat_names:
+          total[name] += stats[name]
+      return total
+    finally:
+      self._lock.release()
+
+  def stop_thread(self):
+    """ Stop the thread flag which is herewith set """
+    self._stop.set()
+
+  def join(self, timeout=None):
+    self._stop.set()
+    threading.Thread.join(self, timeout)
+
+  def _submit(self, source):
+    """ Hands the pending sentences of a source to the pool if it has no batch in
+    the pool at the moment. The lock has to be held. """
+    batch = self._pending.get(source)
+    if (not batch) or (source in self._inflight):
+      return
+    self._pending[source] = list()
+    self._inflight.add(source)
+    self._stats[source]["batches"] += 1
+    self._pool.apply_async(decodeBatch, (batch,), callback=lambda result: self._publish(source, result))
+
+  def _publish(self, source, result):
+    """ Runs in the result thread of the pool and publishes the telegrams of a batch """
+    (telegrams, errors) = result
+    count = 0
+    try:
+      for (formatter, telegram) in telegrams:
+        if isinstance(telegram, basestring):
+          # stateful telegram, has to be parsed by the source
+          if source.decodeSentence(telegram) <> None:
+            count += 1
+        else:
+          source.publishTelegram(formatter, telegram)
+          count += 1
+    except Exception:
+      # The rest of the batch is lost, but the source has to leave the pool
+      sys.stderr.write("Exception in GPSReaderPool %r:\n" % (source,))
+      traceback.print_exc()
+      errors += 1
+
+    self._lock.acquire()
+    try:
+      self._inflight.discard(source)
+      stats = self._stats.get(source)
+      if stats <> None:
+        stats["telegrams"] += count
+        stats["errors"] += errors
+        self._submit(source)
+    finally:
+      self._lock.release()
+
+  def run(self):
+    """ The I/O loop: reads and frames the data of all sources """
+    multiplexer = self._multiplexer
+    while not self._stop.isSet():
+      if len(self._pending) > len(multiplexer.getSources()):
+        self._lock.acquire()
+        try:
+          self._forgetClosed()
+        finally:
+          self._lock.release()
+
+      if len(multiplexer.getSources()) == 0:
+        self._stop.wait(poll_timeout)
+        continue
+
+      received = multiplexer.pollData(poll_timeout)
+      self._lock.acquire()
+      try:
+        for (source, data) in received:
+          sentences = source.frameData(data)
+          stats = self._stats.get(source)
+          if stats == None:
+            continue
+          stats["bytes"] += len(data)
+          stats["sentences"] += len(sentences)
+          self._pending[source].extend(sentences)
+          self._submit(source)
+      finally:
+        self._lock.release()
+
+    self._pool.close()
+    self._pool.join()
+    multiplexer.close()
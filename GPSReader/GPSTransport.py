@@ -0,0 +1,331 @@
+# -*- coding: ascii -*-
+
+# Transports deliver the raw NMEA data to the GPSReader. Besides the serial
+# interface the data can be received over TCP (as client or server), UDP or read
+# from a file, a pipe or stdin. All transports are read with a timeout, thus the
+# reader thread never blocks, and reconnect with an exponential backoff.
+
+import os, sys, time, select, socket
+
+import NMEAframer
+from GPSError import *
+
+# Waiting time before the first reconnect, doubled after every failed attempt
+reconnect_min = 0.5
+reconnect_max = 30.0
+
+# Timeout of a TCP connect in seconds
+connect_timeout = 5.0
+
+# Maximum number of bytes which are read at once
+read_size = 4096
+
+def waitReadable(fd, timeout):
+  """ returns True if fd becomes readable within timeout seconds """
+  try:
+    return len(select.select([fd], [], [], timeout)[0]) > 0
+  except select.error:
+    # e.g. EINTR, the caller will simply try again
+    return False
+# waitReadable
+
+class Transport(object):
+  """ Transport - Base class of the transports
+
+  A subclass implements _open(), _read() and _close(). read() connects if necessary
+  and reconnects after an error with an exponential backoff (reconnect_min up to
+  reconnect_max seconds). The backoff starts again at reconnect_min as soon as data
+  has been received, thus a device which opens but stays silent is retried less and
+  less often. Transports with reconnect = False (files) are finished
+  after the first EOF. """
+  reconnect = True
+
+  def __init__(self, name):
+    self.name = name
+    self._connected = False
+    self._finished = False
+    self._backoff = reconnect_min
+    self._nextAttempt = 0.0
+    self._reconnects = 0
+
+  def __repr__(self):
+    return "<%s %s>" % (self.__class__.__name__, self.name)
+
+  def connect(self):
+    """ Connects the transport or raises GPSCommError """
+    if self._connected:
+      return
+    try:
+      self._open()
+    except EnvironmentError, e:
+      self._close()
+      raise GPSCommError("Connection with %s failed: %s" % (self.name, e))
+    self._connected = True
+
+  def close(self):
+    """ Closes the transport, read() will connect again """
+    self._connected = False
+    self._close()
+
+  def isConnected(self):
+    return self._connected
+
+  def hasPeer(self):
+    """ returns True if a sender is connected which is expected to deliver data
+    continuously. The stall detection of the GPSReader only applies in that case. """
+    return self._connected
+
+  def isFinished(self):
+    """ returns True if a transport without reconnect has reached its EOF """
+    return self._finished
+
+  def getReconnects(self):
+    """ returns the number of connection losses """
+    return self._reconnects
+
+  def read(self, timeout):
+    """ Reads the available data and waits up to timeout seconds if there is none.
+    Returns an empty string if nothing has been received, errors (also of the
+    connect) are handled by a reconnect. """
+    if not self._connected:
+      if self._finished or (time.time() < self._nextAttempt):
+        time.sleep(timeout)
+        return ""
+      try:
+        self.connect()
+      except GPSCommError:
+        self._retryLater()
+        return ""
+
+    try:
+      data = self._read(timeout)
+    except EnvironmentError:
+      data = None
+    if data == None:
+      # EOF or the connection is broken
+      self.drop()
+      return ""
+    if data and (self._backoff <> reconnect_min):
+      self._backoff = reconnect_min
+    return data
+
+  def drop(self):
+    """ Closes a broken (or stalled) connection, read() reconnects after the backoff """
+    self._reconnects += 1
+    self.close()
+    if self.reconnect:
+      self._retryLater()
+    else:
+      self._finished = True
+
+  def _retryLater(self):
+    self._nextAttempt = time.time() + self._backoff
+    self._backoff = min(self._backoff * 2, reconnect_max)
+
+  # The methods of the subclasses. _read() returns "" if there is no data and None
+  # at EOF, errors are raised as EnvironmentError (IOError, OSError, socket.error).
+  def _open(self):
+    raise NotImplementedError
+
+  def _read(self, timeout):
+    raise NotImplementedError
+
+  def _close(self):
+    pass
+
+class SerialTransport(Transport):
+  """ SerialTransport - Serial interface (pyserial)
+
+  The port is a device name or a pyserial URL (e.g. "rfc2217://host:port"). """
+  def __init__(self, port, baudrate=4800):
+    Transport.__init__(self, port)
+    self._baudrate = baudrate
+    self._serial = None
+
+  def _open(self):
+    # pyserial is only needed for this transport
+    import serial
+    try:
+      self._serial = serial.serial_for_url(self.name, baudrate=self._baudrate, timeout=0)
+    except (serial.SerialException, ValueError), e:
+      raise IOError(str(e))
+
+  def _read(self, timeout):
+    port = self._serial
+    if port.timeout <> timeout:
+      port.timeout = timeout
+    return NMEAframer.readAvailable(port)
+
+  def _close(self):
+    if self._serial <> None:
+      self._serial.close()
+      self._serial = None
+
+class SocketTransport(Transport):
+  """ SocketTransport - Base class of the socket transports """
+  def __init__(self, host, port):
+    Transport.__init__(self, "%s:%d" % (host, port))
+    self._address = (host, port)
+    self._socket = None
+
+  def _read(self, timeout):
+    if not waitReadable(self._socket, timeout):
+      return ""
+    data = self._socket.recv(read_size)
+    if data == "":
+      return None
+    return data
+
+  def _close(self):
+    if self._socket <> None:
+      self._socket.close()
+      self._socket = None
+
+class TCPClientTransport(SocketTransport):
+  """ TCPClientTransport - Connects to a TCP server, e.g. a NMEA multiplexer """
+  def _open(self):
+    self._socket = socket.create_connection(self._address, connect_timeout)
+
+class TCPServerTransport(SocketTransport):
+  """ TCPServerTransport - Waits for a TCP client which sends the NMEA data
+
+  One client is read at a time. If it disconnects the next client is accepted. """
+  def __init__(self, port, host=""):
+    SocketTransport.__init__(self, host, port)
+    self._client = None
+
+  def _open(self):
+    self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self._socket.bind(self._address)
+    self._socket.listen(1)
+
+  def getAddress(self):
+    """ returns the (host, port) the server is listening on """
+    return self._socket.getsockname()
+
+  def hasPeer(self):
+    # A server which is still waiting for a client isn't stalled
+    return self._connected and (self._client <> None)
+
+  def drop(self):
+    # A stalled client is closed, the server keeps listening for the next one
+    if self._client <> None:
+      self._reconnects += 1
+      self._client.close()
+      self._client = None
+    else:
+      SocketTransport.drop(self)
+
+  def _read(self, timeout):
+    if self._client == None:
+      if waitReadable(self._socket, timeout):
+        self._client = self._socket.accept()[0]
+      return ""
+
+    if not waitReadable(self._client, timeout):
+      return ""
+    try:
+      data = self._client.recv(read_size)
+    except socket.error:
+      data = ""
+    if data == "":
+      # The client is gone, wait for the next one
+      self._client.close()
+      self._client = None
+    return data
+
+  def _close(self):
+    if self._client <> None:
+      self._client.close()
+      self._client = None
+    SocketTransport._close(self)
+
+class UDPTransport(SocketTransport):
+  """ UDPTransport - Receives NMEA datagrams (unicast or broadcast) """
+  def __init__(self, port, host=""):
+    SocketTransport.__init__(self, host, port)
+
+  def _open(self):
+    self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    self._socket.bind(self._address)
+
+  def getAddress(self):
+    """ returns the (host, port) the socket is bound to """
+    return self._socket.getsockname()
+
+  def hasPeer(self):
+    # A quiet port has no connection which could be reopened
+    return False
+
+  def _read(self, timeout):
+    if not waitReadable(self._socket, timeout):
+      return ""
+    # An empty datagram is no EOF
+    return self._socket.recv(65535)
+
+class FileTransport(Transport):
+  """ FileTransport - Reads a file, a named pipe or stdin ("-")
+
+  The source is a filename, "-" or an opened file object. The transport is finished
+  at the EOF. Waiting for data with a timeout only works on POSIX. """
+  reconnect = False
+
+  def __init__(self, source):
+    if isinstance(source, basestring):
+      Transport.__init__(self, source)
+      self._source = source
+    else:
+      Transport.__init__(self, getattr(source, "name", repr(source)))
+      self._source = source
+    self._file = None
+
+  def _open(self):
+    if self._source == "-":
+      self._file = sys.stdin
+    elif isinstance(self._source, basestring):
+      self._file = open(self._source, "rb")
+    else:
+      self._file = self._source
+
+  def _read(self, timeout):
+    fd = self._file.fileno()
+    if not waitReadable(fd, timeout):
+      return ""
+    data = os.read(fd, read_size)
+    if data == "":
+      return None
+    return data
+
+  def _close(self):
+    # Only files which have been opened by the transport are closed
+    if (self._file <> None) and isinstance(self._source, basestring) and (self._source <> "-"):
+      self._file.close()
+    self._file = None
+
+def createTransport(url, baudrate=4800):
+  """ Creates a transport from an URL:
+
+    tcp://host:port          TCPClientTransport
+    tcpserver://[host]:port  TCPServerTransport
+    udp://[host]:port        UDPTransport
+    file:///path or -        FileTransport (- is stdin)
+
+  Anything else is opened as serial interface (SerialTransport). """
+  if url == "-":
+    return FileTransport(url)
+  if url.startswith("file://"):
+    return FileTransport(url[7:])
+
+  if url.startswith("tcp://"):
+    (host, port) = url[6:].rsplit(":", 1)
+    return TCPClientTransport(host, int(port))
+  for scheme, transportClass in (("tcpserver://", TCPServerTransport), ("udp://", UDPTransport)):
+    if url.startswith(scheme):
+      (host, port) = url[len(scheme):].rsplit(":", 1)
+      return transportClass(int(port), host)
+
+  return SerialTransport(url, baudrate)
+# createTransport
@@ -0,0 +1,229 @@
+# -*- coding: ascii -*-
+
+# Columnar (NumPy) decoding of NMEA sentences. Instead of one telegram object and one
+# GPSPosition per fix, many GGA/RMC sentences are decoded at once into a NumPy
+# structured array. This module needs numpy, the rest of the package doesn't.
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+import NMEAtelegrams, NMEAutils
+from NMEAutils import GPSPosition
+
+# Columns of the array returned by decodeFixes(). Missing values are NaN (floats)
+# or -1 (integers), e.g. the altitude of a RMC row or the speed of a GGA row.
+fix_dtype = [
+  ("formatter",  "S3"),   # GGA or RMC
+  ("time",       "f8"),   # UTC, seconds since midnight
+  ("lat",        "f8"),   # decimal degrees, negative = S
+  ("lon",        "f8"),   # decimal degrees, negative = W
+  ("valid",      "?"),    # GGA: fix quality > 0, RMC: status A
+  ("quality",    "i1"),   # GGA fix quality
+  ("satellites", "i1"),   # GGA number of satellites
+  ("hdop",       "f4"),   # GGA HDOP
+  ("altitude",   "f4"),   # GGA antenna altitude (m)
+  ("sog",        "f4"),   # RMC speed over ground (knots)
+  ("cog",        "f4"),   # RMC course over ground (degrees true)
+]
+
+# WGS84 flattening, the same value as used by GPSPosition.calculateDistance
+wgs84_flattening = 1 / 298.257223563
+
+# Number of sentences which are converted at once. Limits the memory of the
+# intermediate string table.
+decode_chunksize = 100000
+
+def _requireNumpy():
+  if numpy == None:
+    raise ImportError("NMEAarrays needs numpy")
+
+def _splitRow(sentence, verify):
+  """ Returns the fields of a GGA/RMC sentence in the column order of fix_dtype (as
+  strings) or None if the sentence is of another type or invalid. """
+  formatter = NMEAtelegrams.getSentenceFormatter(sentence)
+  if (formatter <> "GGA") and (formatter <> "RMC"):
+    return None
+  if verify and not NMEAutils.VerifyNMEAChkSum(sentence):
+    return None
+
+  f = sentence[7:sentence.rfind("*")].split(",")
+  if (formatter == "GGA") and (len(f) >= 9):
+    #       time  lat   n/s   lon   e/w   valid                  quality sats  hdop  alt  sog cog
+    return ("GGA", f[0], f[1], f[2], f[3], f[4], f[5] not in ("", "0"), f[5], f[6], f[7], f[8], "", "")
+  if (formatter == "RMC") and (len(f) >= 8):
+    return ("RMC", f[0], f[2], f[3], f[4], f[5], f[1] == "A", "", "", "", "", f[6], f[7])
+  return None
+
+def _parseFloat(value):
+  try:
+    return float(value)
+  except ValueError:
+    return numpy.nan
+
+def _toFloat(column):
+  """ Converts a column of strings into floats, empty strings and fields which are
+  no number become NaN """
+  column = column.copy()
+  column[column == ""] = "nan"
+  try:
+    return column.astype(numpy.float64)
+  except ValueError:
+    # A garbage field, only this column is converted one value at a time
+    return numpy.array([ _parseFloat(value) for value in column ], dtype=numpy.float64)
+
+def _toDegrees(values, hemisphere, negative):
+  """ Vectorized version of parseLatitude/parseLongitude: ddmm.mmmm -> decimal degrees """
+  degrees = numpy.trunc(values / 100.0)
+  result = degrees + (values - degrees * 100.0) / 60.0
+  return numpy.where(hemisphere == negative, -result, result)
+
+def _toSeconds(values):
+  """ hhmmss.ss -> seconds since midnight """
+  hours = numpy.floor(values / 10000.0)
+  minutes = numpy.floor((values - hours * 10000.0) / 100.0)
+  return hours * 3600.0 + minutes * 60.0 + (values - hours * 10000.0 - minutes * 100.0)
+
+def _convertRows(rows):
+  if len(rows) == 0:
+    return numpy.empty(0, dtype=fix_dtype)
+  # The string length of the table is the one of the longest field
+  table = numpy.array([ row[:6] + row[7:] for row in rows ], dtype=str)
+  result = numpy.empty(len(rows), dtype=fix_dtype)
+  result["formatter"] = table[:, 0]
+  result["time"] = _toSeconds(_toFloat(table[:, 1]))
+  result["lat"] = _toDegrees(_toFloat(table[:, 2]), table[:, 3], "S")
+  result["lon"] = _toDegrees(_toFloat(table[:, 4]), table[:, 5], "W")
+  result["valid"] = [ row[6] for row in rows ]
+  for (name, col) in (("quality", 6), ("satellites", 7)):
+    values = _toFloat(table[:, col])
+    result[name] = numpy.where(numpy.isnan(values), -1, values)
+  result["hdop"] = _toFloat(table[:, 8])
+  result["altitude"] = _toFloat(table[:, 9])
+  result["sog"] = _toFloat(table[:, 10])
+  result["cog"] = _toFloat(table[:, 11])
+  return result
+
+def decodeFixes(sentences, verify=True):
+  """ Decodes GGA and RMC sentences into a NumPy structured array (see fix_dtype)
+  with one row per sentence in the order of the input. Other sentences, sentences
+  with a wrong checksum (if verify is True) or too few fields are skipped.
+
+  sentences is either an iterable of sentences (e.g. a list or a file object) or a
+  buffer (str, bytearray or memoryview) with one sentence per line. """
+  _requireNumpy()
+  if isinstance(sentences, memoryview):
+    sentences = sentences.tobytes()
+  if isinstance(sentences, (basestring, bytearray)):
+    sentences = str(sentences).splitlines()
+
+  chunks = list()
+  rows = list()
+  for sentence in sentences:
+    row = _splitRow(sentence.strip(), verify)
+    if row <> None:
+      rows.append(row)
+      if len(rows) >= decode_chunksize:
+        chunks.append(_convertRows(rows))
+        rows = list()
+  if (len(rows) > 0) or (len(chunks) == 0):
+    chunks.append(_convertRows(rows))
+
+  if len(chunks) == 1:
+    return chunks[0]
+  return numpy.concatenate(chunks)
+
+############################################################################
+# Vectorized geodesy, same formulas as GPSPosition.calculateDistance and
+# GPSPosition.calculateBearing but for whole arrays of positions.
+############################################################################
+def positionsToArrays(positions):
+  """ Returns the latitudes and longitudes of positions as two float arrays.
+
+  positions is either a sequence of GPSPosition, an array returned by
+  decodeFixes() or anything that can be converted into an (N, 2) array of
+  latitude/longitude pairs in decimal degrees. """
+  _requireNumpy()
+  if isinstance(positions, numpy.ndarray) and (positions.dtype.names <> None):
+    return (numpy.asarray(positions["lat"], dtype=numpy.float64),
+            numpy.asarray(positions["lon"], dtype=numpy.float64))
+  if (len(positions) > 0) and isinstance(positions[0], GPSPosition):
+    return (numpy.array([ p.latitude for p in positions ], dtype=numpy.float64),
+            numpy.array([ p.longitude for p in positions ], dtype=numpy.float64))
+  table = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 2)
+  return (table[:, 0], table[:, 1])
+
+def _distance(lat1, lon1, lat2, lon2):
+  """ Distance in meters, the arguments are broadcasted against each other """
+  sf = wgs84_flattening
+  sa = float(GPSPosition.R)
+
+  cF = numpy.radians((lat1 + lat2) / 2.0)
+  cG = numpy.radians((lat1 - lat2) / 2.0)
+  sl = numpy.radians((lon1 - lon2) / 2.0)
+
+  sinF2 = numpy.sin(cF)**2
+  cosF2 = numpy.cos(cF)**2
+  sinG2 = numpy.sin(cG)**2
+  cosG2 = numpy.cos(cG)**2
+  sinl2 = numpy.sin(sl)**2
+  cosl2 = numpy.cos(sl)**2
+
+  cS = (sinG2 * cosl2) + (cosF2 * sinl2)
+  cC = (cosG2 * cosl2) + (sinF2 * sinl2)
+
+  old = numpy.seterr(divide="ignore", invalid="ignore")
+  try:
+    sw = numpy.arctan(numpy.sqrt(cS / cC))
+    cD = (2 * sw * sa)
+    cR = numpy.sqrt(cS * cC) / sw
+    cH1 = (3 * cR - 1) / (2 * cC)
+    cH2 = (3 * cR + 1) / (2 * cS)
+    distance = cD * (1 + sf * cH1 * sinF2 * cosG2 - sf * cH2 * cosF2 * sinG2)
+  finally:
+    numpy.seterr(**old)
+
+  # Identical positions, GPSPosition.calculateDistance returns 0.0 as well
+  return numpy.where(sw == 0, 0.0, distance)
+
+def _bearing(lat1, lon1, lat2, lon2):
+  """ True course in degrees, the arguments are broadcasted against each other """
+  SLat = numpy.radians(lat1)
+  ZLat = numpy.radians(lat2)
+  dLong = numpy.radians(lon2) - numpy.radians(lon1)
+
+  y = numpy.sin(dLong) * numpy.cos(ZLat)
+  x = (numpy.cos(SLat) * numpy.sin(ZLat)) - numpy.sin(SLat) * numpy.cos(ZLat) * numpy.cos(dLong)
+
+  return (numpy.degrees(numpy.arctan2(y, x)) + 360) % 360
+
+def distanceMatrix(origins, destinations):
+  """ Returns an N x M array with the distance in meters from each of the N origins
+  to each of the M destinations (see positionsToArrays for the accepted types). """
+  (lat1, lon1) = positionsToArrays(origins)
+  (lat2, lon2) = positionsToArrays(destinations)
+  return _distance(lat1[:, numpy.newaxis], lon1[:, numpy.newaxis], lat2[numpy.newaxis, :], lon2[numpy.newaxis, :])
+
+def bearingMatrix(origins, destinations):
+  """ Returns an N x M array with the bearing from each of the N origins to each of
+  the M destinations. """
+  (lat1, lon1) = positionsToArrays(origins)
+  (lat2, lon2) = positionsToArrays(destinations)
+  return _bearing(lat1[:, numpy.newaxis], lon1[:, numpy.newaxis], lat2[numpy.newaxis, :], lon2[numpy.newaxis, :])
+
+def trackDistances(track):
+  """ Returns the N-1 distances in meters between consecutive positions of a track """
+  (lat, lon) = positionsToArrays(track)
+  return _distance(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+def trackBearings(track):
+  """ Returns the N-1 bearings between consecutive positions of a track """
+  (lat, lon) = positionsToArrays(track)
+  return _bearing(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+def pathLength(track):
+  """ Returns the cumulative path length in meters for each of the N positions of a
+  track. The first value is 0.0, the last one the length of the whole track. """
+  distances = trackDistances(track)
+  return numpy.concatenate(( [0.0], numpy.cumsum(distances) ))
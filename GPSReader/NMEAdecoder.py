@@ -0,0 +1,469 @@
+# -*- coding: ascii -*-
+
+# The NMEADecoder contains everything of the GPSReader that doesn't need the serial
+# interface: the dispatch of the sentences to the telegram objects, the checksum
+# verification and the parsing. It is used by the GPSReader thread and for the
+# replay of recorded NMEA log files. AIS sentences (!AIVDM, !AIVDO) are handed to
+# an AISDecoder and published like the telegrams.
+
+import NMEAtelegrams, NMEAutils, NMEAevents, NMEAstats, AISdecoder
+from GPSError import *
+
+# Size of the read buffer which is used if a log file is opened by replay()
+replay_buffersize = 1024 * 1024
+
+class NMEADecoder(object):
+  """ NMEADecoder - Dispatches NMEA sentences to the different telegram classes
+
+  One telegram object is created for each registered sentence formatter. Every
+  telegram is also available as attribute, e.g. self.GGA or self.RMC
+
+  With lazy=True the telegrams only convert the fields which are actually read
+  (see NMEASentence_Base).
+
+  Every sentence is parsed into a new telegram object which is published afterwards
+  with a single reference swap (e.g. self.GGA). Another thread which holds a telegram
+  thus always sees the fields of one and the same sentence without taking a lock. The
+  telegrams GGA, RMC, VTG and GSA of the same UTC second are combined in self.epoch
+  (see NMEAEpoch).
+
+  Instead of polling the telegrams one can subscribe callbacks to sentence types and
+  to derived events (see subscribe()). The callbacks run in the thread which decodes
+  the sentences or, after startCallbackWorker(), in a separate worker thread.
+
+  AIS sentences are reassembled and decoded into AISMessage objects, which are
+  published to the subscribers of "VDM"/"VDO" and NMEAevents.EVENT_AIS ("ais"). """
+  def __init__(self, lazy=False):
+    self._rawdata = None
+    self._lazy = lazy
+
+    # event -> tuple of callbacks. The tuples are replaced, never changed, thus the
+    # decoding thread can iterate over them while other threads subscribe.
+    self._subscribers = dict()
+    self._speedSubscribers = tuple()
+    self._callbackWorker = None
+    self._hasFix = False
+    self._dropped = 0
+    self._stats = None
+    self._ais = None
+
+    self.epoch = NMEAEpoch(None)
+
+    self._telegrams = dict()
+    for formatter, sentenceClass in NMEAtelegrams.sentence_registry.items():
+      self.registerSentence(formatter, sentenceClass)
+
+  def registerSentence(self, formatter, sentenceClass):
+    """ Adds a sentence class to the dispatcher of this decoder. The telegram will
+    be available as attribute with the name of the formatter (e.g. self.ZDA). """
+    if not issubclass(sentenceClass, NMEAtelegrams.NMEASentence_Base):
+      raise NMEATypeError
+    formatter = formatter.upper()
+    if self._lazy:
+      telegram = sentenceClass(lazy=True)
+    else:
+      telegram = sentenceClass()
+    self._telegrams[formatter] = telegram
+    setattr(self, formatter, telegram)
+
+  def getRawdata(self):
+    """ Lets you watch the rawdata in case something is bothering you :D"""
+    return self._rawdata
+
+  def decodeSentence(self, sentence):
+    """ Verifies the checksum of a single sentence (without EOL) and parses it into
+    the matching telegram. Returns the telegram or None if the sentence is unknown,
+    has a wrong checksum or couldn't be parsed. """
+    self._rawdata = sentence  # Store the Raw Sentence for debugging purpose.
+    stats = self._stats
+    if stats <> None:
+      start = NMEAstats.timer()
+
+    # The formatter (e.g. GGA) is located at a fixed offset, thus one dict lookup
+    # is enough to find the telegram. Only known sentences are checksummed.
+    formatter = NMEAtelegrams.getSentenceFormatter(sentence)
+    telegram = self._telegrams.get(formatter)
+    if telegram == None:
+      if sentence[0:1] == "!":
+        return self._decodeAIS(sentence, stats)
+      if stats <> None:
+        stats.countDispatchMiss()
+      return None
+    if stats <> None:
+      stats.countSentence(formatter, start)
+    if NMEAutils.VerifyNMEAChkSum(sentence) <> True:
+      self._dropped += 1
+      if stats <> None:
+        stats.countChecksumFailure(formatter)
+      return None
+
+    # Parse into a new object and publish it afterwards, the current one is never changed
+    telegram = telegram.newInstance()
+    try:
+      telegram.parseSentence(sentence)
+    except (NMEAParseError, NMEATypeError):
+      # A single malformed sentence shouldn't stop the whole decoder
+      self._dropped += 1
+      if stats <> None:
+        stats.countParseError(formatter)
+      return None
+
+    if stats == None:
+      self.publishTelegram(formatter, telegram)
+      return telegram
+
+    stats.observeParse(formatter, NMEAstats.timer() - start)
+    self.publishTelegram(formatter, telegram)
+    if formatter in NMEAevents.fix_formatters:
+      try:
+        fix = telegram.hasFix()
+      except NMEATypeError:
+        fix = False
+      if fix:
+        # The line has been received with the chunk which has been read last
+        if stats.received <> None:
+          start = stats.received
+        stats.observeFix(NMEAstats.timer() - start)
+    return telegram
+
+  def _decodeAIS(self, sentence, stats):
+    """ decodeSentence() of the AIS sentences, returns the AISMessage if the sentence
+    completes a message """
+    if stats <> None:
+      start = NMEAstats.timer()
+    formatter = AISdecoder.getAISFormatter(sentence)
+    if formatter == None:
+      if stats <> None:
+        stats.countDispatchMiss()
+      return None
+    if stats <> None:
+      stats.countSentence(formatter, start)
+    sentence = AISdecoder.stripMetadata(sentence)
+    if NMEAutils.VerifyNMEAChkSum(sentence) <> True:
+      self._dropped += 1
+      if stats <> None:
+        stats.countChecksumFailure(formatter)
+      return None
+
+    if self._ais == None:
+      self._ais = AISdecoder.AISDecoder()
+    try:
+      message = self._ais.decodeSentence(sentence)
+    except NMEAParseError:
+      self._dropped += 1
+      if stats <> None:
+        stats.countParseError(formatter)
+      return None
+    if message == None:
+      # a fragment of a multi-sentence message
+      return None
+
+    if stats <> None:
+      stats.observeParse(formatter, NMEAstats.timer() - start)
+    self.publishMessage(message)
+    return message
+
+  def publishMessage(self, message):
+    """ Publishes a decoded AISMessage to the subscribers of its formatter ("VDM" or
+    "VDO") and of NMEAevents.EVENT_AIS """
+    if self._subscribers:
+      self._publish(message.formatter, (message,))
+      self._publish(NMEAevents.EVENT_AIS, (message,))
+
+  def getAISDecoder(self):
+    """ returns the AISDecoder or None if no AIS sentence has been received yet """
+    return self._ais
+
+  def publishTelegram(self, formatter, telegram):
+    """ Publishes a telegram which has already been parsed (e.g. by a worker of the
+    GPSReaderPool): replaces the current telegram, updates the epoch and runs the
+    callbacks. """
+    self._telegrams[formatter] = telegram
+    setattr(self, formatter, telegram)
+
+    if formatter in NMEAEpoch.formatters:
+      self._updateEpoch(formatter, telegram)
+
+    if self._subscribers or self._speedSubscribers:
+      self._notify(formatter, telegram)
+
+  def enableInstrumentation(self):
+    """ Starts to count the sentences, errors and latencies and returns the NMEAStats
+    object (see NMEAstats), which can be exported with asDict() or toPrometheus() """
+    if self._stats == None:
+      self._stats = NMEAstats.NMEAStats()
+    return self._stats
+
+  def getInstrumentation(self):
+    """ returns the NMEAStats object or None if the instrumentation is disabled """
+    return self._stats
+
+  def getDropped(self):
+    """ returns the number of known sentences which have been dropped because of a
+    wrong checksum or because they couldn't be parsed """
+    return self._dropped
+
+  def getEpoch(self):
+    """ returns the NMEAEpoch of the current UTC second """
+    return self.epoch
+
+  def getFixQuality(self):
+    """ returns the NMEAFixQuality of the current UTC second """
+    return self.epoch.getFixQuality()
+
+  def _updateEpoch(self, formatter, telegram):
+    epoch = self.epoch
+    if formatter in NMEAEpoch.timed_formatters:
+      try:
+        second = telegram[0].split(".")[0]
+      except (AttributeError, NMEATypeError):
+        second = None
+      if second <> epoch.time:
+        # A new second begins, the previous epoch is complete
+        if (epoch.time <> None) and (NMEAevents.EVENT_EPOCH in self._subscribers):
+          self._publish(NMEAevents.EVENT_EPOCH, (epoch,))
+        self.epoch = NMEAEpoch(second, **{formatter: telegram})
+        return
+    self.epoch = epoch.replace(formatter, telegram)
+
+  def subscribe(self, event, callback):
+    """ Subscribes callback to an event. The event is either a sentence formatter
+    (e.g. "GGA"), NMEAevents.EVENT_FIX ("fix") for every sentence with a valid position
+    or NMEAevents.EVENT_FIXLOST ("fixlost") if the fix has been lost. The callback
+    is called with the telegram as only argument. For NMEAevents.EVENT_EPOCH ("epoch")
+    the callback is called with the complete NMEAEpoch of the previous second.
+    "VDM", "VDO" and NMEAevents.EVENT_AIS ("ais", both) are called with the decoded
+    AISMessage. """
+    if not callable(callback):
+      raise GPSError
+    if event not in NMEAevents.derived_events:
+      event = event.upper()
+    self._subscribers[event] = self._subscribers.get(event, tuple()) + (callback,)
+
+  def subscribeSpeed(self, threshold, callback):
+    """ Subscribes callback to the speed over ground (RMC/VTG). The callback is called
+    with the telegram and the speed in km/h whenever the speed crosses the threshold
+    (km/h) in either direction. """
+    if not callable(callback):
+      raise GPSError
+    # [threshold, callback, speed above threshold?]
+    self._speedSubscribers = self._speedSubscribers + ([threshold, callback, False],)
+
+  def unsubscribe(self, event, callback):
+    """ Removes the callback from the event. event "speed" removes a callback which has
+    been subscribed with subscribeSpeed(). """
+    if event == "speed":
+      self._speedSubscribers = tuple([ s for s in self._speedSubscribers if s[1] <> callback ])
+      return
+    if event not in NMEAevents.derived_events:
+      event = event.upper()
+    callbacks = tuple([ c for c in self._subscribers.get(event, tuple()) if c <> callback ])
+    if len(callbacks) > 0:
+      self._subscribers[event] = callbacks
+    elif event in self._subscribers:
+      del self._subscribers[event]
+
+  def startCallbackWorker(self, maxsize=100):
+    """ Runs the callbacks in a worker thread instead of the decoding thread. Up to
+    maxsize callbacks are queued, further callbacks are dropped. """
+    if self._callbackWorker == None:
+      self._callbackWorker = NMEAevents.CallbackWorker(maxsize)
+
+  def stopCallbackWorker(self):
+    """ Stops the worker thread, the callbacks run in the decoding thread again """
+    worker = self._callbackWorker
+    self._callbackWorker = None
+    if worker <> None:
+      worker.stop()
+
+  def _publish(self, event, args):
+    callbacks = self._subscribers.get(event)
+    if callbacks:
+      for callback in callbacks:
+        self._runCallback(callback, args)
+
+  def _runCallback(self, callback, args):
+    worker = self._callbackWorker
+    if worker <> None:
+      worker.put(callback, args)
+    else:
+      NMEAevents.runCallback(callback, args)
+
+  def _notify(self, formatter, telegram):
+    """ Publishes the events of a parsed telegram """
+    self._publish(formatter, (telegram,))
+
+    try:
+      if formatter in NMEAevents.fix_formatters:
+        fix = telegram.hasFix()
+        if fix:
+          self._publish(NMEAevents.EVENT_FIX, (telegram,))
+        elif self._hasFix:
+          self._publish(NMEAevents.EVENT_FIXLOST, (telegram,))
+        self._hasFix = fix
+
+      if self._speedSubscribers and (formatter in NMEAevents.speed_formatters) and telegram.hasFix():
+        speed = telegram.getSpeed()
+        for subscription in self._speedSubscribers:
+          above = (speed > subscription[0])
+          if above <> subscription[2]:
+            subscription[2] = above
+            self._runCallback(subscription[1], (telegram, speed))
+    except (NMEANoValidFix, NMEATypeError, ValueError):
+      # e.g. an empty speed field or a lazy field which can't be converted
+      pass
+
+  def decodeStream(self, source):
+    """ Generator which decodes every line of source (any iterable of lines, e.g. a
+    file object) and yields the updated telegrams and the decoded AIS messages. """
+    decodeSentence = self.decodeSentence
+    for line in source:
+      line = line.strip("\r\n")
+      if len(line) > 0:
+        telegram = decodeSentence(line)
+        if telegram <> None:
+          yield telegram
+
+class NMEAEpoch(object):
+  """ NMEAEpoch - Immutable combination of the telegrams of one UTC second
+
+  The time (hhmmss) is taken from GGA and RMC. VTG and GSA don't contain a time and
+  are assigned to the epoch of the last GGA/RMC. The telegrams which haven't been
+  received in this second are None. """
+  __slots__ = ("time", "GGA", "RMC", "VTG", "GSA")
+
+  # Sentences which are combined in an epoch
+  formatters = ("GGA", "RMC", "VTG", "GSA")
+
+  # Sentences with the UTC time in field 0
+  timed_formatters = ("GGA", "RMC")
+
+  def __init__(self, time, GGA=None, RMC=None, VTG=None, GSA=None):
+    object.__setattr__(self, "time", time)
+    object.__setattr__(self, "GGA", GGA)
+    object.__setattr__(self, "RMC", RMC)
+    object.__setattr__(self, "VTG", VTG)
+    object.__setattr__(self, "GSA", GSA)
+
+  def __setattr__(self, name, value):
+    raise AttributeError("NMEAEpoch is immutable")
+
+  def replace(self, formatter, telegram):
+    """ returns a new epoch where the telegram of formatter is replaced """
+    telegrams = dict( (name, getattr(self, name)) for name in self.__slots__ )
+    telegrams[formatter] = telegram
+    return NMEAEpoch(**telegrams)
+
+  def hasFix(self):
+    """ returns True if GGA or RMC of this epoch contain a valid position """
+    for telegram in (self.GGA, self.RMC):
+      if (telegram <> None) and telegram.hasFix():
+        return True
+    return False
+
+  def getPosition(self):
+    """ returns the position of the GGA (or of the RMC if there is no valid GGA) """
+    for telegram in (self.GGA, self.RMC):
+      if (telegram <> None) and telegram.hasFix():
+        return telegram.getPosition()
+    raise NMEANoValidFix
+
+  def getFixQuality(self):
+    """ returns the NMEAFixQuality of the GGA and GSA of this epoch """
+    return NMEAFixQuality(self.GGA, self.GSA)
+
+def _toNumber(convert, value):
+  try:
+    return convert(value)
+  except (TypeError, ValueError):
+    return None
+
+class NMEAFixQuality(object):
+  """ NMEAFixQuality - Immutable summary of the quality of a fix
+
+  quality: fix quality of the GGA (0 = invalid, 1 = GPS, 2 = DGPS, ...)
+  mode: fix mode of the GSA (1 = no fix, 2 = 2D, 3 = 3D)
+  satellites: number of satellites used for the fix (GGA)
+  pdop, hdop, vdop: DOP values of the GSA (HDOP of the GGA if there is no GSA)
+
+  Values which haven't been received in the epoch are None. """
+  __slots__ = ("quality", "mode", "satellites", "pdop", "hdop", "vdop")
+
+  def __init__(self, GGA=None, GSA=None):
+    values = dict.fromkeys(self.__slots__)
+    try:
+      if GGA <> None:
+        values["quality"] = GGA[5]
+        values["satellites"] = _toNumber(int, GGA[6])
+        values["hdop"] = _toNumber(float, GGA[7])
+      if GSA <> None:
+        values["mode"] = GSA[1]
+        for name, i in (("pdop", 14), ("hdop", 15), ("vdop", 16)):
+          if GSA[i] <> None:
+            values[name] = GSA[i]
+    except NMEATypeError:
+      # a field of a lazy telegram which can't be converted
+      pass
+    for name, value in values.items():
+      object.__setattr__(self, name, value)
+
+  def __setattr__(self, name, value):
+    raise AttributeError("NMEAFixQuality is immutable")
+
+  def __repr__(self):
+    return "NMEAFixQuality(%s)" % ", ".join([ "%s=%r" % (name, getattr(self, name)) for name in self.__slots__ ])
+
+  def hasFix(self):
+    """ returns True if GGA and GSA (as far as received) indicate a valid fix """
+    if (self.quality <> None) and not (1 <= self.quality <= 8):
+      return False
+    if (self.mode <> None) and (self.mode not in (2, 3)):
+      return False
+    return (self.quality <> None) or (self.mode <> None)
+
+def replay(source, buffersize=replay_buffersize, lazy=False):
+  """ Replays a recorded NMEA log through the telegram classes and yields every
+  parsed telegram and decoded AIS message. The source is either the filename of the log or a file object.
+  With lazy=True only the fields which are read are converted.
+
+  There is no serial interface, thread or sleep involved, thus the log is parsed
+  as fast as it can be read. """
+  decoder = NMEADecoder(lazy)
+  if isinstance(source, basestring):
+    logfile = open(source, "rb", buffersize)
+    try:
+      for telegram in decoder.decodeStream(logfile):
+        yield telegram
+    finally:
+      logfile.close()
+  else:
+    for telegram in decoder.decodeStream(source):
+      yield telegram
+
+################ TEST #####################################################
+if __name__ == '__main__':
+  import StringIO
+
+  log = StringIO.StringIO("$GPVTG,199.50,T,,M,0.24,N,0.4,K,N*04\r\n" \
+                          "$GPGGA,190055.000,5336.3190,N,00952.0345,E,1,06,2.2,44.0,M,45.1,M,,0000*66\r\n")
+  for telegram in replay(log):
+    print telegram.__class__.__name__, telegram
+
+  # A sentence class which builds its field list with addField() in __init__
+  class NMEA_ZDA(NMEAtelegrams.NMEASentence_Base):
+    def __init__(self, lazy=False):
+      super(NMEA_ZDA, self).__init__(lazy)
+      self.addField(NMEAtelegrams.NMEAField_String())  # 0. UTC time
+      self.addField(NMEAtelegrams.NMEAField_Int())     # 1. Day
+      self.addField(NMEAtelegrams.NMEAField_Int())     # 2. Month
+      self.addField(NMEAtelegrams.NMEAField_Int())     # 3. Year
+      self.addField(NMEAtelegrams.NMEAField_String())  # 4. Local zone hours
+      self.addField(NMEAtelegrams.NMEAField_String())  # 5. Local zone minutes
+
+  decoder = NMEADecoder()
+  decoder.registerSentence("ZDA", NMEA_ZDA)
+  for i in range(2):
+    telegram = decoder.decodeSentence("$GPZDA,201530.00,04,07,2002,00,00*60")
+    assert (telegram <> None) and (telegram[3] == 2002), decoder.getDropped()
+  assert decoder.getDropped() == 0
+  print telegram.__class__.__name__, telegram
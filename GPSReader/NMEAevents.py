@@ -0,0 +1,104 @@
+# -*- coding: ascii -*-
+
+# Events and the callback worker of the publish/subscribe interface of the
+# NMEADecoder (and thus of the GPSReader).
+
+import sys, traceback
+import threading, Queue
+
+# Derived events, the other events are the sentence formatters (e.g. "GGA")
+EVENT_FIX = "fix"          # a GGA/RMC/GLL with a valid position has been parsed
+EVENT_FIXLOST = "fixlost"  # the first GGA/RMC/GLL without valid position after a fix
+EVENT_EPOCH = "epoch"      # the NMEAEpoch of a UTC second is complete
+EVENT_AIS = "ais"          # an AIS message (VDM or VDO) has been decoded
+
+derived_events = frozenset((EVENT_FIX, EVENT_FIXLOST, EVENT_EPOCH, EVENT_AIS))
+
+# Sentences which decide if there is a valid fix
+fix_formatters = frozenset(("GGA", "RMC", "GLL"))
+
+# Sentences which contain the speed over ground
+speed_formatters = frozenset(("RMC", "VTG"))
+
+def runCallback(callback, args):
+  """ Runs a callback. An exception of the callback is printed but doesn't stop the
+  thread which runs the callbacks. """
+  try:
+    callback(*args)
+  except Exception:
+    sys.stderr.write("Exception in callback %r:\n" % (callback,))
+    traceback.print_exc()
+
+class EventQueue(Queue.Queue):
+  """ EventQueue - Bounded queue which can be subscribed as callback
+
+  reader.subscribe("GGA", queue) puts every GGA into the queue, a consumer takes
+  them with queue.get(). If the consumer is too slow the oldest item is dropped,
+  thus the queue always holds the latest items and never grows beyond maxsize.
+  Callbacks with more than one argument (e.g. subscribeSpeed) put a tuple. """
+  def __init__(self, maxsize=100):
+    Queue.Queue.__init__(self, maxsize)
+    self._dropped = 0
+
+  def __call__(self, *args):
+    if len(args) == 1:
+      item = args[0]
+    else:
+      item = args
+    while True:
+      try:
+        self.put_nowait(item)
+        return
+      except Queue.Full:
+        try:
+          self.get_nowait()
+          self._dropped += 1
+        except Queue.Empty:
+          pass
+
+  def getDropped(self):
+    """ returns the number of items which have been dropped """
+    return self._dropped
+
+class CallbackWorker(threading.Thread):
+  """ CallbackWorker - Runs callbacks outside of the reader thread
+
+  The callbacks are handed over by a bounded queue. If the queue is full the
+  callback is dropped, thus a slow consumer can't block the reader thread or let
+  the memory grow without limit. """
+  def __init__(self, maxsize=100):
+    threading.Thread.__init__(self)
+    self._queue = Queue.Queue(maxsize)
+    self._dropped = 0
+
+    self.daemon = True
+    self.start()
+
+  def put(self, callback, args):
+    """ Queues a callback. Returns False if the queue is full and the callback
+    has been dropped. """
+    try:
+      self._queue.put_nowait( (callback, args) )
+    except Queue.Full:
+      self._dropped += 1
+      return False
+    return True
+
+  def getDropped(self):
+    """ returns the number of dropped callbacks """
+    return self._dropped
+
+  def getQueueSize(self):
+    """ returns the number of callbacks waiting in the queue """
+    return self._queue.qsize()
+
+  def stop(self):
+    """ Stops the worker after the callbacks which are already queued """
+    self._queue.put(None)
+
+  def run(self):
+    while True:
+      item = self._queue.get()
+      if item == None:
+        break
+      runCallback(item[0], item[1])
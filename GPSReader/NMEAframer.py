@@ -0,0 +1,91 @@
+# -*- coding: ascii -*-
+
+# Splits a stream of bytes, read in arbitrary chunks, into single NMEA sentences.
+
+# Longest line which is kept in the buffer while waiting for its EOL. NMEA allows
+# 82 characters, anything longer without EOL is garbage and will be dropped.
+max_linelength = 1024
+
+# Maximum number of bytes which are read from a serial interface at once
+max_readsize = 4096
+
+def readAvailable(port, size=max_readsize):
+  """ Reads the bytes which are waiting in the input buffer of a serial interface
+  (pyserial) with a single read(). If nothing is waiting one byte is requested,
+  thus the call returns after the timeout of the port at the latest. """
+  waiting = getattr(port, "in_waiting", None)
+  if waiting == None:
+    # pyserial < 3.0
+    waiting = port.inWaiting()
+  return port.read(min(max(waiting, 1), size))
+# readAvailable
+
+class NMEAFramer(object):
+  """ NMEAFramer - Frames sentences from a byte stream
+
+  The received chunks are appended to one buffer which is read from a moving start
+  offset, the consumed bytes are only removed once they fill half of the buffer.
+  Thus the bytes of a chunk are copied once and not moved again for every chunk.
+  Only complete lines (up to the last EOL) are returned, the rest stays in the
+  buffer until the next chunk arrives. Lines longer than maxlength are dropped,
+  with or without EOL. """
+  def __init__(self, maxlength=max_linelength):
+    self._buffer = bytearray()
+    self._start = 0           # first byte which hasn't been framed yet
+    self._skipping = False    # the rest of a dropped line is discarded up to its EOL
+    self._maxlength = maxlength
+    self._dropped = 0
+
+  def feed(self, data):
+    """ Adds a chunk of data and returns a list of the complete sentences (without
+    EOL). Empty lines and lines longer than maxlength are skipped. """
+    buf = self._buffer
+    buf.extend(data)
+    start = self._start
+
+    eol = buf.rfind("\n", start)
+    if eol == -1:
+      if len(buf) - start > self._maxlength:
+        # Garbage without EOL, the line is dropped up to its EOL
+        if not self._skipping:
+          self._dropped += 1
+        self._skipping = True
+        self._start = len(buf)
+        self._compact()
+      return []
+
+    lines = str(buf[start:eol]).split("\n")
+    self._start = eol + 1
+    self._compact()
+
+    if self._skipping:
+      # The end of the dropped line
+      del lines[0]
+      self._skipping = False
+    maxlength = self._maxlength
+    result = list()
+    for line in lines:
+      line = line.strip("\r")
+      if len(line) > maxlength:
+        self._dropped += 1
+      elif line <> "":
+        result.append(line)
+    return result
+
+  def _compact(self):
+    if self._start >= len(self._buffer):
+      del self._buffer[:]
+      self._start = 0
+    elif self._start > len(self._buffer) / 2:
+      del self._buffer[:self._start]
+      self._start = 0
+
+  def getDropped(self):
+    """ returns the number of lines which have been dropped because they were too long """
+    return self._dropped
+
+  def reset(self):
+    """ Drops the incomplete line in the buffer """
+    del self._buffer[:]
+    self._start = 0
+    self._skipping = False
@@ -0,0 +1,237 @@
+# -*- coding: ascii -*-
+
+# Scanner for (very) large NMEA log files. The log is memory mapped and the frames
+# ($ ... *hh) are located without copying every line into a new string. The result
+# is a compact offset index per sentence formatter which can be saved next to the
+# log, thus later queries don't have to scan the whole file again.
+
+import os, mmap, bisect
+import cPickle
+from array import array
+
+import NMEAtelegrams, NMEAutils
+from GPSError import *
+
+# Version of the saved index file. Index files with another version are ignored.
+index_version = 2
+
+# Extension of the index file, which is saved next to the log file
+index_extension = ".idx"
+
+# Field (counted after the formatter) which contains the UTC time hhmmss.ss
+time_fields = {
+  "GGA": 0,
+  "GLL": 4,
+  "GNS": 0,
+  "GBS": 0,
+  "GST": 0,
+  "RMC": 0,
+  "ZDA": 0,
+}
+
+def parseTimeOfDay(value):
+  """ Converts a NMEA time (hhmmss.ss) or a time like "12:00" or "12:00:30" into the
+  seconds since midnight. Returns -1.0 if the value can't be converted. """
+  try:
+    if ":" in value:
+      parts = [ float(part) for part in value.split(":") ] + [0.0, 0.0]
+      return parts[0] * 3600 + parts[1] * 60 + parts[2]
+    return int(value[0:2]) * 3600 + int(value[2:4]) * 60 + float(value[4:])
+  except (ValueError, TypeError):
+    return -1.0
+# parseTimeOfDay
+
+class NMEAIndex(object):
+  """ NMEAIndex - Memory mapped offset index of a NMEA log file
+
+  For every sentence formatter (e.g. GGA) the index holds the start offset, the
+  length and the time of day (if the sentence contains one) of each sentence in
+  compact arrays. The index is loaded from <logfile>.idx if that is up to date,
+  otherwise the log is scanned. Only the time of day is indexed, not the date: the
+  time range of a log which covers several days selects that time of every day. """
+  def __init__(self, filename):
+    self._filename = filename
+    self._file = open(filename, "rb")
+    self._size = os.fstat(self._file.fileno()).st_size
+    self._map = None
+    if self._size > 0:
+      self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    self._offsets = dict()  # formatter -> array of start offsets
+    self._lengths = dict()  # formatter -> array of lengths (without EOL)
+    self._times = dict()    # formatter -> array of seconds since midnight (-1.0 = no time)
+    self._sorted = dict()   # formatter -> (sorted times, their positions), built by _select
+
+    if not self.load():
+      self.scan()
+
+  def __del__(self):
+    self.close()
+
+  def close(self):
+    """ Closes the memory map and the log file """
+    if self._map <> None:
+      self._map.close()
+      self._map = None
+    if not self._file.closed:
+      self._file.close()
+
+  def _getIndexFilename(self):
+    return self._filename + index_extension
+
+  def _addFormatter(self, formatter):
+    self._offsets[formatter] = array("L")
+    self._lengths[formatter] = array("L")
+    self._times[formatter] = array("d")
+
+  def scan(self):
+    """ Scans the complete log file and rebuilds the index """
+    self._offsets.clear()
+    self._lengths.clear()
+    self._times.clear()
+    self._sorted.clear()
+    if self._map == None:
+      return
+
+    mm = self._map
+    size = self._size
+    offsets = self._offsets
+    valid_talkers = NMEAtelegrams.valid_talkers
+
+    pos = mm.find("$")
+    while pos <> -1:
+      eol = mm.find("\n", pos)
+      if eol == -1:
+        eol = size
+      end = eol
+      if (end > pos) and (mm[end-1] == "\r"):
+        end -= 1
+
+      # Only complete frames with a known talker ($ttfff,...*hh) are indexed
+      if (end - pos >= 10) and (mm[end-3] == "*") and (mm[pos+1:pos+3] in valid_talkers):
+        formatter = mm[pos+3:pos+6]
+        if formatter not in offsets:
+          self._addFormatter(formatter)
+        offsets[formatter].append(pos)
+        self._lengths[formatter].append(end - pos)
+
+        timestamp = -1.0
+        field = time_fields.get(formatter)
+        if field == 0:
+          comma = mm.find(",", pos+7, end)
+          if comma <> -1:
+            timestamp = parseTimeOfDay(mm[pos+7:comma])
+        elif field <> None:
+          fields = mm[pos+7:end-3].split(",")
+          if len(fields) > field:
+            timestamp = parseTimeOfDay(fields[field])
+        self._times[formatter].append(timestamp)
+
+      pos = mm.find("$", eol)
+
+  def save(self):
+    """ Saves the index next to the log file (<logfile>.idx) """
+    stat = os.stat(self._filename)
+    indexfile = open(self._getIndexFilename(), "wb")
+    try:
+      cPickle.dump( (index_version, stat.st_size, stat.st_mtime,
+                     self._offsets, self._lengths, self._times), indexfile, 2 )
+    finally:
+      indexfile.close()
+
+  def load(self):
+    """ Loads the saved index. Returns False if there is no index file or if the
+    index doesn't belong to the current state of the log file. """
+    try:
+      indexfile = open(self._getIndexFilename(), "rb")
+    except IOError:
+      return False
+    try:
+      (version, size, mtime, offsets, lengths, times) = cPickle.load(indexfile)
+    except Exception:
+      return False
+    finally:
+      indexfile.close()
+
+    stat = os.stat(self._filename)
+    if (version <> index_version) or (size <> stat.st_size) or (mtime <> stat.st_mtime):
+      return False
+
+    self._offsets = offsets
+    self._lengths = lengths
+    self._times = times
+    self._sorted.clear()
+    return True
+
+  def getFormatters(self):
+    """ returns a list of all sentence formatters found in the log """
+    return self._offsets.keys()
+
+  def count(self, formatter):
+    """ returns the number of sentences of the formatter """
+    return len(self._offsets.get(formatter, ()))
+
+  def getSentence(self, formatter, i):
+    """ returns the i-th sentence of the formatter (without EOL) """
+    start = self._offsets[formatter][i]
+    return self._map[start:start + self._lengths[formatter][i]]
+
+  def _select(self, formatter, start, end):
+    """ Yields the positions of the sentences between start and end (seconds since
+    midnight or a time like "12:00"). None means no limit. """
+    if isinstance(start, basestring):
+      start = parseTimeOfDay(start)
+    if isinstance(end, basestring):
+      end = parseTimeOfDay(end)
+
+    times = self._times.get(formatter, ())
+    if (start == None) and (end == None):
+      for i in xrange(len(times)):
+        yield i
+      return
+
+    # The times are searched with bisect in a sorted copy. Sentences without a time
+    # are left out, the copy also covers logs which pass midnight.
+    if formatter not in self._sorted:
+      pairs = sorted([ (times[i], i) for i in xrange(len(times)) if times[i] >= 0 ])
+      self._sorted[formatter] = (array("d", [ t for (t, i) in pairs ]),
+                                 array("L", [ i for (t, i) in pairs ]))
+    (keys, positions) = self._sorted[formatter]
+
+    first = 0
+    if start <> None:
+      first = bisect.bisect_left(keys, start)
+    last = len(keys)
+    if end <> None:
+      last = bisect.bisect_right(keys, end)
+    # In the order of the log
+    for i in sorted(positions[first:last]):
+      yield i
+
+  def sentences(self, formatter, start=None, end=None):
+    """ Generator for all sentences of the formatter. With start and/or end only the
+    sentences of that time of day are returned, e.g. sentences("RMC", "12:00", "13:00") """
+    mm = self._map
+    offsets = self._offsets.get(formatter)
+    lengths = self._lengths.get(formatter)
+    for i in self._select(formatter, start, end):
+      yield mm[offsets[i]:offsets[i] + lengths[i]]
+
+  def parseSentences(self, formatter, start=None, end=None, telegram=None):
+    """ Generator which parses the selected sentences with the registered telegram
+    class (NMEASentence_Base.parseSentence) and yields a new telegram for each one
+    (see NMEASentence_Base.newInstance), thus a yielded telegram is never changed.
+    Sentences with a wrong checksum or which couldn't be parsed are skipped. """
+    if telegram == None:
+      telegram = NMEAtelegrams.sentence_registry[formatter]()
+
+    for sentence in self.sentences(formatter, start, end):
+      if not NMEAutils.VerifyNMEAChkSum(sentence):
+        continue
+      current = telegram.newInstance()
+      try:
+        current.parseSentence(sentence)
+      except (NMEAParseError, NMEATypeError):
+        continue
+      telegram = current
+      yield current
@@ -0,0 +1,176 @@
+# -*- coding: ascii -*-
+
+# Parallel parsing of large NMEA log files. The log is split into chunks on
+# sentence boundaries, the chunks are parsed by a pool of worker processes with the
+# NMEADecoder and the telegrams are returned in the order of the log.
+
+import os, sys, time
+import multiprocessing
+
+import NMEAdecoder
+from GPSError import *
+
+# Default size of a chunk in bytes
+chunk_size = 8 * 1024 * 1024
+
+# Sentences which are split into several parts. A chunk boundary is never placed
+# inside a group, thus a group is always parsed by the same worker.
+multipart_formatters = frozenset(("GSV", "VDM", "VDO"))
+
+# Maximum number of lines a chunk boundary is moved to get past the open groups. A
+# group whose last part is lost doesn't move the boundary any further.
+max_grouplines = 64
+
+# Bytes before a chunk boundary which are read to find the groups open there
+group_lookback = 4096
+
+def isContinuation(line):
+  """ returns True if line is the second or a later part of a multi-part sentence
+  ($--GSV,total,number,... or !--VDM,total,number,...) """
+  if line[3:6] not in multipart_formatters:
+    return False
+  fields = line.split(",", 3)
+  if len(fields) < 3:
+    return False
+  try:
+    return int(fields[2]) > 1
+  except ValueError:
+    return False
+# isContinuation
+
+def _updateGroups(groups, line):
+  """ Adds the group of a part of a multi-part sentence to the set of the open
+  groups, or removes it with its last part. GSV groups are kept per talker, AIS
+  messages per sequential message id and channel. """
+  if line[3:6] not in multipart_formatters:
+    return
+  fields = line.split(",", 5)
+  try:
+    total = int(fields[1])
+    number = int(fields[2])
+  except (IndexError, ValueError):
+    return
+  if line[3:6] == "GSV":
+    key = line[1:6]
+  else:
+    key = (line[1:6], fields[3], fields[4])
+  if number >= total:
+    groups.discard(key)
+  else:
+    groups.add(key)
+# _updateGroups
+
+def _findGroupEnd(logfile, start, end):
+  """ Moves the chunk boundary end (the start of a line) past the parts of the groups
+  which are open there, also if other sentences are interleaved. Returns the new
+  boundary. """
+  groups = set()
+  begin = max(start, end - group_lookback)
+  logfile.seek(begin)
+  if begin > start:
+    # Partial line
+    logfile.readline()
+  while logfile.tell() < end:
+    _updateGroups(groups, logfile.readline())
+
+  logfile.seek(end)
+  for i in xrange(max_grouplines):
+    line = logfile.readline()
+    if (not line) or ((not groups) and (not isContinuation(line))):
+      break
+    _updateGroups(groups, line)
+    end = logfile.tell()
+  return end
+# _findGroupEnd
+
+def findChunks(logfile, size=chunk_size):
+  """ Splits the open log file into chunks of about size bytes. Returns a list of
+  (start, end) offsets. Every chunk starts at the beginning of a line and no
+  multi-part group is open at that line. """
+  logfile.seek(0, os.SEEK_END)
+  filesize = logfile.tell()
+
+  chunks = list()
+  start = 0
+  while start < filesize:
+    end = start + size
+    if end >= filesize:
+      chunks.append( (start, filesize) )
+      break
+
+    # Move the boundary to the start of the next line ...
+    logfile.seek(end - 1)
+    logfile.readline()
+    end = logfile.tell()
+
+    # ... and past the remaining parts of the open groups
+    end = _findGroupEnd(logfile, start, end)
+
+    if end >= filesize:
+      chunks.append( (start, filesize) )
+      break
+    chunks.append( (start, end) )
+    start = end
+  return chunks
+# findChunks
+
+def parseChunk(args):
+  """ Parses one chunk of a log file and returns the list of the telegrams. Runs in
+  the worker processes, args is the tuple (filename, start, end). """
+  (filename, start, end) = args
+  logfile = open(filename, "rb")
+  try:
+    logfile.seek(start)
+    data = logfile.read(end - start)
+  finally:
+    logfile.close()
+
+  decoder = NMEAdecoder.NMEADecoder()
+  return list(decoder.decodeStream(data.splitlines()))
+# parseChunk
+
+def parseArchive(filename, processes=None, size=chunk_size):
+  """ Generator which parses a NMEA log file with a pool of processes (default: one
+  per core) and yields the telegrams in the order of the log, like replay().
+
+  Each chunk is parsed by its own NMEADecoder, thus the telegram objects are only
+  shared within a chunk. The state which a decoder keeps over several sentences
+  (e.g. the satellites of a GSA cycle or the sky view of the GSV) starts empty in
+  every chunk, thus the first telegrams of a chunk can differ from replay(). """
+  logfile = open(filename, "rb")
+  try:
+    chunks = findChunks(logfile, size)
+  finally:
+    logfile.close()
+  if len(chunks) == 0:
+    return
+
+  pool = multiprocessing.Pool(processes)
+  try:
+    # imap() returns the results in the order of the chunks
+    for telegrams in pool.imap(parseChunk, [ (filename, start, end) for (start, end) in chunks ]):
+      for telegram in telegrams:
+        yield telegram
+    pool.close()
+  finally:
+    pool.terminate()
+    pool.join()
+# parseArchive
+
+################ TEST #####################################################
+if __name__ == '__main__':
+  # usage: NMEAparallel.py <logfile> [processes]
+  processes = None
+  if len(sys.argv) > 2:
+    processes = int(sys.argv[2])
+
+  counts = dict()
+  begin = time.time()
+  for telegram in parseArchive(sys.argv[1], processes):
+    name = telegram.__class__.__name__
+    counts[name] = counts.get(name, 0) + 1
+  duration = time.time() - begin
+
+  for name in sorted(counts):
+    print name, counts[name]
+  print "%d telegrams in %.2f s" % (sum(counts.values()), duration)
@@ -0,0 +1,217 @@
+# -*- coding: ascii -*-
+
+# Instrumentation of the decoder and the reader: counters per sentence type,
+# latency histograms of the parsing and of the time from a received line to the
+# published fix. The values can be exported as dict or in the Prometheus text
+# format. The instrumentation is off by default (see NMEADecoder.enableInstrumentation)
+
+import time
+from bisect import bisect_left
+from timeit import default_timer as timer
+
+# Upper bounds (seconds) of the buckets of the latency histograms
+latency_buckets = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Weight of a new interval in the moving average of the sentence rate
+rate_smoothing = 0.1
+
+def escapeLabel(value):
+  """ Escapes a label value for the Prometheus text format (backslash, double quote
+  and newline) """
+  return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+# escapeLabel
+
+class Histogram(object):
+  """ Histogram - Counts values in fixed buckets (the last one is +Inf) """
+  __slots__ = ("bounds", "counts", "count", "sum")
+
+  def __init__(self, bounds=latency_buckets):
+    self.bounds = bounds
+    self.counts = [0] * (len(bounds) + 1)
+    self.count = 0
+    self.sum = 0.0
+
+  def observe(self, value):
+    self.counts[bisect_left(self.bounds, value)] += 1
+    self.count += 1
+    self.sum += value
+
+  def asDict(self):
+    """ returns count, sum and the (non cumulative) counts of the buckets as list
+    of (upper bound, count) tuples """
+    bounds = self.bounds + (float("inf"),)
+    return {"count": self.count, "sum": self.sum, "buckets": zip(bounds, self.counts)}
+
+class NMEAStats(object):
+  """ NMEAStats - Counters and histograms of one decoder
+
+  Counters: bytes read, sentences per formatter, checksum failures and parse errors
+  per formatter and dispatch misses (unknown sentences). Histograms: parse time per
+  formatter (including the checksum) and the time from the received line to the published fix (GGA/RMC/GLL
+  with a valid position). The sentence rate per formatter is a moving average,
+  thus a receiver which drops from 10 Hz to 1 Hz shows up within a few seconds. A
+  feed which goes silent decays towards 0 on read.
+
+  Gauges (e.g. the depth of a queue) are functions which are called on export. """
+  def __init__(self):
+    self.started = time.time()
+    self.received = None   # timer() when the current chunk has been read (set by the reader)
+
+    self.bytes = 0
+    self.dispatch_misses = 0
+    self.sentences = dict()         # formatter -> count
+    self.checksum_failures = dict()
+    self.parse_errors = dict()
+    self.parse_latency = dict()     # formatter -> Histogram
+    self.fix_latency = Histogram()
+
+    self._intervals = dict()        # formatter -> [time of the last sentence, average interval]
+    self._gauges = list()           # (name, help, function, "gauge" or "counter")
+
+  def countBytes(self, count):
+    self.bytes += count
+
+  def countSentence(self, formatter, now):
+    """ Counts a framed sentence and updates the rate of the formatter """
+    self.sentences[formatter] = self.sentences.get(formatter, 0) + 1
+
+    interval = self._intervals.get(formatter)
+    if interval == None:
+      self._intervals[formatter] = [now, None]
+      return
+    elapsed = now - interval[0]
+    interval[0] = now
+    if interval[1] == None:
+      interval[1] = elapsed
+    else:
+      interval[1] += rate_smoothing * (elapsed - interval[1])
+
+  def countDispatchMiss(self):
+    self.dispatch_misses += 1
+
+  def countChecksumFailure(self, formatter):
+    self.checksum_failures[formatter] = self.checksum_failures.get(formatter, 0) + 1
+
+  def countParseError(self, formatter):
+    self.parse_errors[formatter] = self.parse_errors.get(formatter, 0) + 1
+
+  def observeParse(self, formatter, seconds):
+    histogram = self.parse_latency.get(formatter)
+    if histogram == None:
+      histogram = self.parse_latency[formatter] = Histogram()
+    histogram.observe(seconds)
+
+  def observeFix(self, seconds):
+    self.fix_latency.observe(seconds)
+
+  def addGauge(self, name, function, help=""):
+    """ Adds a gauge, function is called without arguments on export """
+    self._gauges.append( (name, help, function, "gauge") )
+
+  def addCounter(self, name, function, help=""):
+    """ Adds a counter which is kept elsewhere (e.g. the reconnects of the reader),
+    function is called without arguments on export. toPrometheus() exports it as
+    counter with the suffix _total. """
+    self._gauges.append( (name, help, function, "counter") )
+
+  def getRates(self, now=None):
+    """ returns a dict formatter -> sentences per second (moving average). If the
+    time since the last sentence is longer than the average interval, that time is
+    used instead, thus the rate of a silent feed decays. """
+    if now == None:
+      now = timer()
+    rates = dict()
+    for formatter, (last, interval) in self._intervals.items():
+      if interval:
+        rates[formatter] = 1.0 / max(interval, now - last)
+    return rates
+
+  def asDict(self):
+    """ returns all values as (nested) dict """
+    result = {
+      "uptime": time.time() - self.started,
+      "bytes": self.bytes,
+      "dispatch_misses": self.dispatch_misses,
+      "sentences": dict(self.sentences),
+      "checksum_failures": dict(self.checksum_failures),
+      "parse_errors": dict(self.parse_errors),
+      "rates": self.getRates(),
+      "parse_latency": dict( (f, h.asDict()) for f, h in self.parse_latency.items() ),
+      "fix_latency": self.fix_latency.asDict(),
+    }
+    for (name, help, function, kind) in self._gauges:
+      result[name] = function()
+    return result
+
+  def toPrometheus(self, prefix="gpsreader", labels=None):
+    """ returns all values in the Prometheus text format. labels is an optional
+    dict of labels which are added to every sample, e.g. {"receiver": "COM4"}. The
+    dicts which the reader thread updates are copied before they are exported. """
+    lines = list()
+    base = ""
+    if labels:
+      base = ",".join([ '%s="%s"' % (k, escapeLabel(labels[k])) for k in sorted(labels) ])
+
+    def sample(name, value, **extra):
+      if isinstance(value, float):
+        value = repr(value)
+      pairs = [ '%s="%s"' % (k, escapeLabel(extra[k])) for k in sorted(extra) ]
+      if base:
+        pairs.insert(0, base)
+      if pairs:
+        lines.append("%s_%s{%s} %s" % (prefix, name, ",".join(pairs), value))
+      else:
+        lines.append("%s_%s %s" % (prefix, name, value))
+
+    def header(name, kind, help):
+      lines.append("# HELP %s_%s %s" % (prefix, name, help))
+      lines.append("# TYPE %s_%s %s" % (prefix, name, kind))
+
+    def histogram(name, h, **extra):
+      (counts, hsum) = (list(h.counts), h.sum)
+      total = 0
+      for bound, count in zip(h.bounds, counts):
+        total += count
+        extra["le"] = repr(bound)
+        sample(name + "_bucket", total, **extra)
+      total += counts[-1]
+      extra["le"] = "+Inf"
+      sample(name + "_bucket", total, **extra)
+      del extra["le"]
+      sample(name + "_sum", hsum, **extra)
+      sample(name + "_count", total, **extra)
+
+    header("bytes_total", "counter", "Bytes read from the receiver")
+    sample("bytes_total", self.bytes)
+    header("dispatch_misses_total", "counter", "Sentences without a registered telegram class")
+    sample("dispatch_misses_total", self.dispatch_misses)
+
+    for (name, values, help) in (
+        ("sentences_total", self.sentences, "Framed sentences per formatter"),
+        ("checksum_failures_total", self.checksum_failures, "Sentences with a wrong checksum"),
+        ("parse_errors_total", self.parse_errors, "Sentences which couldn't be parsed")):
+      header(name, "counter", help)
+      values = dict(values)
+      for formatter in sorted(values):
+        sample(name, values[formatter], formatter=formatter)
+
+    rates = self.getRates()
+    header("sentence_rate", "gauge", "Sentences per second (moving average)")
+    for formatter in sorted(rates):
+      sample("sentence_rate", rates[formatter], formatter=formatter)
+
+    header("parse_seconds", "histogram", "Time to verify and parse a sentence")
+    latency = dict(self.parse_latency)
+    for formatter in sorted(latency):
+      histogram("parse_seconds", latency[formatter], formatter=formatter)
+    header("fix_latency_seconds", "histogram", "Time from the received line to the published fix")
+    histogram("fix_latency_seconds", self.fix_latency)
+
+    for (name, help, function, kind) in list(self._gauges):
+      if kind == "counter":
+        name += "_total"
+      header(name, kind, help)
+      sample(name, function())
+
+    return "\n".join(lines) + "\n"
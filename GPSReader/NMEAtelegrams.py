@@ -4,6 +4,8 @@
 # NMEA sentences. All NMEA sentences are based on a Base Class which implants some 
 # general methodes for all sentences.
 
+from array import array
+
 # Contains the error exceptions
 from GPSError import *
 
@@ -13,25 +15,215 @@ from NMEAutils import CreateNMEAChkSum, VerifyNMEAChkSum, parseLongitude, parseL
 # methods for converting and calculation.
 from NMEAutils import GPSPosition
 
+############################################################################
+# NMEA Field Definitionen.
+############################################################################
+# The field definitions of a sentence class are shared by all its instances (see
+# NMEASentence_Base._schema) and only convert the raw string of a field into the
+# typed value. parseValue() and getValue() are kept for fields which are used on
+# their own, the values of a telegram are reached by getFieldList().
+class NMEAField_Base(object):
+  __slots__ = ("value",)
+
+  def getDefault(self):
+    """ returns the value of the field before the first sentence was parsed """
+    return ""
+
+  def convert(self,value):
+    """ returns the typed value of the raw field """
+    return value
+
+  def parseValue(self,value):
+    """ converts the raw field and keeps the value (field used on its own) """
+    self.value = self.convert(value)
+
+  def getValue(self):
+    """ returns the value """
+    try:
+      return self.value
+    except AttributeError:
+      return self.getDefault()
+
+class NMEAFieldValue(object):
+  """ One field of a telegram as returned by getFieldList(). getValue() and
+  parseValue() read and write the value of the field in the telegram. """
+  __slots__ = ("field", "_telegram", "_index")
+
+  def __init__(self, telegram, index):
+    self.field = telegram._schema[index]
+    self._telegram = telegram
+    self._index = index
+
+  def getValue(self):
+    """ returns the value """
+    return self._telegram._getField(self._index)
+
+  def parseValue(self,value):
+    self._telegram._setField(self._index, self.field.convert(value))
+
+# FIXED: Funktioniert, aber es fehlen teilweise die fuehrenden Nullen bei
+# werden wie z.b. die Anzahl der der Satelliten in einer GGA etc. und
+# sonst wo das genutzt wird. Stellen muessen angegeben werden und int muss
+# entsprechend reagieren
+class NMEAField_Int(NMEAField_Base):
+  """ NMEAField for Int types.
+
+  If the value had leading zeros and the field list was configured
+  to acknowledge the leading zeros the return type will be string
+  otherwise it will be of type (int). An optional field returns None
+  if it is empty."""
+  __slots__ = ("leadingZero", "optional")
+
+  def __init__(self,leadingZ=0,optional=False):
+    self.leadingZero = leadingZ
+    self.optional = optional
+
+  def _format(self,value):
+    if self.leadingZero == 0:
+      return value
+    else:
+      temp = str(value)
+      return temp.zfill(len(temp)+self.leadingZero)
+
+  def getDefault(self):
+    # TODO: Default Value might not be correct in every case... check what
+    #       the specification say about this case...
+    return self._format(0)
+
+  def convert(self,value):
+    # In the assumption that the field is always of type 'str' and nothing
+    # else. This is maybe a big ugly hack but it should work around the
+    # oct -> int problem
+    if (value == "") and self.optional:
+      return None
+    stripped = value.lstrip("0")
+    if (stripped == "") and (value <> ""):
+      stripped = "0"
+    try:
+      return self._format(int(stripped))
+    except ValueError:
+      raise NMEATypeError
+
+
+class NMEAField_Float(NMEAField_Base):
+  """ NMEAField for Float types. An optional field returns None if it is empty."""
+  __slots__ = ("optional",)
+
+  def __init__(self,optional=False):
+    self.optional = optional
+
+  def getDefault(self):
+    return 0.0
+
+  def convert(self,value):
+    if (value == "") and self.optional:
+      return None
+    try:
+      return float(value)
+    except ValueError:
+      raise NMEATypeError
+
+class NMEAField_String(NMEAField_Base):
+  __slots__ = ()
+
+  def convert(self,value):
+    if ( type(str()) <> type(value) ):
+      raise NMEATypeError
+
+    return value
+
+
+
+# Placeholder for a field of a lazy telegram which hasn't been converted yet
+_unconverted = object()
+
 ############################################################################
 # NMEA Telegram - Baseclasses
 ############################################################################
 class NMEASentence_Base(object):
-  """ Base Class for all other NMEA sentences """
-
-  def __init__(self):
-    self._NMEAFieldList = list()
+  """ Base Class for all other NMEA sentences
+
+  The fields of a sentence are described once per class by _schema, a tuple with
+  one (shared) field definition per field. An instance only holds the values of
+  the last parsed sentence in a list (_values). parseSentence() and parseValue()
+  replace the list instead of changing it, because newInstance() shares it with
+  the next telegram; only the lazy conversion fills in the converted values.
+
+  In the lazy mode parseSentence() only stores the raw fields. A field is converted
+  on the first access and the value is kept until the next sentence is parsed, thus
+  fields which are never read are never converted. Conversion errors (NMEATypeError)
+  are raised by the access in this mode. """
+  __slots__ = ("_values", "_raw", "_lazy")
+
+  # Field definitions of the sentence, overwritten by the subclasses
+  _schema = ()
+
+  # Number of fields at the end of the schema which older receivers don't send
+  # (e.g. fields added by NMEA 4.10). Missing fields are parsed as empty fields.
+  _optional = 0
+
+  # True if the telegram keeps a state over several sentences (e.g. GSV). Such
+  # sentences have to be parsed in order by one telegram (see newInstance).
+  stateful = False
+
+  def __init__(self, lazy=False):
+    self._lazy = lazy
+    self._raw = None
+    self._values = [ field.getDefault() for field in self._schema ]
+
+  def isLazy(self):
+    """ returns True if the fields are converted on access """
+    return self._lazy
+
+  def newInstance(self):
+    """ Returns a new telegram of the same class and mode, which is used to parse the
+    next sentence. The decoders parse every sentence into a new instance and publish
+    it afterwards, thus a published telegram is never changed by the decoder again.
+    Subclasses which keep a state over several sentences have to copy it here. """
+    telegram = object.__new__(self.__class__)
+    telegram._lazy = self._lazy
+    telegram._raw = self._raw
+    telegram._values = self._values
+    if hasattr(self, "__dict__"):
+      # Subclasses without __slots__, e.g. a field list built with addField()
+      telegram.__dict__.update(self.__dict__)
+    return telegram
 
   def addField(self,field=""):
-    """ Adds a new entry to the internal field list.
-
-    This list will later compared to the NMEA sentence. In case the list have more or less
-    fields, one will get an error."""
-    self._NMEAFieldList.append(field)
+    """ Adds a new entry to the field list. Kept for subclasses which build their
+    field list in __init__ instead of declaring _schema (they need a __dict__, i.e.
+    no __slots__). """
+    self._schema = self._schema + (field,)
+    self._values = self._values + [field.getDefault()]
 
   def getFieldList(self):
-    """ returns the field list """
-    return self._NMEAFieldList
+    """ returns the field list, one NMEAFieldValue per field """
+    return [ NMEAFieldValue(self, i) for i in range(len(self._schema)) ]
+
+  def getSchema(self):
+    """ returns the field definitions (the schema) of the sentence """
+    return self._schema
+
+  def getValues(self):
+    """ returns a tuple with the values of all fields """
+    return tuple(self._getFields(0, len(self._values)))
+
+  def _getField(self, i):
+    """ returns the value of field i, converts the raw field if necessary """
+    value = self._values[i]
+    if value is _unconverted:
+      value = self._values[i] = self._schema[i].convert(self._raw[i])
+    return value
+
+  def _setField(self, i, value):
+    # The list of values may be shared with a telegram of newInstance()
+    values = list(self._values)
+    values[i] = value
+    self._values = values
+
+  def _getFields(self, start, end):
+    """ returns a list with the values of the fields start to end-1 """
+    return [ self._getField(i) for i in range(start, end) ]
 
   def parseSentence(self,NMEAsentence):
     """ parses the sentence and fill the values in the different fields. """
@@ -39,16 +231,22 @@ class NMEASentence_Base(object):
       raise NMEAParseError
 
     tmp_sentence = NMEAsentence[7:-3].split(",")
-    if len(tmp_sentence) <> len(self._NMEAFieldList):
-      raise NMEAParseError
-
-    for field in range(0,len(self._NMEAFieldList)):
-      self._NMEAFieldList[field].parseValue(tmp_sentence[field])
+    schema = self._schema
+    if len(tmp_sentence) <> len(schema):
+      if not (len(schema) - self._optional <= len(tmp_sentence) < len(schema)):
+        raise NMEAParseError
+      tmp_sentence += [""] * (len(schema) - len(tmp_sentence))
+
+    if self._lazy:
+      self._raw = tmp_sentence
+      self._values = [_unconverted] * len(schema)
+    else:
+      self._values = [ field.convert(value) for (field, value) in zip(schema, tmp_sentence) ]
 
   def __getitem__(self,i):
     """ In case one want to try this object as an array (<Objekt>[i]). """
     try:
-      return self._NMEAFieldList[i].getValue()
+      return self._getField(i)
     except IndexError:
       return None
 
@@ -58,12 +256,7 @@ class NMEASentence_Base(object):
     original message is not saved. """
     st = None
     st = "$GP%s," % self.__class__.__name__.split("_")[1]
-
-    for field in range(0,len(self._NMEAFieldList)):
-      t = "%s" % (self._NMEAFieldList[field].getValue())
-      if field <> len(self._NMEAFieldList)-1:
-        t = t + ","
-      st = st + t
+    st = st + ",".join([ "%s" % (value,) for value in self.getValues() ])
     st = st + "*"
     ChkSum = CreateNMEAChkSum(st)
 
@@ -80,33 +273,83 @@ class NMEASentence_Base(object):
 
 ################### NMEA_DTM #########################
 class NMEA_DTM(NMEASentence_Base):
-  def __init__(self):
-    super(NMEA_DTM, self).__init__()
-
-    self.addField( NMEAField_String() ) # 0. Local Datum
-    self.addField( NMEAField_String() ) # 1. Local Datum Sub Code
-    self.addField( NMEAField_String() ) # 2. Latitude offset
-    self.addField( NMEAField_String() ) # 3. Latitude offset N/S
-    self.addField( NMEAField_String() ) # 4. Longitude offset
-    self.addField( NMEAField_String() ) # 5. Longitude offset E/W
-    self.addField( NMEAField_String() ) # 6. Altitude offset (m)
-    self.addField( NMEAField_String() ) # 7. Datum
+  __slots__ = ()
+
+  _schema = (
+    NMEAField_String(), # 0. Local Datum
+    NMEAField_String(), # 1. Local Datum Sub Code
+    NMEAField_String(), # 2. Latitude offset
+    NMEAField_String(), # 3. Latitude offset N/S
+    NMEAField_String(), # 4. Longitude offset
+    NMEAField_String(), # 5. Longitude offset E/W
+    NMEAField_String(), # 6. Altitude offset (m)
+    NMEAField_String(), # 7. Datum
+  )
 
   def getLocalDatumCode(self):
-    return self._NMEAFieldList[0].getValue()
+    return self._getField(0)
 
   def getDatum(self):
-    return self._NMEAFieldList[7].getValue()
+    return self._getField(7)
 
 ################### NMEA_GSV #########################
+# Constellation of the satellites of a GSV/GSA sentence, taken from the talker ID
+talker_constellations = {
+  "GP": "GPS",
+  "GL": "GLONASS",
+  "GA": "Galileo",
+  "GB": "BeiDou",
+  "BD": "BeiDou",
+  "GQ": "QZSS",
+}
+
+# Constellation of the system ID (NMEA 4.10) of a GSA sentence
+system_constellations = {
+  1: "GPS",
+  2: "GLONASS",
+  3: "Galileo",
+  4: "BeiDou",
+  5: "QZSS",
+  6: "NavIC",
+}
+
+# Value of an empty elevation/azimuth/SNR field in the satellite tables
+gsv_empty = -1
+
 class NMEA_GSV(NMEASentence_Base):
   """ NMEA_GSV - Parses the GSV telegram and kept track of all
-      satellites in the sky around the GPS receiver """
+      satellites in the sky around the GPS receiver
+
+  A sky view is transmitted as cycle of 1..N sentences per constellation. The
+  satellites of a cycle are collected and the sky view of the constellation is
+  replaced as a whole when the last sentence of the cycle has been parsed, thus
+  satellites which have set disappear and an incomplete cycle (a lost sentence)
+  never shows up. Every constellation (talker GP, GL, GA, BD/GB, GQ) has its own
+  sky view.
+
+  The sky view of a constellation is a compact table (array of signed shorts) with
+  PRN, elevation, azimuth and SNR of every satellite. Empty fields (e.g. the SNR of
+  a satellite which isn't tracked) are -1 in the table and None in the getters.
+  The tables are never changed, only replaced, thus newInstance() only copies the
+  references. """
+
+  __slots__ = ("_sky", "_pending", "_complete")
 
-  def __init__(self):
-    super(NMEA_GSV, self).__init__()
+  stateful = True
 
-    self._SatellitesInView = dict()
+  def __init__(self, lazy=False):
+    super(NMEA_GSV, self).__init__(lazy)
+
+    self._sky = dict()      # constellation -> array("h") with 4 values per satellite
+    self._pending = dict()  # constellation -> (number of the last sentence, table of the cycle)
+    self._complete = False
+
+  def newInstance(self):
+    telegram = super(NMEA_GSV, self).newInstance()
+    telegram._sky = self._sky
+    telegram._pending = self._pending
+    telegram._complete = False
+    return telegram
 
   def parseSentence(self,NMEAsentence):
     """ the super.parseSentence is overwritten, because the GSV telegram does
@@ -118,325 +361,486 @@ class NMEA_GSV(NMEASentence_Base):
 
     tmp_sentence = NMEAsentence[7:-3].split(",")
 
-    # Im Normalfall sollte diese Message eine ungerade Feldanzahl haben
-    if bool(len(tmp_sentence) & 1) == False:
+    # total, number, satellites in view and 0-4 blocks of 4 fields. NMEA 4.10 adds
+    # the signal ID as last field.
+    satellites = (len(tmp_sentence) - 3) / 4
+    if (len(tmp_sentence) < 3) or (satellites > 4) or ((len(tmp_sentence) - 3) % 4 > 1):
+      raise NMEAParseError
+
+    try:
+      total = int(tmp_sentence[0])
+      number = int(tmp_sentence[1])
+      values = [ self._toInt(value) for value in tmp_sentence[3:3 + 4 * satellites] ]
+    except ValueError:
+      raise NMEATypeError
+    if not (1 <= number <= total <= 9):
       raise NMEAParseError
 
-    # Bei unterschiedlichen laengen gibt es unterschiedlich viel zu tun
-    if len(tmp_sentence) == 7:
-        anzahl_satellites = 1
-    elif len(tmp_sentence) == 11:
-        anzahl_satellites = 2
-    elif len(tmp_sentence) == 15:
-        anzahl_satellites = 3
-    elif len(tmp_sentence) == 19:
-        anzahl_satellites = 4
-
-    for satellite in range(0,anzahl_satellites):
-        self._SatellitesInView[ tmp_sentence[ 3+(4*((satellite+1)-1))] ] = (\
-               tmp_sentence[4+(4*((satellite+1)-1))],
-               tmp_sentence[5+(4*((satellite+1)-1))],
-               tmp_sentence[6+(4*((satellite+1)-1))] )
-
-  def getSatellitesInView(self):
-      return self._SatellitesInView
-
-  def getElevationOfSatellite(self, satellite=None):
-      if (satellite == None) or (satellite not in self._SatellitesInView):
+    talker = NMEAsentence[1:3]
+    constellation = talker_constellations.get(talker, talker)
+
+    # Satellites without PRN are padding
+    table = array("h")
+    for i in range(0, len(values), 4):
+      if values[i] <> gsv_empty:
+        table.extend(values[i:i + 4])
+
+    pending = self._pending.get(constellation)
+    if number == 1:
+      pending = table
+    elif (pending <> None) and (pending[0] == number - 1):
+      pending = pending[1] + table
+    else:
+      # A sentence of the cycle is missing, wait for the next cycle
+      pending = None
+
+    self._values = tmp_sentence
+    self._pending = dict(self._pending)
+    if pending == None:
+      self._pending.pop(constellation, None)
+    elif number < total:
+      self._pending[constellation] = (number, pending)
+    else:
+      # The cycle is complete, replace the sky view of the constellation
+      self._pending.pop(constellation, None)
+      sky = dict(self._sky)
+      sky[constellation] = pending
+      self._sky = sky
+      self._complete = True
+
+  def _toInt(self, value):
+    if value == "":
+      return gsv_empty
+    return int(value)
+
+  def isCycleComplete(self):
+    """ returns True if this sentence completed the cycle of a constellation """
+    return self._complete
+
+  def getConstellations(self):
+    """ returns a list of the constellations with a complete sky view """
+    return self._sky.keys()
+
+  def getSatelliteCount(self, constellation=None):
+    """ returns the number of satellites in view (of one or all constellations) """
+    if constellation <> None:
+      return len(self._sky.get(constellation, ())) / 4
+    return sum([ len(table) for table in self._sky.values() ]) / 4
+
+  def _getSatellite(self, satellite, constellation):
+    """ returns (elevation, azimuth, SNR) of the satellite or None """
+    if satellite == None:
+      return None
+    try:
+      prn = int(satellite)
+    except ValueError:
+      return None
+    if constellation <> None:
+      tables = (self._sky.get(constellation, ()),)
+    else:
+      tables = self._sky.values()
+    for table in tables:
+      for i in range(0, len(table), 4):
+        if table[i] == prn:
+          return tuple([ self._fromTable(value) for value in table[i + 1:i + 4] ])
+    return None
+
+  def getSatellitesInView(self, constellation=None):
+    """ returns a dict (constellation, PRN) -> (elevation, azimuth, SNR) with the
+    satellites of the last complete cycles (of one or all constellations) """
+    result = dict()
+    for name, table in self._sky.items():
+      if (constellation <> None) and (name <> constellation):
+        continue
+      for i in range(0, len(table), 4):
+        result[(name, table[i])] = tuple([ self._fromTable(value) for value in table[i + 1:i + 4] ])
+    return result
+
+  def _fromTable(self, value):
+    if value == gsv_empty:
+      return None
+    return value
+
+  def getElevationOfSatellite(self, satellite=None, constellation=None):
+      values = self._getSatellite(satellite, constellation)
+      if values == None:
         return None
 
-      return self._SatellitesInView[satellite][0]
+      return values[0]
 
-  def getAzimuthOfSatellite(self, satellite=None):
-      if (satellite == None) or (satellite not in self._SatellitesInView):
+  def getAzimuthOfSatellite(self, satellite=None, constellation=None):
+      values = self._getSatellite(satellite, constellation)
+      if values == None:
         return None
 
-      return self._SatellitesInView[satellite][1]
+      return values[1]
 
-  def getSnrOfSatellite(self, satellite=None):
-      if (satellite == None) or (satellite not in self._SatellitesInView):
+  def getSnrOfSatellite(self, satellite=None, constellation=None):
+      values = self._getSatellite(satellite, constellation)
+      if values == None:
         return None
 
-      return self._SatellitesInView[satellite][2]
+      return values[2]
 
 ################### NMEA_GSA #########################
 class NMEA_GSA(NMEASentence_Base):
   """ NMEA_GSA - Parse the GSA Sentence up to the Version 3 of the IEC 61162
-      definition. """
-
-  def __init__(self):
-    super(NMEA_GSA, self).__init__()
-
-    self.addField( NMEAField_String() ) # 0. Selection Mode (M=Manual forced either to 2D/3D; A=automatic)
-    self.addField( NMEAField_Int() ) # 1. Mode  (1=no fix; 2=2D; 3=3D fix)
-    self.addField( NMEAField_Int(1) ) # 2.
-    self.addField( NMEAField_Int(1) ) # 3.
-    self.addField( NMEAField_Int(1) ) # 4.
-    self.addField( NMEAField_Int(1) ) # 5.
-    self.addField( NMEAField_Int(1) ) # 6.
-    self.addField( NMEAField_Int(1) ) # 7.
-    self.addField( NMEAField_Int(1) ) # 8.
-    self.addField( NMEAField_Int(1) ) # 9.
-    self.addField( NMEAField_Int(1) ) # 10.
-    self.addField( NMEAField_Int(1) ) # 11.
-    self.addField( NMEAField_Int(1) ) # 12.
-    self.addField( NMEAField_Int(1) ) # 13.
-    self.addField( NMEAField_Int() ) # 14. PDOP
-    self.addField( NMEAField_Int() ) # 15. HDOP
-    self.addField( NMEAField_Int() ) # 16. VDOP
+      definition and the system ID of NMEA 4.10.
+
+  A multi constellation receiver sends one GSA per constellation. The satellites
+  used for the fix are kept per constellation (by the system ID or the talker),
+  thus the telegram always holds the latest list of every constellation. The
+  DOP values are floats, empty fields are None.
+
+  parseSentence() only keeps the PRN fields of every constellation as they are (raw
+  in the lazy mode), the lists are built when getUsedSatellites() is called. """
+  __slots__ = ("_sources", "_used", "_talker", "_sequence")
+
+  stateful = True
+
+  _schema = (
+    NMEAField_String(),             # 0. Selection Mode (M=Manual forced either to 2D/3D; A=automatic)
+    NMEAField_Int(),                # 1. Mode  (1=no fix; 2=2D; 3=3D fix)
+    NMEAField_Int(optional=True),   # 2.  PRN of the satellites used for the fix
+    NMEAField_Int(optional=True),   # 3.
+    NMEAField_Int(optional=True),   # 4.
+    NMEAField_Int(optional=True),   # 5.
+    NMEAField_Int(optional=True),   # 6.
+    NMEAField_Int(optional=True),   # 7.
+    NMEAField_Int(optional=True),   # 8.
+    NMEAField_Int(optional=True),   # 9.
+    NMEAField_Int(optional=True),   # 10.
+    NMEAField_Int(optional=True),   # 11.
+    NMEAField_Int(optional=True),   # 12.
+    NMEAField_Int(optional=True),   # 13.
+    NMEAField_Float(optional=True), # 14. PDOP
+    NMEAField_Float(optional=True), # 15. HDOP
+    NMEAField_Float(optional=True), # 16. VDOP
+    NMEAField_Int(optional=True),   # 17. System ID (NMEA 4.10)
+  )
+  _optional = 1
+
+  def __init__(self, lazy=False):
+    super(NMEA_GSA, self).__init__(lazy)
+
+    # (talker, system ID) -> (sequence, talker, system ID, PRN fields, raw?), replaced
+    # and never changed
+    self._sources = dict()
+    self._used = None     # constellation -> tuple of PRNs, built on the first access
+    self._talker = None
+    self._sequence = 0
+
+  def newInstance(self):
+    telegram = super(NMEA_GSA, self).newInstance()
+    telegram._sources = self._sources
+    telegram._used = None
+    telegram._talker = self._talker
+    telegram._sequence = self._sequence
+    return telegram
+
+  def parseSentence(self,NMEAsentence):
+    super(NMEA_GSA, self).parseSentence(NMEAsentence)
+
+    talker = NMEAsentence[1:3]
+    if self._lazy:
+      fields = self._raw
+    else:
+      fields = self._values
+    self._sequence += 1
+    sources = dict(self._sources)
+    sources[(talker, fields[17])] = (self._sequence, talker, fields[17], tuple(fields[2:14]), self._lazy)
+    self._sources = sources
+    self._used = None
+    self._talker = talker
+
+  def _getConstellation(self, talker, system):
+    constellation = system_constellations.get(system)
+    if constellation == None:
+      # Before NMEA 4.10 a GN talker means combined GNSS
+      constellation = talker_constellations.get(talker, "GNSS")
+    return constellation
+
+  def _getUsed(self):
+    """ returns the dict constellation -> tuple of PRNs, converts the kept PRN fields
+    on the first call """
+    if self._used == None:
+      used = dict()
+      prnField = self._schema[2]
+      systemField = self._schema[17]
+      for (sequence, talker, system, prns, raw) in sorted(self._sources.values()):
+        if raw:
+          try:
+            system = systemField.convert(system)
+            prns = [ prnField.convert(prn) for prn in prns ]
+          except NMEATypeError:
+            # a sentence with a garbage field is skipped as by the eager parsing
+            continue
+        used[self._getConstellation(talker, system)] = tuple([ prn for prn in prns if prn <> None ])
+      self._used = used
+    return self._used
+
+  def getMode(self):
+    """ returns the fix mode: 1 = no fix, 2 = 2D, 3 = 3D """
+    return self._getField(1)
+
+  def hasFix(self):
+    """ returns True if the mode is 2D or 3D """
+    return self._getField(1) in (2, 3)
+
+  def getConstellation(self):
+    """ returns the constellation of this sentence (GNSS for a combined GN talker
+    without system ID) """
+    if self._talker == None:
+      return None
+    return self._getConstellation(self._talker, self._getField(17))
 
   def getSatellitesUsedForFix(self):
-    if ( self._NMEAFieldList[1] == 1 ):
+    if ( self._getField(1) == 1 ):
       raise NMEANoValidFix
 
-    return self._NMEAFieldList[1:13]
+    return [ prn for prn in self._getFields(2, 14) if prn <> None ]
+
+  def getUsedSatellites(self):
+    """ returns a dict constellation -> tuple of the PRNs which are used for the fix,
+    with the latest GSA of every constellation """
+    return dict(self._getUsed())
 
   def getPDOP(self):
-    if ( self._NMEAFieldList[1] == 1 ):
+    if ( self._getField(1) == 1 ):
       raise NMEANoValidFix
 
-    return self._NMEAFieldList[14]
+    return self._getField(14)
 
   def getHDOP(self):
-    if ( self._NMEAFieldList[1] == 1 ):
+    if ( self._getField(1) == 1 ):
       raise NMEANoValidFix
 
-    return self._NMEAFieldList[15]
+    return self._getField(15)
 
   def getVDOP(self):
-    if ( self._NMEAFieldList[1] == 1 ):
+    if ( self._getField(1) == 1 ):
       raise NMEANoValidFix
 
-    return self._NMEAFieldList[16]
+    return self._getField(16)
 
 
 ################### NMEA_GLL #########################
 class NMEA_GLL(NMEASentence_Base):
   """ NMEA_GLL - Parse the GLL Sentence """
+  __slots__ = ()
 
-  def __init__(self):
-    super(NMEA_GLL, self).__init__()
 
-    self.addField( NMEAField_String() ) # 0. Latitude
-    self.addField( NMEAField_String() ) # 1. Latitude N/S
-    self.addField( NMEAField_String() ) # 2. Longitude
-    self.addField( NMEAField_String() ) # 3. Longitude E/W
-    self.addField( NMEAField_String() ) # 4. UTC of position
-    self.addField( NMEAField_String() ) # 5. Status A=data valid / V=data valid
-    self.addField( NMEAField_String() ) # 6. FAA Mode indicator
+  _schema = (
+    NMEAField_String(), # 0. Latitude
+    NMEAField_String(), # 1. Latitude N/S
+    NMEAField_String(), # 2. Longitude
+    NMEAField_String(), # 3. Longitude E/W
+    NMEAField_String(), # 4. UTC of position
+    NMEAField_String(), # 5. Status A=data valid / V=data valid
+    NMEAField_String(), # 6. FAA Mode indicator
+  )
+
+  def hasFix(self):
+    """ returns True if the sentence contains a valid position """
+    return self._getField(5) == "A"
 
   def getPosition(self):
     """ returns the current position as a GPSPosition() """
-    if (self._NMEAFieldList[5].getValue() <> "A"):
+    if (self._getField(5) <> "A"):
       return NMEANoValidFix
 
-    return GPSPosition( (self._NMEAFieldList[0].getValue(), self._NMEAFieldList[1].getValue()),
-          (self._NMEAFieldList[2].getValue(), self._NMEAFieldList[3].getValue()) )
+    return GPSPosition( (self._getField(0), self._getField(1)),
+          (self._getField(2), self._getField(3)) )
 
   def getTime(self):
     """ returns the current time """
-    if (self._NMEAFieldList[5].getValue() <> "A"):
+    if (self._getField(5) <> "A"):
       return NMEANoValidFix
-    return self._NMEAFieldList[4].getValue()
+    return self._getField(4)
 
 ################### NMEA_VTG #########################
 class NMEA_VTG(NMEASentence_Base):
   """ NMEA_VTG - Parse the VTG Sentence (COG und SOG information)."""
-  def __init__(self):
-    super(NMEA_VTG, self).__init__()
-
-    self.addField( NMEAField_String() ) # 0. Track Degrees
-    self.addField( NMEAField_String() ) # 1. T = True
-    self.addField( NMEAField_String() ) # 2. Magnetic track made good
-    self.addField( NMEAField_String() ) # 3. M
-    self.addField( NMEAField_String() ) # 4. Ground Speed
-    self.addField( NMEAField_String() ) # 5. N = Knots
-    self.addField( NMEAField_String() ) # 6. Ground Speed
-    self.addField( NMEAField_String() ) # 7. K = KM/H
-    self.addField( NMEAField_String() ) # 8. FAA Mode indicator(Auton.)
+  __slots__ = ()
+
+  _schema = (
+    NMEAField_String(), # 0. Track Degrees
+    NMEAField_String(), # 1. T = True
+    NMEAField_String(), # 2. Magnetic track made good
+    NMEAField_String(), # 3. M
+    NMEAField_String(), # 4. Ground Speed
+    NMEAField_String(), # 5. N = Knots
+    NMEAField_String(), # 6. Ground Speed
+    NMEAField_String(), # 7. K = KM/H
+    NMEAField_String(), # 8. FAA Mode indicator(Auton.)
+  )
+
+  def hasFix(self):
+    """ returns True if the sentence contains valid data """
+    return self._getField(8) == "A"
 
   def getCourse(self):
     """ returns the current course """
-    if ( self._NMEAFieldList[8].getValue() <> "A" ):
+    if ( self._getField(8) <> "A" ):
       raise NMEANoValidFix
 
-    return (self._NMEAFieldList[0].getValue(), self._NMEAFieldList[1].getValue())
+    return (self._getField(0), self._getField(1))
 
   def getSpeed(self,unit="kmh"):
     """ returns the last received speed. The default is in km/h but knots are also possible."""
-    if ( self._NMEAFieldList[8].getValue() <> "A"):
+    if ( self._getField(8) <> "A"):
       raise NMEANoValidFix
 
     if (unit == "kmh"):
-      return float(self._NMEAFieldList[6].getValue())
+      return float(self._getField(6))
     else:
-      return float(self._NMEAFieldList[4].getValue())
+      return float(self._getField(4))
 
 ################### NMEA_GGA #########################
 class NMEA_GGA(NMEASentence_Base):
   """ NMEA_GGA - Parse the GGA Sentence (Position) """
-
-  def __init__(self):
-    super(NMEA_GGA, self).__init__()
-
-    self.addField( NMEAField_String() ) # 0.  time: hhmmss.ss
-    self.addField( NMEAField_String() ) # 1.  lat
-    self.addField( NMEAField_String() ) # 2.  n/s
-    self.addField( NMEAField_String() ) # 3.  lon
-    self.addField( NMEAField_String() ) # 4.  e/w
-    self.addField( NMEAField_Int() )    # 5.  0-2 (fix: 1 or 2)
-    self.addField( NMEAField_Int(1) ) # 6.  anzahl sateliten: 00-12
-    self.addField( NMEAField_String() ) # 7.  hdop
-    self.addField( NMEAField_String() ) # 8.  hoehe von der antenne meters
-    self.addField( NMEAField_String() ) # 9.  M
-    self.addField( NMEAField_String() ) # 10. <unknown>
-    self.addField( NMEAField_String() ) # 11. M
-    self.addField( NMEAField_String() ) # 12. <unknown>
-    self.addField( NMEAField_String() ) # 13. dgps stationid
-
-  def _hasFix(self):
-    if (self._NMEAFieldList[5].getValue() >= 0 ) and (self._NMEAFieldList[5].getValue() <= 6):
+  __slots__ = ()
+
+
+  _schema = (
+    NMEAField_String(), # 0.  time: hhmmss.ss
+    NMEAField_String(), # 1.  lat
+    NMEAField_String(), # 2.  n/s
+    NMEAField_String(), # 3.  lon
+    NMEAField_String(), # 4.  e/w
+    NMEAField_Int(),    # 5.  0-2 (fix: 1 or 2)
+    NMEAField_Int(1),   # 6.  anzahl sateliten: 00-12
+    NMEAField_String(), # 7.  hdop
+    NMEAField_String(), # 8.  hoehe von der antenne meters
+    NMEAField_String(), # 9.  M
+    NMEAField_String(), # 10. <unknown>
+    NMEAField_String(), # 11. M
+    NMEAField_String(), # 12. <unknown>
+    NMEAField_String(), # 13. dgps stationid
+  )
+
+  def hasFix(self):
+    """ returns True if the fix quality indicates a valid position (1-8) """
+    if (self._getField(5) >= 1 ) and (self._getField(5) <= 8):
       return True
 
     return False
 
+  _hasFix = hasFix
+
   def getPosition(self):
     if ( not self._hasFix() ):
       raise NMEANoValidFix
 
-    return GPSPosition( (self._NMEAFieldList[1].getValue(), self._NMEAFieldList[2].getValue()),
-          (self._NMEAFieldList[3].getValue(), self._NMEAFieldList[4].getValue()) )
+    return GPSPosition( (self._getField(1), self._getField(2)),
+          (self._getField(3), self._getField(4)) )
 
   def getAntennaHeight(self):
     if ( not self._hasFix() ):
       raise NMEANoValidFix
 
-    return self._NMEAFieldList[8].getValue()
+    return self._getField(8)
 
   def getTime(self):
     if ( not self._hasFix() ):
       raise NMEANoValidFix
 
-    return self._NMEAFieldList[0].getValue()
+    return self._getField(0)
 
 ################### NMEA_RMC #########################
 class NMEA_RMC(NMEASentence_Base):
   """ NMEA_RMC - Parse the RMC Sentence """
+  __slots__ = ()
 
-  def __init__(self):
-    super(NMEA_RMC, self).__init__()
 
-    self.addField( NMEAField_String() ) # 0. time: hhmmss.ss
-    self.addField( NMEAField_String() ) # 1. status: A = VALID
-    self.addField( NMEAField_String() ) # 2. latitude
-    self.addField( NMEAField_String() ) # 3. N/S
-    self.addField( NMEAField_String() ) # 4. long
-    self.addField( NMEAField_String() ) # 5. E/W
-    self.addField( NMEAField_String() ) # 6. SOG Knots
-    self.addField( NMEAField_String() ) # 7. Track made good, true degrees
-    self.addField( NMEAField_String() ) # 8. date: ddmmyy
-    self.addField( NMEAField_String() ) # 9. Magnetic variation, degrees
-    self.addField( NMEAField_String() ) # 10. E/W
-    self.addField( NMEAField_String() ) # 11. FAA mode indicator (N= not valid data, A= autonomous)
+  _schema = (
+    NMEAField_String(), # 0. time: hhmmss.ss
+    NMEAField_String(), # 1. status: A = VALID
+    NMEAField_String(), # 2. latitude
+    NMEAField_String(), # 3. N/S
+    NMEAField_String(), # 4. long
+    NMEAField_String(), # 5. E/W
+    NMEAField_String(), # 6. SOG Knots
+    NMEAField_String(), # 7. Track made good, true degrees
+    NMEAField_String(), # 8. date: ddmmyy
+    NMEAField_String(), # 9. Magnetic variation, degrees
+    NMEAField_String(), # 10. E/W
+    NMEAField_String(), # 11. FAA mode indicator (N= not valid data, A= autonomous)
+  )
 
 
+  def hasFix(self):
+    """ returns True if the status is A (valid) """
+    return self._getField(1) == "A"
+
   def getPosition(self):
-    if (self._NMEAFieldList[1].getValue() <> "A"):
+    if (self._getField(1) <> "A"):
       return NMEANoValidFix
 
-    return GPSPosition( (self._NMEAFieldList[2].getValue(), self._NMEAFieldList[3].getValue()),
-          (self._NMEAFieldList[4].getValue(), self._NMEAFieldList[5].getValue()) )
+    return GPSPosition( (self._getField(2), self._getField(3)),
+          (self._getField(4), self._getField(5)) )
 
   def getTime(self):
-    if (self._NMEAFieldList[1].getValue() <> "A"):
+    if (self._getField(1) <> "A"):
       return NMEANoValidFix
-    return self._NMEAFieldList[0].getValue()
+    return self._getField(0)
 
   def getTimeDate(self):
-    if (self._NMEAFieldList[1].getValue() <> "A"):
+    if (self._getField(1) <> "A"):
       return NMEANoValidFix
 
-    return ( self.getTime(), self._NMEAFieldList[8].getValue() )
+    return ( self.getTime(), self._getField(8) )
 
   def getCourse(self):
-    if ( self._NMEAFieldList[1].getValue() <> "A" ):
+    if ( self._getField(1) <> "A" ):
       return NMEANoValidFix
 
-    return self._NMEAFieldList[7].getValue()
+    return self._getField(7)
 
   def getSpeed(self):
-    if ( self._NMEAFieldList[1].getValue() <> "A" ):
+    if ( self._getField(1) <> "A" ):
       return NMEANoValidFix
 
     # Von String auf float() konvertieren
-    return float(self._NMEAFieldList[6].getValue()) * 1.852
+    return float(self._getField(6)) * 1.852
 
 ############################################################################
-# NMEA Field Definitionen.
+# NMEA Sentence registry
 ############################################################################
-class NMEAField_Base(object):
-  def __init__(self):
-    self.value = ""
-
-  def getValue(self):
-    """ returns the value """
-    return self.value
-
-# FIXED: Funktioniert, aber es fehlen teilweise die fuehrenden Nullen bei
-# werden wie z.b. die Anzahl der der Satelliten in einer GGA etc. und
-# sonst wo das genutzt wird. Stellen muessen angegeben werden und int muss
-# entsprechend reagieren
-class NMEAField_Int(NMEAField_Base):
-  """ NMEAField for Int types.
-
-  If the value had leading zeros and the field list was configured
-  to acknowledge the leading zeros the return type will be string
-  otherwise it will be of type (int)"""
-  def __init__(self,leadingZ=0):
-    super(NMEAField_Int, self).__init__()
-
-    # TODO: Default Value might not be correct in every case... check what
-    #       the specification say about this case...
-    self.value = 0
-
-    self.leadingZero = leadingZ
-
-  def parseValue(self,value):
-    # In the assumption that the field is always of type 'str' and nothing
-    # else. This is maybe a big ugly hack but it should work around the
-    # oct -> int problem
-    value = value.lstrip("0")
-    try:
-      self.value = int(value)
-    except ValueError:
-      raise NMEATypeError
-
-  def getValue(self):
-    if self.leadingZero == 0:
-      return int(self.value)
-    else:
-      temp = str(self.value)
-      return temp.zfill(len(temp)+self.leadingZero)
-
-
-class NMEAField_Float(NMEAField_Base):
-  def __init__(self):
-    super(NMEAField_Float, self).__init__()
-
-  def parseValue(self,value):
-    self.value = float(value)
-
-class NMEAField_String(NMEAField_Base):
-  def __init__(self):
-    super(NMEAField_String, self).__init__()
-
-  def parseValue(self,value):
-    if ( type(str()) <> type(value) ):
-      raise NMEATypeError
-
-    self.value = value
-
-
+# Talker IDs which are accepted in front of the sentence formatter.
+# GP = GPS, GN = combined GNSS, GL = GLONASS, GA = Galileo, BD/GB = BeiDou, GQ = QZSS
+valid_talkers = frozenset(("GP", "GN", "GL", "GA", "BD", "GB", "GQ"))
+
+# Maps the sentence formatter (the three letters after the talker ID) to the
+# class which is able to parse the sentence. Own classes can be added with
+# registerSentence().
+sentence_registry = {
+  "DTM": NMEA_DTM,
+  "GGA": NMEA_GGA,
+  "GLL": NMEA_GLL,
+  "GSA": NMEA_GSA,
+  "GSV": NMEA_GSV,
+  "RMC": NMEA_RMC,
+  "VTG": NMEA_VTG,
+}
+
+def registerSentence(formatter, sentenceClass):
+  """ Registers a (custom) sentence class for the given sentence formatter, e.g.
+  registerSentence("ZDA", NMEA_ZDA). Every GPSReader created afterwards will parse
+  this sentence as well. """
+  if not issubclass(sentenceClass, NMEASentence_Base):
+    raise NMEATypeError
+  sentence_registry[formatter.upper()] = sentenceClass
+
+def getSentenceFormatter(sentence):
+  """ Returns the formatter of a sentence (e.g. "GGA" for "$GNGGA,...") or None
+  if the sentence does not start with $ and one of the valid talker IDs.
+
+  The formatter is always located at a fixed offset, thus there is no need to
+  search the whole sentence. """
+  if (sentence[0:1] <> "$") or (sentence[1:3] not in valid_talkers):
+    return None
+  return sentence[3:6]
 
 ################ TEST #####################################################
 # as before, here are some tests to check the classes and methods of this module file
@@ -463,6 +867,7 @@ if __name__ == '__main__':
   print "\n"
 
   print "with getfieldlist: %s" % t2.getFieldList()[0].getValue()
+  print "with getvalues: %s" % t2.getValues()[0]
   print "with getitem: %s" % t2[0]
   print "with str: %s " % t2
   print "latitude from class position(): %s " % t2.getPosition().latitude
@@ -475,7 +880,7 @@ if __name__ == '__main__':
   print "should be 36734 but with a leading zero: %s " % t5.getValue()
 
   #                      xx 11 1x 11x 1x 22 2x 22x 2x 33 3x 33x 3x 44 4x 44x 4x
-  stringt6 = "$GPGSV,2,1,07,02,06,128,  ,04,16,092,17,12,71,251,38,14,37,302,34*73"
+  stringt6 = "$GPGSV,2,1,07,02,06,128,,04,16,092,17,12,71,251,38,14,37,302,34*73"
   # $GPGSV,2,2,07,24,67,135,20,25,32,251,40,32,06,346,13*4C
   stringt7 = "$GPGSV,2,2,07,24,67,135,20,25,32,251,40,32,06,346,13*4C"
   print stringt7
@@ -491,14 +896,24 @@ if __name__ == '__main__':
   print allsatellites.keys()
   t6sat = "24"
 
-  print allsatellites[t6sat][0]
-  if ("02" not in allsatellites.keys()):
+  print allsatellites[("GPS", int(t6sat))][0]
+  if (("GPS", 2) not in allsatellites.keys()):
       print "satellite not found"
+  print "SNR of 02 (empty): %s " % t6.getSnrOfSatellite("02")
   print "-" * 80
 
-  print "Elevation: " + t6.getElevationOfSatellite(t6sat)
-  print "Azimuth: " + t6.getAzimuthOfSatellite(t6sat)
-  print "SNR: " + t6.getSnrOfSatellite(t6sat)
+  print "Elevation: %s " % t6.getElevationOfSatellite(t6sat)
+  print "Azimuth: %s " % t6.getAzimuthOfSatellite(t6sat)
+  print "SNR: %s " % t6.getSnrOfSatellite(t6sat)
   print "-" * 80
 
-
+  # Cycles of other talkers (BeiDou as GB, QZSS) are accepted by the decoder
+  import NMEAdecoder
+  decoder = NMEAdecoder.NMEADecoder()
+  for sentence in ("$GBGSV,1,1,02,11,45,120,33,12,30,200,28*69",
+                   "$GQGSV,1,1,01,193,60,150,40*5B"):
+    body = sentence[1:sentence.index("*")]
+    sentence = "$%s*%s" % (body, CreateNMEAChkSum(body).upper())
+    print "%s -> %s" % (getSentenceFormatter(sentence), decoder.decodeSentence(sentence) <> None)
+  print "BeiDou: %s " % decoder.GSV.getSatellitesInView("BeiDou")
+  print "QZSS: %s " % decoder.GSV.getSatellitesInView("QZSS")
@@ -1,53 +1,91 @@
 # -*- coding: ascii -*-
 
 import math
+from operator import xor
 
 ############################################################################
 # Helper functions
 ############################################################################
+# Values of the hexadecimal digits of a transmitted checksum, keyed by the byte value
+_hexdigits = dict( (ord(c), int(c, 16)) for c in "0123456789abcdefABCDEF" )
+
+def _toBytes(data):
+  """ returns data as bytearray, unicode is encoded as ASCII (bytearray() only
+  accepts unicode with an encoding). Raises UnicodeError for other characters. """
+  if isinstance(data, unicode):
+    data = data.encode("ascii")
+  return bytearray(data)
+# _toBytes
+
+def calculateNMEAChkSum(payload):
+  """ XORs all bytes of the payload (the part between $ and *) in one go and
+  returns the checksum as int. The payload may be a str, unicode, bytearray or
+  memoryview. """
+  return reduce(xor, _toBytes(payload), 0)
+# calculateNMEAChkSum
+
 def CreateNMEAChkSum(sentence=None):
   """ Calculates the XOR Checksum of a NMEA sentence, but only
   between the $ and *"""
 
   if sentence == None:
     return None
-  elif (sentence[0] == "$") and (sentence[-3] == "*"):
-    t = sentence[1:-3]
-    sentence = t
-  elif (sentence[0] == "$") and (sentence[-1] == "*"):
-    t = sentence[1:-1]
-    sentence = t
-  elif (sentence[0] == "$"):
-    t = sentence[1]
-    sentence = t
-
-  i = int(0)
-  XOR = int(0)
-  ilen = long()
-  ilen = len(sentence)
-
-  for i in range(0,len(sentence)):
-    XOR = XOR ^ ord(sentence[i])
-
-  if (XOR <= 15):
-    return "0"+str(hex(XOR))[-1:]
-  else:
-    return str(hex(XOR))[-2:]
+
+  start = 0
+  if sentence[0:1] in ("$", "!"):
+    start = 1
+  end = sentence.rfind("*")
+  if end == -1:
+    end = len(sentence)
+
+  return "%02x" % calculateNMEAChkSum(sentence[start:end])
 # CreateNMEAChkSum
 
+def _verifyFrame(data, start, end):
+  """ Checks the frame data[start:end] of the bytearray data. data[start] is the
+  $ or ! and the frame ends with *hh (without the EOL). """
+  if (end - start < 4) or (data[end-3] <> 42):    # 42 = "*"
+    return False
+  try:
+    checksum = (_hexdigits[data[end-2]] << 4) | _hexdigits[data[end-1]]
+  except KeyError:
+    return False
+  return reduce(xor, data[start+1:end-3], 0) == checksum
+# _verifyFrame
+
 def VerifyNMEAChkSum(sentence=None):
   """ Checks the XOR Checksum with the transmitted checksum """
   if sentence == None:
     return None
 
-  Checksum = str(sentence[-2:])
-  GenChecksum = CreateNMEAChkSum(sentence)
-
-  if (Checksum.upper() == GenChecksum.upper()):
-    return True
-  return False
+  try:
+    data = _toBytes(sentence)
+  except UnicodeError:
+    return False
+  return _verifyFrame(data, 0, len(data))
 # VerifyNMEAChkSum
 
+def VerifyNMEAChkSums(buf):
+  """ Checks all sentences of a buffer (str, bytearray or memoryview with one sentence
+  per line) in one call. Returns a list of (start, end, valid) tuples, buf[start:end]
+  is the sentence without the EOL. Lines which don't start with $ or ! are skipped. """
+  data = _toBytes(buf)
+  result = list()
+  length = len(data)
+  pos = 0
+  while pos < length:
+    eol = data.find("\n", pos)
+    if eol == -1:
+      eol = length
+    end = eol
+    while (end > pos) and (data[end-1] in (13, 32)):  # strip \r and trailing blanks
+      end -= 1
+    if (end > pos) and (data[pos] in (36, 33)):        # 36 = "$", 33 = "!"
+      result.append( (pos, end, _verifyFrame(data, pos, end)) )
+    pos = eol + 1
+  return result
+# VerifyNMEAChkSums
+
 def convertKMHToKnots(kmh=0.0):
   if kmh == 0.0:
     return 0.0
@@ -2,4 +2,13 @@
 
 from GPSReader import *
 from GPSError import * 
-
+from NMEAdecoder import NMEADecoder, NMEAEpoch, NMEAFixQuality, replay
+from NMEAparallel import parseArchive
+from NMEAindex import NMEAIndex
+from NMEAevents import EVENT_FIX, EVENT_FIXLOST, EVENT_EPOCH, EVENT_AIS, EventQueue
+from AISdecoder import AISDecoder, AISMessage
+from AIStargets import AISTarget, AISTargetTable
+from NMEAstats import NMEAStats
+from GPSTransport import createTransport, SerialTransport, TCPClientTransport, TCPServerTransport, UDPTransport, FileTransport
+from GPSMultiplexer import GPSMultiplexer, GPSSource
+from GPSReaderPool import GPSReaderPool
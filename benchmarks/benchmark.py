@@ -0,0 +1,207 @@
+# -*- coding: ascii -*-
+
+# Benchmarks of the parsing hot paths. The input is produced by the seeded
+# generator in nmeagen.py, thus the numbers of two runs (or two revisions) are
+# comparable. Every benchmark reports sentences (or operations) per second and the
+# container objects per sentence which are still alive after the run (a growing
+# number points to a leak or a cache without limit). This is not the number of
+# allocations: Python 2 has no allocation counter (no tracemalloc), objects which
+# are freed again within the run are not counted.
+#
+# usage: python benchmark.py [-s seconds] [--seed N] [-b name] [-o results.json] [-c baseline.json]
+
+import os, sys, gc, time, json
+from optparse import OptionParser
+from timeit import default_timer as timer
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import GPSReader
+from GPSReader import NMEAutils, NMEAtelegrams, GPSTransport, AIVDM
+import nmeagen
+
+# Number of repetitions, the fastest one is reported
+repeat = 3
+
+# A benchmark is reported as regression if it is slower than the baseline by this factor
+regression_factor = 0.9
+
+def measure(function, count):
+  """ Runs function() repeat times and returns (operations per second, live objects
+  per operation). The garbage collector is disabled during the run. Its generation 0
+  counter is raised by every allocated and lowered by every freed container object,
+  thus its change is the net number of container objects which are still alive. """
+  best = None
+  live = 0.0
+  for i in xrange(repeat):
+    gc.collect()
+    gc.disable()
+    try:
+      before = gc.get_count()[0]
+      start = timer()
+      function()
+      duration = timer() - start
+      after = gc.get_count()[0]
+    finally:
+      gc.enable()
+    if (best == None) or (duration < best):
+      best = duration
+    live = float(after - before) / max(count, 1)
+  return (count / max(best, 1e-9), live)
+
+class MemoryTransport(GPSTransport.Transport):
+  """ Transport which feeds an in-memory string in chunks and finishes at its end """
+  reconnect = False
+
+  def __init__(self, data, chunksize=4096):
+    GPSTransport.Transport.__init__(self, "memory")
+    self._data = data
+    self._chunksize = chunksize
+    self._pos = 0
+
+  def _open(self):
+    self._pos = 0
+
+  def _read(self, timeout):
+    if self._pos >= len(self._data):
+      return None
+    chunk = self._data[self._pos:self._pos + self._chunksize]
+    self._pos += len(chunk)
+    return chunk
+
+def benchChecksum(lines):
+  nmea = [ line for line in lines if line.startswith("$") ]
+  def run():
+    verify = NMEAutils.VerifyNMEAChkSum
+    for line in nmea:
+      verify(line)
+  yield ("VerifyNMEAChkSum", len(nmea), run)
+
+def benchParse(lines):
+  groups = dict()
+  for line in lines:
+    formatter = NMEAtelegrams.getSentenceFormatter(line)
+    if formatter in NMEAtelegrams.sentence_registry:
+      groups.setdefault(formatter, list()).append(line)
+
+  for formatter in sorted(groups):
+    sentences = groups[formatter]
+    def run(sentences=sentences, telegram=NMEAtelegrams.sentence_registry[formatter]()):
+      for line in sentences:
+        t = telegram.newInstance()
+        try:
+          t.parseSentence(line)
+        except (GPSReader.NMEAParseError, GPSReader.NMEATypeError):
+          pass
+    yield ("NMEA_%s.parseSentence" % formatter, len(sentences), run)
+
+def benchGeodesy(lines):
+  positions = list()
+  decoder = GPSReader.NMEADecoder()
+  for line in lines:
+    if NMEAtelegrams.getSentenceFormatter(line) == "GGA":
+      telegram = decoder.decodeSentence(line)
+      if (telegram <> None) and telegram.hasFix():
+        positions.append(telegram.getPosition())
+  pairs = zip(positions, positions[1:] + positions[:1])
+
+  def distance():
+    for (a, b) in pairs:
+      a.calculateDistance(b)
+  def bearing():
+    for (a, b) in pairs:
+      a.calculateBearing(b)
+  yield ("GPSPosition.calculateDistance", len(pairs), distance)
+  yield ("GPSPosition.calculateBearing", len(pairs), bearing)
+
+def benchAIS(lines):
+  # Assemble the payloads of the (multi-part) messages
+  payloads = list()
+  parts = list()
+  for line in lines:
+    if not line.startswith("!"):
+      continue
+    fields = line.split(",")
+    parts.append(fields[5])
+    if fields[1] == fields[2]:
+      payloads.append( ("".join(parts), int(fields[6].split("*")[0])) )
+      parts = list()
+
+  def sixbit():
+    for (payload, pad) in payloads:
+      AIVDM.BitVector().from_sixbit(payload, pad)
+
+  vectors = list()
+  for (payload, pad) in payloads:
+    bits = AIVDM.BitVector()
+    bits.from_sixbit(payload, pad)
+    bits.extend_to(168)
+    vectors.append(bits)
+  def unpack():
+    for bits in vectors:
+      AIVDM.aivdm_unpack(0, bits, 0, {}, AIVDM.aivdm_decode)
+
+  yield ("BitVector.from_sixbit", len(payloads), sixbit)
+  yield ("aivdm_unpack", len(vectors), unpack)
+
+def benchReader(lines):
+  data = "".join([ line + "\r\n" for line in lines ])
+  def run():
+    transport = MemoryTransport(data)
+    reader = GPSReader.GPSReader(transport=transport)
+    while not transport.isFinished():
+      time.sleep(0.001)
+    reader.join()
+  yield ("GPSReader.run", len(lines), run)
+
+benchmarks = (benchChecksum, benchParse, benchGeodesy, benchAIS, benchReader)
+
+def main():
+  parser = OptionParser(usage="%prog [options]")
+  parser.add_option("-s", "--seconds", type="int", default=600, help="simulated seconds of input data (default 600)")
+  parser.add_option("--seed", type="int", default=0, help="seed of the generator (default 0)")
+  parser.add_option("--ais-rate", type="int", default=nmeagen.default_ais_rate, help="AIS messages per second")
+  parser.add_option("-b", "--bench", action="append", default=[], help="only run benchmarks whose name contains this")
+  parser.add_option("-o", "--output", help="save the results as JSON")
+  parser.add_option("-c", "--compare", help="compare with the results of a previous run (JSON)")
+  (options, args) = parser.parse_args()
+
+  generator = nmeagen.NMEAGenerator(options.seed, ais_rate=options.ais_rate)
+  lines = list(generator.lines(options.seconds))
+
+  baseline = dict()
+  if options.compare:
+    baseline = json.load(open(options.compare))
+
+  results = dict()
+  regressions = 0
+  print "%-32s %8s %14s %12s" % ("benchmark", "count", "per second", "live objs/op")
+  for bench in benchmarks:
+    for (name, count, function) in bench(lines):
+      if options.bench and not [ b for b in options.bench if b in name ]:
+        continue
+      (rate, live) = measure(function, count)
+      results[name] = {"count": count, "rate": rate, "live_objects": live}
+
+      note = ""
+      if name in baseline:
+        ratio = rate / baseline[name]["rate"]
+        note = "%+.1f%%" % ((ratio - 1) * 100)
+        if ratio < regression_factor:
+          note += " REGRESSION"
+          regressions += 1
+      print "%-32s %8d %14.0f %12.2f %s" % (name, count, rate, live, note)
+
+  if options.output:
+    output = open(options.output, "w")
+    try:
+      json.dump(results, output, indent=1, sort_keys=True)
+    finally:
+      output.close()
+
+  if regressions:
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
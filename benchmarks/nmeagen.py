@@ -0,0 +1,254 @@
+# -*- coding: ascii -*-
+
+# Seeded generator of synthetic NMEA and AIVDM data for the benchmarks. The same
+# seed always produces the same data, thus the results of two runs are comparable.
+#
+# usage: python nmeagen.py [seconds] [seed] > synthetic.nmea
+
+import sys, random
+
+# Sentences per second of each formatter
+default_rates = {
+  "GGA": 1,
+  "RMC": 1,
+  "VTG": 1,
+  "GLL": 1,
+  "GSA": 1,
+  "GSV": 1,   # complete GSV cycles per constellation
+  "DTM": 1,
+}
+
+# AIS messages per second (type 1 and the two part type 5)
+default_ais_rate = 10
+
+# Talkers of the GSV cycles (one cycle per constellation)
+gsv_talkers = ("GP", "GL", "GA", "BD")
+
+# Six-bit character set of the AIS text fields (same table as GPSReader/AIVDM.py)
+ais_charset = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^- !\"#$%&'()*+,-./0123456789:;<=>?"
+
+def checksum(payload):
+  value = 0
+  for ch in payload:
+    value ^= ord(ch)
+  return "%02X" % value
+
+def sentence(start, payload):
+  return "%s%s*%s" % (start, payload, checksum(payload))
+
+def formatLatitude(lat):
+  ns = "N"
+  if lat < 0:
+    ns, lat = "S", -lat
+  return "%02d%07.4f" % (int(lat), (lat - int(lat)) * 60), ns
+
+def formatLongitude(lon):
+  ew = "E"
+  if lon < 0:
+    ew, lon = "W", -lon
+  return "%03d%07.4f" % (int(lon), (lon - int(lon)) * 60), ew
+
+class BitWriter(object):
+  """ Packs AIS fields into a bit string and armors it with six-bit characters """
+  def __init__(self):
+    self.value = 0
+    self.length = 0
+
+  def add(self, value, width):
+    self.value = (self.value << width) | (value & ((1 << width) - 1))
+    self.length += width
+
+  def addText(self, text, chars):
+    text = text.upper()[:chars].ljust(chars, "@")
+    for ch in text:
+      self.add(ais_charset.index(ch), 6)
+
+  def armor(self):
+    """ returns (payload, pad) """
+    pad = (6 - self.length % 6) % 6
+    value = self.value << pad
+    chars = list()
+    for i in xrange((self.length + pad) / 6 - 1, -1, -1):
+      c = (value >> (6 * i)) & 0x3f
+      if c < 40:
+        chars.append(chr(c + 48))
+      else:
+        chars.append(chr(c + 56))
+    return "".join(chars), pad
+
+class NMEAGenerator(object):
+  """ NMEAGenerator - Synthetic receiver output
+
+  A vessel moves on a random walk around the start position. Every simulated second
+  produces the sentences of rates (formatter -> sentences per second) with mixed
+  talkers (GN, GP, GL, GA, BD) and ais_rate AIVDM messages of other vessels. """
+  def __init__(self, seed=0, rates=None, ais_rate=default_ais_rate, lat=53.6, lon=9.9):
+    self.random = random.Random(seed)
+    if rates == None:
+      rates = default_rates
+    self.rates = rates
+    self.ais_rate = ais_rate
+    self.lat = lat
+    self.lon = lon
+    self.speed = 5.0    # knots
+    self.course = 90.0
+    self._sequence = 0
+    self._vessels = [ (self.random.randint(200000000, 799999999),
+                       "VESSEL %d" % i) for i in xrange(50) ]
+
+  def lines(self, seconds, start=43200):
+    """ Generator for the lines (without EOL) of seconds simulated seconds """
+    for second in xrange(start, start + seconds):
+      self._move()
+      events = list()
+      for formatter, rate in sorted(self.rates.items()):
+        for k in xrange(rate):
+          events.append( (second + float(k) / rate, formatter) )
+      for k in xrange(self.ais_rate):
+        events.append( (second + float(k) / max(self.ais_rate, 1), "AIS") )
+      events.sort()
+      for (t, formatter) in events:
+        for line in getattr(self, "_make" + formatter)(t):
+          yield line
+
+  def stream(self, seconds, start=43200):
+    """ returns the lines of seconds simulated seconds as one string with CR/LF """
+    return "".join([ line + "\r\n" for line in self.lines(seconds, start) ])
+
+  def _move(self):
+    rnd = self.random
+    self.speed = max(0.0, self.speed + rnd.uniform(-0.2, 0.2))
+    self.course = (self.course + rnd.uniform(-2.0, 2.0)) % 360
+    self.lat += rnd.uniform(-0.00005, 0.00005)
+    self.lon += rnd.uniform(-0.00005, 0.00005)
+
+  def _time(self, t):
+    t = t % 86400
+    return "%02d%02d%05.2f" % (int(t / 3600), int(t / 60) % 60, t % 60)
+
+  def _position(self):
+    return formatLatitude(self.lat) + formatLongitude(self.lon)
+
+  def _makeGGA(self, t):
+    rnd = self.random
+    lat, ns, lon, ew = self._position()
+    yield sentence("$", "GNGGA,%s,%s,%s,%s,%s,%d,%02d,%.1f,%.1f,M,%.1f,M,," % (
+      self._time(t), lat, ns, lon, ew, rnd.choice((1, 1, 1, 2)), rnd.randint(6, 20),
+      rnd.uniform(0.6, 2.5), rnd.uniform(20.0, 60.0), 45.1))
+
+  def _makeRMC(self, t):
+    lat, ns, lon, ew = self._position()
+    yield sentence("$", "GNRMC,%s,A,%s,%s,%s,%s,%.2f,%.2f,180612,,,A" % (
+      self._time(t), lat, ns, lon, ew, self.speed, self.course))
+
+  def _makeVTG(self, t):
+    yield sentence("$", "GPVTG,%.2f,T,,M,%.2f,N,%.2f,K,A" % (
+      self.course, self.speed, self.speed * 1.852))
+
+  def _makeGLL(self, t):
+    lat, ns, lon, ew = self._position()
+    yield sentence("$", "GNGLL,%s,%s,%s,%s,%s,A,A" % (lat, ns, lon, ew, self._time(t)))
+
+  def _makeGSA(self, t):
+    rnd = self.random
+    prns = [ "%02d" % prn for prn in sorted(rnd.sample(xrange(1, 33), rnd.randint(4, 12))) ]
+    prns += [""] * (12 - len(prns))
+    yield sentence("$", "GNGSA,A,3,%s,%.1f,%.1f,%.1f" % (",".join(prns),
+      rnd.uniform(1.0, 3.0), rnd.uniform(0.6, 2.5), rnd.uniform(0.8, 3.0)))
+
+  def _makeGSV(self, t):
+    rnd = self.random
+    for talker in gsv_talkers:
+      satellites = rnd.randint(1, 12)
+      parts = (satellites + 3) / 4
+      prns = sorted(rnd.sample(xrange(1, 33), satellites))
+      for part in xrange(parts):
+        fields = [ "%s%s" % (talker, "GSV"), str(parts), str(part + 1), "%02d" % satellites ]
+        for prn in prns[part * 4:part * 4 + 4]:
+          fields += [ "%02d" % prn, "%02d" % rnd.randint(0, 90), "%03d" % rnd.randint(0, 359),
+                      "%02d" % rnd.randint(10, 50) ]
+        yield sentence("$", ",".join(fields))
+
+  def _makeDTM(self, t):
+    yield sentence("$", "GPDTM,W84,,0.0,N,0.0,E,0.0,W84")
+
+  def _makeAIS(self, t):
+    rnd = self.random
+    (mmsi, name) = rnd.choice(self._vessels)
+    if rnd.random() < 0.9:
+      return self._aivdm(self._type1(mmsi, t))
+    return self._aivdm(self._type5(mmsi, name))
+
+  def _type1(self, mmsi, t):
+    rnd = self.random
+    bits = BitWriter()
+    bits.add(1, 6)                    # msgtype
+    bits.add(0, 2)                    # repeat
+    bits.add(mmsi, 30)
+    bits.add(rnd.choice((0, 0, 1, 5)), 4)
+    bits.add(rnd.randint(-127, 127), 8)
+    bits.add(rnd.randint(0, 300), 10)
+    bits.add(1, 1)
+    bits.add(int((self.lon + rnd.uniform(-0.1, 0.1)) * 600000), 28)
+    bits.add(int((self.lat + rnd.uniform(-0.1, 0.1)) * 600000), 27)
+    bits.add(rnd.randint(0, 3599), 12)
+    bits.add(rnd.randint(0, 359), 9)
+    bits.add(int(t) % 60, 6)
+    bits.add(0, 2)
+    bits.add(0, 3)
+    bits.add(0, 1)
+    bits.add(rnd.randint(0, (1 << 19) - 1), 19)
+    return bits
+
+  def _type5(self, mmsi, name):
+    rnd = self.random
+    bits = BitWriter()
+    bits.add(5, 6)
+    bits.add(0, 2)
+    bits.add(mmsi, 30)
+    bits.add(0, 2)
+    bits.add(rnd.randint(1000000, 9999999), 30)
+    bits.addText("DA%04d" % (mmsi % 10000), 7)
+    bits.addText(name, 20)
+    bits.add(rnd.choice((30, 52, 60, 70, 80)), 8)
+    bits.add(rnd.randint(5, 200), 9)
+    bits.add(rnd.randint(5, 100), 9)
+    bits.add(rnd.randint(1, 20), 6)
+    bits.add(rnd.randint(1, 20), 6)
+    bits.add(1, 4)
+    bits.add(rnd.randint(1, 12), 4)
+    bits.add(rnd.randint(1, 28), 5)
+    bits.add(rnd.randint(0, 23), 5)
+    bits.add(rnd.randint(0, 59), 6)
+    bits.add(rnd.randint(10, 150), 8)
+    bits.addText("HAMBURG", 20)
+    bits.add(0, 1)
+    bits.add(0, 1)
+    return bits
+
+  def _aivdm(self, bits, fragment_size=60):
+    """ returns the AIVDM sentences of a message (split into fragments) """
+    (payload, pad) = bits.armor()
+    fragments = [ payload[i:i + fragment_size] for i in xrange(0, len(payload), fragment_size) ]
+    channel = self.random.choice("AB")
+    sequence = ""
+    if len(fragments) > 1:
+      self._sequence = (self._sequence + 1) % 10
+      sequence = str(self._sequence)
+    lines = list()
+    for i, fragment in enumerate(fragments):
+      fillbits = 0
+      if i == len(fragments) - 1:
+        fillbits = pad
+      lines.append(sentence("!", "AIVDM,%d,%d,%s,%s,%s,%d" % (len(fragments), i + 1,
+        sequence, channel, fragment, fillbits)))
+    return lines
+
+if __name__ == '__main__':
+  seconds = 60
+  seed = 0
+  if len(sys.argv) > 1:
+    seconds = int(sys.argv[1])
+  if len(sys.argv) > 2:
+    seed = int(sys.argv[2])
+  sys.stdout.write(NMEAGenerator(seed).stream(seconds))
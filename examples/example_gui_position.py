@@ -2,7 +2,7 @@
 import GPSReader
 
 from Tkinter import *
-import time, thread, sys
+import sys
 
 class Position:
   def __init__(self):
@@ -22,8 +22,10 @@ class Position:
 
     self.fenster.bind('<q>', self.quit_event)
 
-    # Thread fuer das aktualisieren
-    aktThread = thread.start_new_thread(self.aktualisieren, ())
+    # Callbacks fuer das aktualisieren, kein Polling mehr
+    self.gpsdev.subscribe("GGA", self.updatePosition)
+    self.gpsdev.subscribe("VTG", self.updateSpeed)
+    self.gpsdev.subscribe("fixlost", self.lostFix)
 
     # Start die GUI Oberflaeche
     self.fenster.mainloop()
@@ -33,40 +35,32 @@ class Position:
     self.fenster.destroy()
     sys.exit(3)
 
-  def aktualisieren(self):
-    print "Thread started" 
-    while True:
-      print self.gpsdev.isConnected()
-      if (not self.gpsdev.isConnected()):
-        break
-
-      print "...Thread is running..."
-      try:
-        temp = self.gpsdev.GGA.getPosition()
-
-        t = "P: |%s| |%s|" % (temp.latitude, temp.longitude)
-        self.pos.set(t)
-      except TypeError:
-        print "TypeError Exception caught for pos" 
-      except GPSReader.NMEANoValidFix:
-        print "The GPS do not have a valid fix"
-        self.pos.set("No valid position")
-
-      try:
-        temp1 = self.gpsdev.VTG.getSpeed()
-        temp2 = self.gpsdev.VTG.getCourse()[0]
-
-        t = "S: %s km/h | C: %s Grad" % (temp1,temp2)
-        self.speed.set(t)
-      except TypeError:
-        print "Exception caught for speed and course" 
-      except GPSReader.NMEANoValidFix:
-        print "The GPS do not have a valid fix"
-        self.speed.set("No valid speed/course")
-
-      time.sleep(3)
-
-    sys.exit(0)
+  def updatePosition(self, gga):
+    """ called by the GPSReader thread for every GGA sentence """
+    try:
+      temp = gga.getPosition()
+
+      t = "P: |%s| |%s|" % (temp.latitude, temp.longitude)
+      self.pos.set(t)
+    except GPSReader.NMEANoValidFix:
+      print "The GPS do not have a valid fix"
+      self.pos.set("No valid position")
+
+  def updateSpeed(self, vtg):
+    """ called by the GPSReader thread for every VTG sentence """
+    try:
+      temp1 = vtg.getSpeed()
+      temp2 = vtg.getCourse()[0]
+
+      t = "S: %s km/h | C: %s Grad" % (temp1,temp2)
+      self.speed.set(t)
+    except (ValueError, GPSReader.NMEANoValidFix):
+      print "The GPS do not have a valid speed/course"
+      self.speed.set("No valid speed/course")
+
+  def lostFix(self, telegram):
+    print "The GPS lost the fix"
+    self.pos.set("No valid position")
 
 if __name__ == '__main__':
   gui_position = Position()
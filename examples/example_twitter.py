@@ -1,6 +1,6 @@
-# -*- coding: cp1252 -*- 
+# -*- coding: cp1252 -*-
 import GPSReader
-import time, thread, sys, twitter
+import time, sys, twitter
 
 # gps
 try:
@@ -9,7 +9,7 @@ except:
   time.sleep(4)
   sys.exit(1)
 
-# twitter 
+# twitter
 tusername = "USERNAME"
 tpassword = "PASSWORD"
 
@@ -18,49 +18,60 @@ tapi = twitter.Api(username=tusername, password=tpassword)
 startmessage = "example_twitter.py wurde um %i gestartet" % (time.time(),)
 print tapi.PostUpdate(startmessage).id
 
-LastUpdate = int(time.time())
-while True:
-# ############################################################
-  fix = False
+# Zeitpunkt der naechsten Nachricht, wird nach jeder Nachricht anhand der
+# gefahrenen Geschwindigkeit gesetzt
+NextUpdate = [0.0]
 
+def getInterval():
+  """ Einige Zeit warten, auf Basis der Gefahrenen Gespschwindigkeit """
+  try:
+    speed = float(gpsdev.VTG.getSpeed())
+  except:
+    speed = -1
+
+  print "speed is %f " % speed
+  if (speed >= 100):
+    print "speed more than 100"
+    return 60 * 1
+  elif (speed < 100) and (speed >= 50):
+    print "speed between 100 and 50 "
+    return 60 * 2.5
+  elif (speed < 50) and (speed >= 10):
+    print "speed between 50 and 10"
+    return 60 * 5
+  else:
+    print "speed under 10"
+    return 60 * 15
+
+def postPosition(telegram):
+  """ called for every GGA, RMC or GLL with a valid position """
+  if time.time() < NextUpdate[0]:
+    return
+  position = telegram.getPosition()
+  # More Information: http://mapki.com/wiki/Google_Map_Parameters
+  message = "Time: %i | http://maps.google.com/?q=%s,%s&t=m&z=15 " % (time.time(), position.latitude, position.longitude)
   try:
-    position = gpsdev.GGA.getPosition()
-    # More Information: http://mapki.com/wiki/Google_Map_Parameters
-    message = "Time: %i | http://maps.google.com/?q=%s,%s&t=m&z=15 " % (time.time(), position.latitude, position.longitude)
     status = tapi.PostUpdate(message)
     print "Twitter Msg ID %s" % (status,)
+    NextUpdate[0] = time.time() + getInterval()
+  except Exception, e:
+    print "Twitter update failed: %s" % (e,)
+    NextUpdate[0] = time.time() + 10
 
-    fix = True
-  except TypeError:
-    print "TypeError Exception caught for pos"
-  except GPSReader.NMEANoValidFix:
-    print "The GPS do not have a valid fix (position)"
-  except KeyboardInterrupt:
-    gpsdev.stop_thread()
-    time.sleep(2)
-    sys.exit(0)
+def lostFix(telegram):
+  print "The GPS do not have a valid fix (position)"
 
-  # Einige Zeit schlafen, auf Basis der Gefahrenen Gespschwindigkeit 
-  if (fix == True):
-    try:
-      speed1 = gpsdev.VTG.getSpeed()
-    except:
-      speed1 = -1
+# Callbacks statt Polling. Das Senden an Twitter dauert, deshalb laufen die
+# Callbacks im Worker Thread und nicht im Thread des GPSReader.
+gpsdev.startCallbackWorker()
+gpsdev.subscribe(GPSReader.EVENT_FIX, postPosition)
+gpsdev.subscribe(GPSReader.EVENT_FIXLOST, lostFix)
 
-    speed = float(speed1)
-    print "speed is %f " % speed 
-    if (speed >= 100):
-      print "speed more than 100" 
-      time.sleep(60 * 1)
-    elif (speed < 100) and (speed >= 50):
-      print "speed between 100 and 50 "
-      time.sleep(60 * 2.5)
-    elif (speed < 50) and (speed >= 10):
-      print "speed between 50 and 10"
-      time.sleep(60 * 5)
-    else:
-      print "speed under 10"
-      time.sleep(60 * 15)
-
-  else:
-    time.sleep(10)
+try:
+  while gpsdev.isAlive():
+    time.sleep(1)
+except KeyboardInterrupt:
+  gpsdev.stopCallbackWorker()
+  gpsdev.stop_thread()
+  time.sleep(2)
+  sys.exit(0)